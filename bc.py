@@ -1,7 +1,23 @@
+import asyncio
+import time
+from typing import Dict, NamedTuple, Set, Tuple
+
 from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
     AiocqhttpMessageEvent,
 )
 
+from .utils import HistRecord, format_history, METRICS
+
+try:
+    from aiocqhttp.exceptions import NetworkError
+except ImportError:
+    NetworkError = ConnectionError
+
+# 可重试的 OneBot 调用异常（超时、连接断开等）
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError, NetworkError)
+# 禁言到期时间的容差（秒）：先后到达的同等时长禁言仍合并
+BAN_SLACK = 5.0
+
 
 class BotController:
     """Bot控制器"""
@@ -17,10 +33,11 @@ class BotController:
         client = event.bot
         self_id = int(event.get_self_id())
         message_id = int(event.message_obj.message_id)
-        await client.delete_msg(
-            message_id=message_id,
-            self_id=self_id,
-        )
+        with METRICS.timer("onebot_seconds", action="withdraw"):
+            await client.delete_msg(
+                message_id=message_id,
+                self_id=self_id,
+            )
 
     @staticmethod
     async def ban(event: AiocqhttpMessageEvent, time=10):
@@ -36,18 +53,51 @@ class BotController:
         group_id = int(event.get_group_id())
         user_id = int(event.get_sender_id())
         self_id = int(event.get_self_id())
-        await client.set_group_ban(
-            group_id=group_id,
-            user_id=user_id,
-            duration=time * 60,
-            self_id=self_id,
-        )
+        with METRICS.timer("onebot_seconds", action="ban"):
+            await client.set_group_ban(
+                group_id=group_id,
+                user_id=user_id,
+                duration=time * 60,
+                self_id=self_id,
+            )
+
+    @staticmethod
+    async def unban(event: AiocqhttpMessageEvent):
+        """
+        解除禁言
+
+        :param event: 消息事件
+        """
+        client = event.bot
+        group_id = int(event.get_group_id())
+        user_id = int(event.get_sender_id())
+        self_id = int(event.get_self_id())
+        with METRICS.timer("onebot_seconds", action="unban"):
+            await client.set_group_ban(
+                group_id=group_id,
+                user_id=user_id,
+                duration=0,
+                self_id=self_id,
+            )
 
     @staticmethod
     async def get_hist_messages(event: AiocqhttpMessageEvent, count=10) -> list[str]:
         """
         获取群聊消息记录
 
+        :param event: 消息事件
+        :param count: 获取数量
+        """
+        records = await BotController.get_hist_records(event, count)
+        return format_history(records, str(event.get_self_id()))
+
+    @staticmethod
+    async def get_hist_records(
+        event: AiocqhttpMessageEvent, count=10
+    ) -> list[HistRecord]:
+        """
+        获取群聊消息原始记录
+
         :param event: 消息事件
         :param count: 获取数量
         """
@@ -60,21 +110,160 @@ class BotController:
             "count": count,
             "reverseOrder": False,
         }
-        result = await bot_instance.api.call_action("get_group_msg_history", **payloads)
+        with METRICS.timer("onebot_seconds", action="get_group_msg_history"):
+            result = await bot_instance.api.call_action(
+                "get_group_msg_history", **payloads
+            )
         round_messages = result.get("messages", [])
 
-        messages = []
-        self_id = int(event.get_self_id())
-        sender_dict = {}
-        sender_mask = 1
-        for msg in round_messages:
-            sender_id = str(msg.get("sender", {}).get("user_id", ""))
-            if sender_id != self_id:
-                if sender_id not in sender_dict:
-                    sender_dict[sender_id] = sender_mask
-                    sender_mask += 1
-                messages.append(
-                    f"用户{sender_dict[sender_id]}：{msg.get('raw_message', '')}"
-                )
-
-        return messages
+        return [
+            HistRecord(
+                message_id=str(msg.get("message_id", "")),
+                sender_id=str(msg.get("sender", {}).get("user_id", "")),
+                text=msg.get("raw_message", ""),
+            )
+            for msg in round_messages
+        ]
+
+
+class _Ban(NamedTuple):
+    """进行中或生效中的禁言"""
+
+    expires: float
+    future: asyncio.Future
+    # 由该禁言覆盖的消息（合并到此的禁言均计入）
+    holders: Set[str]
+
+    def active(self, now: float) -> bool:
+        return not self.future.done() or (
+            self.future.exception() is None and now < self.expires
+        )
+
+
+class Enforcer:
+    """
+    风控处理调度器
+
+    - 撤回与禁言并发执行；
+    - 同一 (群, 用户) 的禁言在禁言期内合并为一次调用（当前禁言剩余时长不足时重新禁言），进行中的禁言由后来者共同等待；
+    - 解除禁言只撤销本消息的禁言，仍有其他消息的禁言生效时不解除；
+    - 同一消息的撤回合并为一次调用，所有撤回共享并发上限；
+    - 超时、断连等瞬时错误按指数退避重试。
+    """
+
+    def __init__(self, retries: int = 2, backoff: float = 0.5, concurrency: int = 8):
+        self.retries = max(retries, 0)
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self.bans: Dict[Tuple[str, str], _Ban] = {}
+        self.withdrawals: Dict[str, asyncio.Future] = {}
+
+    async def enforce(self, event: AiocqhttpMessageEvent, withdraw=False, ban_time=0):
+        """
+        执行风控处理
+
+        :param event: 消息事件
+        :param withdraw: 是否撤回
+        :param ban_time: 禁言时长 (minutes)，为 0 时不禁言
+        """
+        calls = []
+        if withdraw:
+            calls.append(self.withdraw(event))
+        if ban_time > 0:
+            calls.append(self.ban(event, ban_time))
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, BaseException):
+                raise result
+
+    async def withdraw(self, event: AiocqhttpMessageEvent):
+        """
+        撤回消息（同一消息只撤回一次）
+
+        :param event: 消息事件
+        """
+        message_id = str(event.message_obj.message_id)
+        future = self.withdrawals.get(message_id)
+        if future is not None:
+            METRICS.inc("enforce_coalesced_total", action="withdraw")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._retry(BotController.withdraw, event))
+        self.withdrawals[message_id] = future
+        future.add_done_callback(_consume)
+        future.add_done_callback(lambda _: self.withdrawals.pop(message_id, None))
+        return await asyncio.shield(future)
+
+    async def ban(self, event: AiocqhttpMessageEvent, ban_time: int = 10):
+        """
+        禁言（禁言期内同一用户只禁言一次）
+
+        :param event: 消息事件
+        :param ban_time: 禁言时长 (minutes)
+        """
+        key = (str(event.get_group_id()), str(event.get_sender_id()))
+        message_id = str(event.message_obj.message_id)
+        now = time.monotonic()
+        current = self.bans.get(key)
+        holders = {message_id}
+        if current is not None and current.active(now):
+            if current.expires + BAN_SLACK >= now + ban_time * 60:
+                METRICS.inc("enforce_coalesced_total", action="ban")
+                current.holders.add(message_id)
+                return await asyncio.shield(current.future)
+            # 剩余时长不足时重新禁言并取代当前禁言，被取代的消息仍由其覆盖
+            holders |= current.holders
+
+        future = asyncio.ensure_future(self._retry(BotController.ban, event, ban_time))
+        future.add_done_callback(_consume)
+        self.bans[key] = _Ban(now + ban_time * 60, future, holders)
+        self._prune_bans(now)
+        return await asyncio.shield(future)
+
+    async def unban(self, event: AiocqhttpMessageEvent) -> bool:
+        """
+        撤销本消息的禁言：仅当生效中的禁言不再覆盖其他消息时解除
+
+        :param event: 消息事件
+        :return: 是否已解除禁言
+        """
+        key = (str(event.get_group_id()), str(event.get_sender_id()))
+        current = self.bans.get(key)
+        if current is None:
+            return False
+        current.holders.discard(str(event.message_obj.message_id))
+        if current.holders:
+            return False
+        del self.bans[key]
+        if not current.future.done():
+            # 等待进行中的禁言完成，避免解除先于禁言到达
+            await asyncio.wait([current.future])
+        if not current.active(time.monotonic()) or key in self.bans:
+            # 禁言失败、已到期，或等待期间有新的禁言
+            return False
+        await self._retry(BotController.unban, event)
+        return True
+
+    def _prune_bans(self, now: float):
+        if len(self.bans) <= 1024:
+            return
+        for key, ban in list(self.bans.items()):
+            if ban.future.done() and now >= ban.expires:
+                del self.bans[key]
+
+    async def _retry(self, action, *args):
+        """在并发上限内调用，瞬时错误时指数退避重试"""
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    return await action(*args)
+            except TRANSIENT_ERRORS:
+                if attempt >= self.retries:
+                    raise
+                METRICS.inc("onebot_retries_total", action=action.__name__)
+                await asyncio.sleep(self.backoff * 2**attempt)
+
+
+def _consume(future: asyncio.Future):
+    """取回异常，避免等待方均已取消时出现未处理异常告警"""
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,250 @@
+"""
+离线压测：python -m bench [选项]（在插件目录下执行）
+
+以替身模型与 OneBot 客户端回放消息语料，经过完整的 _RC.handle 流程，
+输出 L1 单条耗时、吞吐量与端到端延迟分位数（JSON），可与历史结果对比。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from .stubs import (
+    PLUGIN_ROOT,
+    FakeClient,
+    FakeContext,
+    FakeEvent,
+    FakeProvider,
+    load_plugin,
+    make_answer,
+)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def load_corpus(path: str | None, size: int, groups: int, rc) -> List[dict]:
+    """
+    加载语料：.jsonl（message/group_id/user_id 字段）或每行一条消息的文本；
+    未指定时生成混合了日常聊天、违禁词与刷屏重复的合成语料
+    """
+    if path:
+        corpus = []
+        with open(path, "r", encoding="utf-8") as file:
+            for i, line in enumerate(file):
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                if path.endswith(".jsonl"):
+                    item = json.loads(line)
+                else:
+                    item = {"message": line}
+                item.setdefault("group_id", str(1000 + i % groups))
+                item.setdefault("user_id", str(20000 + i % 50))
+                corpus.append(item)
+        return corpus
+
+    rng = random.Random(0)
+    chars = "的一是在不了有和人这中大为上个我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    words = [rc.sw_list[rng.randrange(len(rc.sw_list))] for _ in range(500)]
+    corpus = []
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.1 and corpus:
+            message = corpus[rng.randrange(len(corpus))]["message"]
+        else:
+            message = "".join(rng.choice(chars) for _ in range(rng.randint(4, 60)))
+            if roll < 0.3:
+                pos = rng.randrange(len(message) + 1)
+                message = message[:pos] + rng.choice(words) + message[pos:]
+        corpus.append(
+            {
+                "message": message,
+                "group_id": str(1000 + rng.randrange(groups)),
+                "user_id": str(20000 + rng.randrange(50)),
+            }
+        )
+    return corpus
+
+
+async def replay(rc, corpus: List[dict], concurrency: int, client: FakeClient):
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    latencies = []
+    errors = 0
+
+    async def one(i: int, item: dict):
+        nonlocal errors
+        async with semaphore:
+            event = FakeEvent(
+                item["message"],
+                group_id=item["group_id"],
+                sender_id=item["user_id"],
+                message_id=str(i),
+                client=client,
+            )
+            start = time.perf_counter()
+            try:
+                rc.record_message(event)
+                async for _ in rc.handle(event):
+                    pass
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, item) for i, item in enumerate(corpus)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PLUGIN_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(current: dict, baseline: dict, prefix: str = ""):
+    """打印与历史结果的数值差异"""
+    for key, value in current.items():
+        name = f"{prefix}{key}"
+        old = baseline.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            compare(value, old, name + ".")
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            change = f"{(value - old) / old:+.1%}" if old else "n/a"
+            print(f"{name}: {old:.6g} -> {value:.6g} ({change})", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--corpus", help="语料文件（.jsonl 或每行一条消息）")
+    parser.add_argument("--size", type=int, default=2000, help="合成语料条数")
+    parser.add_argument("--groups", type=int, default=5, help="合成语料群数")
+    parser.add_argument("--concurrency", type=int, default=64, help="同时处理的消息数")
+    parser.add_argument("--l2-latency", type=float, default=0.3, help="L2 延迟（秒）")
+    parser.add_argument("--l3-latency", type=float, default=2.0, help="L3 延迟（秒）")
+    parser.add_argument(
+        "--onebot-latency", type=float, default=0.03, help="OneBot 延迟（秒）"
+    )
+    parser.add_argument("--l2-yes-rate", type=float, default=0.3, help="L2 存疑比例")
+    parser.add_argument("--l3-grade-max", type=int, default=10, help="L3 评级上限")
+    parser.add_argument(
+        "--stream-chunk",
+        type=int,
+        default=0,
+        help="替身模型流式输出每段字符数（0 为不支持）",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="覆盖插件配置项（VALUE 按 JSON 解析），可重复",
+    )
+    parser.add_argument("--output", help="结果输出文件（默认输出到标准输出）")
+    parser.add_argument("--compare", help="与历史结果文件对比")
+    args = parser.parse_args()
+
+    rc_module = load_plugin()
+    from astrbot_plugin_risk_control.config import parse_config
+
+    rc = rc_module.RC
+    corpus = load_corpus(args.corpus, args.size, args.groups, rc)
+
+    raw_config = {
+        "enable": True,
+        "white_groups": sorted({item["group_id"] for item in corpus}),
+        "l1_threshold": 0.05,
+        "l2_llm_id": "l2",
+        "l3_llm_id": "l3",
+        "verdict_cache_size": 0,
+        # 回放压缩了时间，按真实频率设定的刷屏上限会大面积误触发
+        "flood_user_limit": 0,
+        # 不向插件目录的审计日志写入压测记录
+        "audit_log": False,
+        # 信誉快照同样写入插件目录，且压测语料的违规分布会使后续消息跳过L2
+        "reputation": False,
+    }
+    for item in args.set:
+        key, _, value = item.partition("=")
+        try:
+            raw_config[key] = json.loads(value)
+        except json.JSONDecodeError:
+            raw_config[key] = value
+    config = parse_config(raw_config)
+
+    providers = {
+        "l2": FakeProvider(args.l2_latency, chunk_size=args.stream_chunk),
+        "l3": FakeProvider(args.l3_latency, chunk_size=args.stream_chunk),
+    }
+    rc.set_bot_params(FakeContext(providers), config)
+    answer = make_answer(rc, args.l2_yes_rate, args.l3_grade_max)
+    for provider in providers.values():
+        provider.answer = answer
+
+    # L1 单条耗时
+    rc.get_l1_coefficient("预热")
+    l1_times = []
+    for item in corpus:
+        start = time.perf_counter()
+        rc.get_l1_coefficient(item["message"], item["group_id"])
+        l1_times.append(time.perf_counter() - start)
+    l1_batch_start = time.perf_counter()
+    rc.get_l1_coefficients([item["message"] for item in corpus])
+    l1_batch_time = time.perf_counter() - l1_batch_start
+
+    # 端到端回放
+    client = FakeClient(args.onebot_latency)
+    latencies, errors, wall = asyncio.run(replay(rc, corpus, args.concurrency, client))
+
+    result = {
+        "commit": git_commit(),
+        "messages": len(corpus),
+        "config": raw_config,
+        "l1": {
+            "us_per_msg": sum(l1_times) / len(l1_times) * 1e6,
+            "p50_us": percentile(l1_times, 50) * 1e6,
+            "p99_us": percentile(l1_times, 99) * 1e6,
+            "batch_msgs_per_sec": len(corpus) / l1_batch_time,
+        },
+        "throughput_msgs_per_sec": len(corpus) / wall,
+        "e2e": {
+            "mean_ms": sum(latencies) / len(latencies) * 1e3,
+            "p50_ms": percentile(latencies, 50) * 1e3,
+            "p95_ms": percentile(latencies, 95) * 1e3,
+            "p99_ms": percentile(latencies, 99) * 1e3,
+        },
+        "llm_calls": {pid: p.calls for pid, p in providers.items()},
+        "llm_prompt_chars": {pid: p.prompt_chars for pid, p in providers.items()},
+        "onebot_calls": dict(client.calls),
+        "errors": errors,
+    }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
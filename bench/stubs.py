@@ -0,0 +1,260 @@
+"""
+离线压测用的 AstrBot 替身
+
+提供 astrbot 模块桩、可配置延迟与回答的模型、记录调用的 OneBot 客户端与消息事件，
+使 rc.py 在没有 AstrBot 运行环境时也能完整执行 _RC.handle。
+"""
+
+import asyncio
+import hashlib
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import random
+import sys
+import types
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+PLUGIN_ROOT = Path(__file__).resolve().parent.parent
+PLUGIN_NAME = "astrbot_plugin_risk_control"
+
+
+def install_astrbot_stubs():
+    """向 sys.modules 注入 rc.py / bc.py 依赖的 astrbot 模块"""
+    if "astrbot" in sys.modules:
+        return
+
+    def module(name: str) -> types.ModuleType:
+        mod = types.ModuleType(name)
+        sys.modules[name] = mod
+        return mod
+
+    astrbot = module("astrbot")
+    api = module("astrbot.api")
+    star = module("astrbot.api.star")
+    event = module("astrbot.api.event")
+    astrbot.api = api
+    api.star = star
+    api.event = event
+
+    logger = logging.getLogger("astrbot")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    api.logger = logger
+    api.AstrBotConfig = dict
+    star.Context = FakeContext
+    star.Star = object
+    star.register = lambda *args, **kwargs: (lambda cls: cls)
+    event.AstrMessageEvent = FakeEvent
+
+    path = "astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event"
+    parts = path.split(".")
+    for i in range(2, len(parts) + 1):
+        module(".".join(parts[:i]))
+    sys.modules[path].AiocqhttpMessageEvent = FakeEvent
+
+
+def load_plugin() -> types.ModuleType:
+    """
+    以包的形式加载插件（不依赖插件目录名）
+
+    :return: 插件的 rc 模块
+    """
+    install_astrbot_stubs()
+    if PLUGIN_NAME not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(PLUGIN_NAME, None, is_package=True)
+        spec.submodule_search_locations = [str(PLUGIN_ROOT)]
+        sys.modules[PLUGIN_NAME] = importlib.util.module_from_spec(spec)
+    return importlib.import_module(f"{PLUGIN_NAME}.rc")
+
+
+@dataclass
+class FakeResponse:
+    """模型回复"""
+
+    completion_text: str
+    is_chunk: bool = False
+
+
+class FakeProvider:
+    """
+    模型替身
+
+    :param latency: 单次调用延迟（秒）
+    :param answer: 根据提示词生成回复的函数
+    :param jitter: 延迟的随机浮动比例
+    :param chunk_size: 流式输出每段字符数，为 0 时不支持流式输出
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        answer: Optional[Callable[[str], str]] = None,
+        jitter: float = 0.2,
+        chunk_size: int = 0,
+    ):
+        self.latency = latency
+        self.answer = answer or (lambda prompt: "N")
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.prompt_chars = 0
+        self.streamed_chars = 0
+
+    def _delay(self) -> float:
+        return max(self.latency * (1 + random.uniform(-self.jitter, self.jitter)), 0)
+
+    async def text_chat(self, prompt: str = "", **kwargs) -> FakeResponse:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        await asyncio.sleep(self._delay())
+        return FakeResponse(self.answer(prompt))
+
+    async def text_chat_stream(self, prompt: str = "", **kwargs):
+        """流式输出：总延迟按字符均摊到各段"""
+        if self.chunk_size <= 0:
+            raise NotImplementedError
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        text = self.answer(prompt)
+        per_char = self._delay() / max(len(text), 1)
+        for i in range(0, len(text), self.chunk_size):
+            chunk = text[i : i + self.chunk_size]
+            await asyncio.sleep(per_char * len(chunk))
+            self.streamed_chars += len(chunk)
+            yield FakeResponse(chunk, is_chunk=True)
+        yield FakeResponse(text)
+
+
+def unit(text: str) -> float:
+    """文本的确定性哈希，映射到 [0, 1)"""
+    digest = hashlib.md5(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") / 2**64
+
+
+def make_answer(rc, l2_yes_rate: float, l3_grade_max: int):
+    """根据提示词类型生成替身模型的回复"""
+
+    def answer(prompt: str) -> str:
+        for prompts in rc.prompts.values():
+            if prompt.startswith(prompts.l2_batch):
+                lines = prompt[len(prompts.l2_batch) :].splitlines()
+                return "\n".join(
+                    f"{i}:{'Y' if unit(line) < l2_yes_rate else 'N'}"
+                    for i, line in enumerate(lines, 1)
+                )
+            if prompt.startswith(prompts.l2):
+                message = prompt[len(prompts.l2) :]
+                return "Y" if unit(message) < l2_yes_rate else "N"
+        message = prompt.rsplit("\n", 1)[-1]
+        grade = 1 + int(unit("l3:" + message) * l3_grade_max)
+        return json.dumps(
+            {
+                "grade": grade,
+                "reason": "压测：" + message[:40],
+                "keywords": [],
+                "cfd": 0.9,
+            },
+            ensure_ascii=False,
+        )
+
+    return answer
+
+
+class FakeContext:
+    """AstrBot Context 替身"""
+
+    def __init__(self, providers: Optional[Dict[str, FakeProvider]] = None):
+        self.providers = providers or {}
+
+    def get_provider_by_id(self, provider_id: str) -> Optional[FakeProvider]:
+        return self.providers.get(provider_id)
+
+
+class _FakeApi:
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+
+    async def call_action(self, action: str, **payloads) -> dict:
+        await self.client.call(action)
+        if action != "get_group_msg_history":
+            return {}
+        count = payloads.get("count", 10)
+        return {
+            "messages": [
+                {
+                    "message_id": f"hist-{i}",
+                    "sender": {"user_id": 10000 + i % 5},
+                    "raw_message": f"历史消息 {i}",
+                }
+                for i in range(count)
+            ]
+        }
+
+
+class FakeClient:
+    """
+    OneBot 客户端替身，记录 delete_msg / set_group_ban / get_group_msg_history 调用
+
+    :param latency: 单次调用延迟（秒）
+    """
+
+    def __init__(self, latency: float = 0.03):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.api = _FakeApi(self)
+
+    async def call(self, action: str):
+        self.calls[action] += 1
+        await asyncio.sleep(self.latency)
+
+    async def delete_msg(self, **kwargs):
+        await self.call("delete_msg")
+
+    async def set_group_ban(self, **kwargs):
+        # 时长为 0 即解除禁言，单独计数
+        await self.call("set_group_ban" if kwargs.get("duration") else "unban")
+
+
+class _MessageObj:
+    def __init__(self, message_id: str):
+        self.message_id = message_id
+
+
+class FakeEvent:
+    """AiocqhttpMessageEvent 替身"""
+
+    def __init__(
+        self,
+        message: str,
+        group_id: str = "1000",
+        sender_id: str = "20000",
+        message_id: str = "1",
+        client: Optional[FakeClient] = None,
+        self_id: str = "10000",
+    ):
+        self.message_str = message
+        self.group_id = group_id
+        self.sender_id = sender_id
+        self.self_id = self_id
+        self.message_obj = _MessageObj(message_id)
+        self.bot = client or FakeClient()
+        self.replies: List[str] = []
+
+    def get_group_id(self) -> str:
+        return self.group_id
+
+    def get_sender_id(self) -> str:
+        return self.sender_id
+
+    def get_self_id(self) -> str:
+        return self.self_id
+
+    def plain_result(self, text: str) -> str:
+        self.replies.append(text)
+        return text
@@ -1,5 +1,75 @@
-from typing import Dict, List
-from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass, fields, replace
+from functools import cached_property
+import json
+import logging
+
+
+def provider_ids(value: str | List[str]) -> Tuple[str, ...]:
+    """
+    解析模型 ID 列表（逗号分隔，按优先顺序）
+
+    :param value: 模型 ID 配置
+    :return: 模型 ID 列表
+    """
+    if isinstance(value, str):
+        value = value.replace("，", ",").split(",")
+    return tuple(pid.strip() for pid in value if pid and pid.strip())
+
+
+def group_key(group_id: str | int) -> str:
+    """
+    规范化群号（配置中的群号可能为数字，事件中的群号为字符串）
+
+    :param group_id: 群号
+    :return: 规范化后的群号
+    """
+    return str(group_id).strip()
+
+
+@dataclass
+class GroupPolicy:
+    """群组策略（未单独配置的项沿用全局配置）"""
+
+    group_description: str
+    l1_threshold: float
+    l2_llm_id: str
+    l3_llm_id: str
+    context_num: int
+    l3_threshold_alert: int
+    l3_threshold_withdraw: int
+    l3_threshold_ban: int
+    ban_time: int
+
+    @property
+    def llm_id(self) -> str:
+        """获取当前使用的LLM ID，优先使用l2_llm_id"""
+        return self.l2_llm_id or self.l3_llm_id
+
+    @cached_property
+    def l2_providers(self) -> Tuple[str, ...]:
+        """L2 模型 ID 列表（按优先顺序）"""
+        return provider_ids(self.l2_llm_id)
+
+    @cached_property
+    def l3_providers(self) -> Tuple[str, ...]:
+        """L3 模型 ID 列表（按优先顺序）"""
+        return provider_ids(self.l3_llm_id)
+
+    @property
+    def l3_threshold(self) -> float:
+        """获取l3阈值，使用最小值"""
+        return min(
+            self.l3_threshold_alert,
+            self.l3_threshold_withdraw,
+            self.l3_threshold_ban,
+        )
+
+
+POLICY_FIELDS = tuple(field.name for field in fields(GroupPolicy))
+POLICY_TYPES = {field.name: field.type for field in fields(GroupPolicy)}
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -8,20 +78,64 @@ class Config:
 
     is_enable: bool
     white_groups: List[int]
+    flood_window: float
+    flood_user_limit: int
+    flood_group_limit: int
+    dedup_capacity: int
+    dedup_distance: int
     l1_threshold: float
+    l1_high_water: float
+    l1_dilution_window: int
+    l1_category_weights: Dict[str, float]
+    l1_category_gates: Dict[str, float]
+    routing_autotune: bool
+    routing_min_cfd: float
+    reputation: bool
+    reputation_trust_after: int
+    reputation_trusted_threshold: float
+    reputation_half_life_hours: float
+    reputation_act_offenders: bool
+    l1_executor: str
+    l1_workers: int
     group_description: str
     l2_llm_id: str
     l3_llm_id: str
     context_num: int
+    l3_context_budget: int
+    llm_streaming: bool
+    llm_hedge: bool
+    breaker_failures: int
+    breaker_cooldown: float
+    l2_batch_window_ms: int
+    l2_batch_max_size: int
+    llm_max_concurrency: int
+    llm_max_queue: int
+    llm_shed_l1_threshold: float
+    speculative_l1_threshold: float
     l3_threshold_alert: int
     alert_message: str
     l3_threshold_withdraw: int
     l3_threshold_ban: int
     ban_time: int
+    enforce_retries: int
+    provisional_l1_threshold: float
+    provisional_ban_time: int
     llm_rc_rt: str
+    verdict_cache_size: int
+    verdict_cache_ttl: int
+    verdict_cache_persist: bool
+    audit_log: bool
+    audit_log_passes: bool
+    audit_max_mb: int
+    audit_rotate_days: int
+    audit_backups: int
+    metrics_port: int
+    metrics_file: str
     is_display_error: bool
     log_when_gen_l3: bool
     is_dev: bool
+    default_policy: GroupPolicy
+    groups: Dict[str, GroupPolicy]
 
     @property
     def llm_id(self) -> str:
@@ -42,6 +156,127 @@ class Config:
             self.l3_threshold_ban,
         )
 
+    def is_white(self, group_id: str | int) -> bool:
+        """
+        群组是否在白名单中
+
+        :param group_id: 群号
+        :return: 是否在白名单中
+        """
+        return group_key(group_id) in self.groups
+
+    def policy(self, group_id: str | int) -> GroupPolicy:
+        """
+        获取群组策略
+
+        :param group_id: 群号
+        :return: 群组策略，未单独配置时为全局策略
+        """
+        return self.groups.get(group_key(group_id), self.default_policy)
+
+
+def parse_group_profiles(
+    profiles: Dict | str, default: GroupPolicy
+) -> Dict[str, GroupPolicy]:
+    """
+    处理群组策略配置
+
+    :param profiles: 群号到策略项的映射（或其 JSON 文本）
+    :param default: 全局策略
+    :return: 规范化群号到群组策略的映射
+    """
+    if isinstance(profiles, str):
+        if not profiles.strip():
+            return {}
+        try:
+            profiles = json.loads(profiles)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"群组策略配置格式错误：{e}")
+    if not isinstance(profiles, dict):
+        raise ValueError("群组策略配置应为以群号为键的对象")
+
+    groups = {}
+    for group_id, profile in profiles.items():
+        try:
+            groups[group_key(group_id)] = parse_group_profile(profile, default)
+        except ValueError as e:
+            # 策略有误的群仍受监控，按全局策略处理
+            logger.warning(f"群 {group_id} 的策略已忽略，沿用全局策略：{e}")
+            groups[group_key(group_id)] = default
+    return groups
+
+
+def parse_group_profile(profile: Any, default: GroupPolicy) -> GroupPolicy:
+    """
+    校验单个群的策略项，按群组策略中声明的类型转换取值
+
+    :param profile: 策略项
+    :param default: 全局策略
+    :return: 群组策略
+    """
+    if not isinstance(profile, dict):
+        raise ValueError("策略应为对象")
+    unknown = set(profile) - set(POLICY_FIELDS)
+    if unknown:
+        raise ValueError(f"包含未知配置项：{', '.join(sorted(unknown))}")
+    values = {}
+    for name, value in profile.items():
+        kind = POLICY_TYPES[name]
+        if kind is str:
+            if not isinstance(value, (str, int)) or isinstance(value, bool):
+                raise ValueError(f"{name} 应为文本")
+            values[name] = str(value)
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"{name} 应为数字")
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"{name} 应为数字")
+        if not number >= 0:
+            raise ValueError(f"{name} 不能为负数")
+        if kind is int:
+            if not number.is_integer():
+                raise ValueError(f"{name} 应为整数")
+            number = int(number)
+        values[name] = number
+    return replace(default, **values)
+
+
+def parse_l1_categories(
+    categories: Dict | str,
+) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    处理违禁词分类配置
+
+    :param categories: 分类名到 {"weight": 权重, "gate": 门限} 的映射（或其 JSON 文本），值为数字时视为权重
+    :return: (分类权重, 分类门限)
+    """
+    if isinstance(categories, str):
+        if not categories.strip():
+            return {}, {}
+        try:
+            categories = json.loads(categories)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"违禁词分类配置格式错误：{e}")
+    if not isinstance(categories, dict):
+        raise ValueError("违禁词分类配置应为以分类名为键的对象")
+
+    weights, gates = {}, {}
+    for name, item in categories.items():
+        if isinstance(item, (int, float)):
+            item = {"weight": item}
+        if not isinstance(item, dict) or set(item) - {"weight", "gate"}:
+            raise ValueError(f"分类 {name} 的配置应为包含 weight、gate 的对象")
+        try:
+            if "weight" in item:
+                weights[name] = float(item["weight"])
+            if "gate" in item:
+                gates[name] = float(item["gate"])
+        except (TypeError, ValueError):
+            raise ValueError(f"分类 {name} 的权重与门限应为数字")
+    return weights, gates
+
 
 def parse_config(config: Dict) -> Config:
     """
@@ -50,14 +285,43 @@ def parse_config(config: Dict) -> Config:
     :param config: 配置文件
     :return: 处理后的配置对象
     """
-    return Config(
+    parsed = Config(
         is_enable=config.get("enable", False),
         white_groups=config.get("white_groups", []),
+        flood_window=config.get("flood_window", 10),
+        flood_user_limit=config.get("flood_user_limit", 0),
+        flood_group_limit=config.get("flood_group_limit", 0),
+        dedup_capacity=config.get("dedup_capacity", 0),
+        dedup_distance=config.get("dedup_distance", 6),
         l1_threshold=config.get("l1_threshold", 0),
+        l1_high_water=config.get("l1_high_water", 0),
+        l1_dilution_window=config.get("l1_dilution_window", 0),
+        l1_category_weights={},
+        l1_category_gates={},
+        routing_autotune=config.get("routing_autotune", False),
+        routing_min_cfd=config.get("routing_min_cfd", 0.8),
+        reputation=config.get("reputation", False),
+        reputation_trust_after=config.get("reputation_trust_after", 500),
+        reputation_trusted_threshold=config.get("reputation_trusted_threshold", 0.3),
+        reputation_half_life_hours=config.get("reputation_half_life_hours", 72),
+        reputation_act_offenders=config.get("reputation_act_offenders", False),
+        l1_executor=config.get("l1_executor", ""),
+        l1_workers=config.get("l1_workers", 0),
         group_description=config.get("group_description", ""),
         l2_llm_id=config.get("l2_llm_id", ""),
         l3_llm_id=config.get("l3_llm_id", ""),
         context_num=config.get("context_num", 10),
+        l3_context_budget=config.get("l3_context_budget", 1000),
+        llm_streaming=config.get("llm_streaming", True),
+        llm_hedge=config.get("llm_hedge", True),
+        breaker_failures=config.get("breaker_failures", 3),
+        breaker_cooldown=config.get("breaker_cooldown", 30),
+        l2_batch_window_ms=config.get("l2_batch_window_ms", 0),
+        l2_batch_max_size=config.get("l2_batch_max_size", 8),
+        llm_max_concurrency=config.get("llm_max_concurrency", 4),
+        llm_max_queue=config.get("llm_max_queue", 64),
+        llm_shed_l1_threshold=config.get("llm_shed_l1_threshold", 0.5),
+        speculative_l1_threshold=config.get("speculative_l1_threshold", 0),
         l3_threshold_alert=config.get("l3_threshold_alert", 7),
         alert_message=config.get(
             "alert_message", "检测到可能的违规内容，发言请遵守网络道德！"
@@ -65,8 +329,40 @@ def parse_config(config: Dict) -> Config:
         l3_threshold_withdraw=config.get("l3_threshold_withdraw", 7),
         l3_threshold_ban=config.get("l3_threshold_ban", 8),
         ban_time=config.get("ban_time", 10),
+        enforce_retries=config.get("enforce_retries", 2),
+        provisional_l1_threshold=config.get("provisional_l1_threshold", 0),
+        provisional_ban_time=config.get("provisional_ban_time", 5),
         llm_rc_rt=config.get("llm_rc_rt", "contain inappropriate content"),
+        verdict_cache_size=config.get("verdict_cache_size", 0),
+        verdict_cache_ttl=config.get("verdict_cache_ttl", 3600),
+        verdict_cache_persist=config.get("verdict_cache_persist", False),
+        audit_log=config.get("audit_log", False),
+        audit_log_passes=config.get("audit_log_passes", False),
+        audit_max_mb=config.get("audit_max_mb", 64),
+        audit_rotate_days=config.get("audit_rotate_days", 7),
+        audit_backups=config.get("audit_backups", 3),
+        metrics_port=config.get("metrics_port", 0),
+        metrics_file=config.get("metrics_file", ""),
         is_display_error=config.get("display_error", False),
         log_when_gen_l3=config.get("log_when_gen_l3", False),
         is_dev=config.get("dev", False),
+        default_policy=None,
+        groups={},
+    )
+
+    # 违禁词分类权重与门限
+    parsed.l1_category_weights, parsed.l1_category_gates = parse_l1_categories(
+        config.get("l1_categories", "")
+    )
+
+    # 群组策略：白名单中的群沿用全局策略，配置了策略的群同时加入白名单
+    parsed.default_policy = GroupPolicy(
+        **{name: getattr(parsed, name) for name in POLICY_FIELDS}
+    )
+    parsed.groups = {
+        group_key(group_id): parsed.default_policy for group_id in parsed.white_groups
+    }
+    parsed.groups.update(
+        parse_group_profiles(config.get("group_profiles", ""), parsed.default_policy)
     )
+    return parsed
@@ -1,4 +1,6 @@
-from astrbot.api.event import filter
+import asyncio
+
+from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger, AstrBotConfig
 from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
@@ -7,6 +9,7 @@ from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
 
 from .rc import RC
 from .config import parse_config
+from .utils import METRICS
 
 
 @register(
@@ -33,16 +36,85 @@ class RiskControl(Star):
         else:
             logger.warning("风控管理未启动")
 
+        # 运行指标导出
+        if self.config.metrics_port > 0:
+            try:
+                await METRICS.serve(self.config.metrics_port)
+                logger.info(
+                    f"运行指标端点：http://127.0.0.1:{self.config.metrics_port}/metrics"
+                )
+            except OSError as e:
+                logger.error(f"运行指标端点启动失败：{e}")
+        if self.config.metrics_file:
+            METRICS.start_dump(self.config.metrics_file)
+
+    async def terminate(self):
+        # 停止指标导出，释放端口以便重载后重新绑定
+        await METRICS.stop()
+        # 保存用户信誉快照，关闭L1进程池、审计日志与判定缓存（等待后台线程写完，不阻塞事件循环）
+        await asyncio.get_running_loop().run_in_executor(None, RC.close)
+
+    @filter.command_group("rc")
+    def rc(self):
+        """风控管理"""
+        pass
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @rc.command("add")
+    async def rc_add(self, event: AstrMessageEvent, word: str, group_id: str = ""):
+        """添加违禁词，指定群号时仅作用于该群"""
+        try:
+            word = RC.add_stop_word(word, group_id or None)
+        except ValueError as e:
+            yield event.plain_result(str(e))
+            return
+        scope = f"群 {group_id}" if group_id else "全局"
+        yield event.plain_result(f"已添加违禁词（{scope}）：{word}")
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @rc.command("del")
+    async def rc_del(self, event: AstrMessageEvent, word: str, group_id: str = ""):
+        """移除违禁词，指定群号时仅在该群豁免"""
+        try:
+            word = RC.remove_stop_word(word, group_id or None)
+        except ValueError as e:
+            yield event.plain_result(str(e))
+            return
+        scope = f"群 {group_id}" if group_id else "全局"
+        yield event.plain_result(f"已移除违禁词（{scope}）：{word}")
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @rc.command("stats")
+    async def rc_stats(self, event: AstrMessageEvent):
+        """查看运行指标（各阶段耗时、缓存命中、各群判定数）"""
+        yield event.plain_result(RC.get_stats())
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @rc.command("log")
+    async def rc_log(
+        self,
+        event: AstrMessageEvent,
+        group_id: str = "",
+        user_id: str = "",
+        count: int = 10,
+    ):
+        """查询最近的判定记录，群号填 * 表示不限"""
+        yield event.plain_result(
+            RC.query_decisions(group_id.strip("*"), user_id, count)
+        )
+
     @filter.platform_adapter_type(filter.PlatformAdapterType.AIOCQHTTP)
     @filter.event_message_type(filter.EventMessageType.GROUP_MESSAGE)
     async def rc_handler(self, event: AiocqhttpMessageEvent):
         """风控检测"""
         try:
             # 群组白名单
-            group_id = event.get_group_id()
-            if group_id not in self.config.white_groups:
+            if not self.config.is_white(event.get_group_id()):
                 return
 
+            # 消息缓冲
+            RC.record_message(event)
+
             # 风控分析
             async for _yield in RC.handle(event):
                 yield _yield
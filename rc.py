@@ -1,8 +1,10 @@
-from typing import List
+from typing import Callable, List, Sequence
 from pathlib import Path
-from typing import List
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
+import asyncio
 import json
+import re
+import time
 
 from astrbot.api import logger
 from astrbot.api.star import Context
@@ -10,9 +12,45 @@ from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
     AiocqhttpMessageEvent,
 )
 
-from .config import Config
-from .utils import Timer, PromptTool
-from .bc import BotController
+from .config import Config, GroupPolicy, group_key
+from .utils import (
+    Timer,
+    PromptTool,
+    CompiledPrompt,
+    KeywordMatcher,
+    Lexicon,
+    L1Scoring,
+    VerdictCache,
+    GroupHistory,
+    HistRecord,
+    MicroBatcher,
+    L1Executor,
+    FloodGuard,
+    AdaptiveRouter,
+    ROUTE_SKIP,
+    ROUTE_L2,
+    ROUTE_L3,
+    AuditLog,
+    HedgedCaller,
+    VerdictStream,
+    parse_verdict,
+    JSONFieldStream,
+    ReputationStore,
+    TRUSTED,
+    NEUTRAL,
+    SUSPECT,
+    OFFENDER,
+    LLMScheduler,
+    SchedulerOverloaded,
+    Metrics,
+    METRICS,
+    SIZE_BUCKETS,
+)
+from .bc import BotController, Enforcer
+
+# L1/L2 直接判定时的处理方式
+ENFORCE_ALL = ("alert", "withdraw", "ban")
+ACTION_NAMES = {"alert": "提醒", "withdraw": "撤回", "ban": "禁言"}
 
 
 @dataclass
@@ -23,25 +61,179 @@ class L3Result:
     reason: str
     keywords: list[str]
     time: float
+    cfd: float = 1.0
+
+
+@dataclass
+class GroupPrompts:
+    """按群聊主题预编译的提示词"""
+
+    l2: str
+    l2_batch: str
+    l3: CompiledPrompt
+
+    @property
+    def l3_prefix(self) -> str:
+        """L3 提示词的静态前缀（用于判定缓存键）"""
+        return self.l3.prefix
+
+
+class _PendingEnforcement:
+    """在 L3 结果之前开始的撤回/禁言，L3 结果返回后按其确认、补齐或撤销"""
+
+    # 审计日志中的层级与日志中的名称
+    stage = ""
+    label = ""
+
+    def __init__(
+        self, enforcer: Enforcer, event: AiocqhttpMessageEvent, policy: GroupPolicy
+    ):
+        self.enforcer = enforcer
+        self.event = event
+        self.policy = policy
+        self.actions: tuple[str, ...] = ()
+        self.lifted = False
+        self.task: asyncio.Future | None = None
+
+    def _enforce(self, withdraw: bool, ban_time: int):
+        self.actions = tuple(
+            action
+            for action, applied in (("withdraw", withdraw), ("ban", ban_time > 0))
+            if applied
+        )
+        self.task = asyncio.ensure_future(
+            self.enforcer.enforce(self.event, withdraw=withdraw, ban_time=ban_time)
+        )
+        # 取回异常，失败时由 settle 按最终结果重新处理
+        self.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def settle(self, withdraw: bool, ban: bool) -> tuple[str, ...]:
+        """
+        按 L3 结果确认已开始的处理并补齐其余处理，L3 不同意的禁言予以解除
+
+        :param withdraw: 最终是否撤回
+        :param ban: 最终是否禁言
+        :return: 未获确认的处理方式
+        """
+        done = ()
+        if self.task is not None:
+            await asyncio.wait([self.task])
+            if self.task.exception() is None:
+                done = self.actions
+        unconfirmed = tuple(
+            action
+            for action, applied in (("withdraw", withdraw), ("ban", ban))
+            if action in done and not applied
+        )
+        calls = [
+            self.enforcer.enforce(
+                self.event,
+                withdraw=withdraw and "withdraw" not in done,
+                ban_time=self.policy.ban_time if ban else 0,
+            )
+        ]
+        if "ban" in unconfirmed:
+            calls.append(self.enforcer.unban(self.event))
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        # 同一用户仍有其他消息的禁言生效时不解除
+        self.lifted = "ban" in unconfirmed and results[-1] is True
+        return unconfirmed
+
+
+class EarlyEnforcement(_PendingEnforcement):
+    """
+    L3 评级先于其余字段到达时提前开始撤回/禁言
+
+    推测执行的 L3 可能先于 L2 得到评级，须在 L2 判为存疑（或跳过 L2）后才开始；
+    最终结果与提前的处理不一致时由 settle 核对。
+    """
+
+    stage = "early"
+    label = "提前处理"
+
+    def __init__(
+        self, enforcer: Enforcer, event: AiocqhttpMessageEvent, policy: GroupPolicy
+    ):
+        super().__init__(enforcer, event, policy)
+        self.grade: int | None = None
+        self.confirmed = False
+
+    def on_grade(self, grade: int):
+        """收到评级"""
+        self.grade = grade
+        self._start()
+
+    def confirm(self):
+        """L2 已判为存疑"""
+        self.confirmed = True
+        self._start()
+
+    def started(self, withdraw: bool, ban: bool) -> asyncio.Future | None:
+        """
+        获取已提前开始的处理任务
+
+        :param withdraw: 最终是否撤回
+        :param ban: 最终是否禁言
+        :return: 处理方式与最终结果一致时为该任务，否则为空
+        """
+        final = tuple(
+            action
+            for action, applied in (("withdraw", withdraw), ("ban", ban))
+            if applied
+        )
+        if self.task is not None and self.actions == final:
+            return self.task
+        return None
+
+    def _start(self):
+        if self.task is not None or not self.confirmed or self.grade is None:
+            return
+        withdraw = self.grade >= self.policy.l3_threshold_withdraw
+        ban = self.grade >= self.policy.l3_threshold_ban
+        if withdraw or ban:
+            self._enforce(withdraw, self.policy.ban_time if ban else 0)
+
+
+class ProvisionalEnforcement(_PendingEnforcement):
+    """
+    L3 之前的临时处理：立即撤回消息并短时禁言，L3 结果返回后确认、补齐或撤销
+    """
+
+    stage = "provisional"
+    label = "临时处理"
+
+    def __init__(
+        self,
+        enforcer: Enforcer,
+        event: AiocqhttpMessageEvent,
+        policy: GroupPolicy,
+        ban_time: int,
+    ):
+        super().__init__(enforcer, event, policy)
+        self._enforce(True, ban_time)
 
 
 class _RC:
     def __init__(self):
-        # 加载违禁词
-        self.sw_list = []
-        self.load_stop_words("keyword/keywords.txt")
+        # 违禁词库（基础索引首次使用时加载）
+        keyword_dir = Path(__file__).resolve().parent / "keyword"
+        self.lexicon = Lexicon(keyword_dir / ".index", keyword_dir / "overlay.json")
+        self.load_stop_words("keyword/keywords.txt", lazy=True)
 
-        # 加载L2提示词
-        l2_llm_prompt = PromptTool.load_prompt("l2")
-        default_wl = PromptTool.load_prompt("default_wl")
-        l2_llm_prompt = PromptTool.fill(l2_llm_prompt, "default_wl", default_wl)
+        # 加载提示词模板（在 set_bot_params 中填入群聊主题并预编译）
+        self.default_wl = PromptTool.load_prompt("default_wl")
+        self.l2_template = PromptTool.load_prompt("l2")
+        self.l2_batch_template = PromptTool.load_prompt("l2_batch")
+        self.l3_template = PromptTool.load_prompt("l3")
 
-        self.l2_llm_prompt = l2_llm_prompt
+        # 不支持流式输出的模型
+        self.no_stream: set[str] = set()
 
-        # 加载L3提示词
-        l3_llm_prompt = PromptTool.load_prompt("l3")
-        l3_llm_prompt = PromptTool.fill(l3_llm_prompt, "default_wl", default_wl)
-        self.l3_llm_prompt = l3_llm_prompt
+        # 运行指标
+        METRICS.add_collector(self.collect_metrics)
 
     def set_bot_params(self, context: Context = None, config: Config = None):
         """Bot 配置"""
@@ -50,46 +242,293 @@ class _RC:
         if config is not None:
             self.config = config
 
-        topic = (
-            PromptTool.load_prompt("default_topic")
-            if self.config.group_description == ""
-            else self.config.group_description
+        # 预编译提示词：各群按主题渲染一次（主题相同的群共用），处理消息时只需查表
+        default_topic = PromptTool.load_prompt("default_topic")
+        policies = {"": self.config.default_policy, **self.config.groups}
+        compiled = {}
+        self.prompts: dict[str, GroupPrompts] = {}
+        for group_id, policy in policies.items():
+            topic = policy.group_description or default_topic
+            if topic not in compiled:
+                compiled[topic] = self.compile_prompts(topic)
+            self.prompts[group_id] = compiled[topic]
+
+        # 大模型请求调度
+        self.scheduler = LLMScheduler(
+            max_concurrency=self.config.llm_max_concurrency,
+            max_queue=self.config.llm_max_queue,
+        )
+
+        # L2微批处理
+        self.l2_batcher = (
+            MicroBatcher(
+                self.request_l2_batch,
+                window_ms=self.config.l2_batch_window_ms,
+                max_size=self.config.l2_batch_max_size,
+            )
+            if self.config.l2_batch_window_ms > 0
+            else None
+        )
+
+        # L1系数按违禁词分类加权
+        self.lexicon.scoring = L1Scoring(
+            weights=self.config.l1_category_weights,
+            gates=self.config.l1_category_gates,
+            window=self.config.l1_dilution_window,
+        )
+
+        # L1计算卸载
+        if getattr(self, "l1_executor", None) is not None:
+            self.l1_executor.shutdown()
+        self.l1_executor = L1Executor(
+            self.lexicon,
+            mode=self.config.l1_executor,
+            workers=self.config.l1_workers,
+        )
+
+        # 多模型对冲与熔断
+        self.hedger = HedgedCaller(
+            hedge=self.config.llm_hedge,
+            failures=self.config.breaker_failures,
+            cooldown=self.config.breaker_cooldown,
+        )
+
+        # 风控处理调度
+        self.enforcer = Enforcer(retries=self.config.enforce_retries)
+
+        # 按L1系数路由
+        self.router = AdaptiveRouter(
+            floor=self.config.l1_threshold,
+            high_water=self.config.l1_high_water,
+            autotune=self.config.routing_autotune,
+        )
+
+        # 刷屏与近似重复检测
+        self.flood_guard = FloodGuard(
+            window=self.config.flood_window,
+            user_limit=self.config.flood_user_limit,
+            group_limit=self.config.flood_group_limit,
+            capacity=self.config.dedup_capacity,
+            distance=self.config.dedup_distance,
+            ttl=self.config.verdict_cache_ttl,
+        )
+
+        # 群聊消息缓冲
+        self.history = GroupHistory(
+            max(policy.context_num for policy in policies.values())
+        )
+
+        # 审计日志
+        if getattr(self, "audit", None) is not None:
+            self.audit.close()
+        self.audit = (
+            AuditLog(
+                Path(__file__).resolve().parent / ".data" / "audit.db",
+                max_bytes=self.config.audit_max_mb * 1024 * 1024,
+                rotate_seconds=self.config.audit_rotate_days * 86400,
+                backups=self.config.audit_backups,
+            )
+            if self.config.audit_log
+            else None
+        )
+
+        # 用户信誉
+        if getattr(self, "reputation", None) is not None:
+            self.reputation.save()
+        self.reputation = (
+            ReputationStore(
+                Path(__file__).resolve().parent / ".data" / "reputation.bin",
+                half_life=self.config.reputation_half_life_hours * 3600,
+                trust_after=self.config.reputation_trust_after,
+            )
+            if self.config.reputation
+            else None
+        )
+
+        # 判定缓存
+        if getattr(self, "verdict_cache", None) is not None:
+            self.verdict_cache.close()
+        self.verdict_cache = VerdictCache(
+            capacity=self.config.verdict_cache_size,
+            ttl=self.config.verdict_cache_ttl,
+            db_path=(
+                Path(__file__).resolve().parent / ".data" / "verdicts.db"
+                if self.config.verdict_cache_persist
+                else None
+            ),
         )
-        self.l2_llm_prompt = PromptTool.fill(self.l2_llm_prompt, "topic", topic)
-        self.l3_llm_prompt = PromptTool.fill(self.l3_llm_prompt, "topic", topic)
+
+    def close(self):
+        """释放后台资源：保存用户信誉，关闭L1进程池、审计日志与判定缓存"""
+        if getattr(self, "reputation", None) is not None:
+            self.reputation.save()
+        if getattr(self, "l1_executor", None) is not None:
+            self.l1_executor.shutdown()
+        audit, self.audit = getattr(self, "audit", None), None
+        if audit is not None:
+            audit.close()
+        if getattr(self, "verdict_cache", None) is not None:
+            self.verdict_cache.close()
+
+    def compile_prompts(self, topic: str) -> GroupPrompts:
+        """
+        按群聊主题预编译提示词：L2 提示词整体静态，消息直接拼接在末尾；
+        L3 提示词的静态前缀逐字节不变，调用时仅填入上下文与消息
+
+        :param topic: 群聊主题
+        :return: 预编译的提示词
+        """
+        static = {"default_wl": self.default_wl, "topic": topic}
+        return GroupPrompts(
+            l2=PromptTool.compile(self.l2_template, **static).render(),
+            l2_batch=PromptTool.compile(self.l2_batch_template, **static).render(),
+            l3=PromptTool.compile(self.l3_template, **static),
+        )
+
+    def get_prompts(self, group_id: str | int) -> GroupPrompts:
+        """
+        获取群组的预编译提示词
+
+        :param group_id: 群号
+        :return: 预编译的提示词，未单独配置时为全局提示词
+        """
+        return self.prompts.get(group_key(group_id)) or self.prompts[""]
 
     async def handle(self, event: AiocqhttpMessageEvent):
         # 获取消息
         message = event.message_str.strip()
         if not message:
             return
+        group_id = event.get_group_id()
+        policy = self.config.policy(group_id)
+
+        # L0：刷屏与近似重复检测
+        normalized, _ = self.lexicon.normalizer.normalize(message)
+        trace = {"message_hash": AuditLog.digest(normalized)}
+        with METRICS.timer("l0_seconds"):
+            l0 = self.flood_guard.check(group_id, event.get_sender_id(), normalized)
+        if l0.flood:
+            # 刷屏消息不再逐条提醒；仅发言过多时只撤回超限的消息，重复刷屏才禁言
+            actions = (
+                ("withdraw", "ban") if l0.flood == "user_repeat" else ("withdraw",)
+            )
+            self.record_decision(event, "l0", actions, trace=trace)
+            async for _yield in self.apply_actions(event, actions):
+                yield _yield
+            reason = {
+                "user": "用户发言过于频繁",
+                "user_repeat": "用户重复刷屏",
+                "group": "群内刷屏",
+            }[l0.flood]
+            logger.warning(f"触发风控（{reason}） 原文：{message}")
+            return
+        if l0.verdict is not None:
+            self.record_decision(event, "l0", l0.verdict, trace=trace)
+            async for _yield in self.apply_actions(event, l0.verdict):
+                yield _yield
+            if l0.verdict:
+                logger.warning(f"触发风控（与已判定消息近似重复） 原文：{message}")
+            elif self.config.is_dev:
+                logger.info(f"未触发风控（与已放行消息重复） 原文：{message}")
+            return
 
-        # 计算大模型判别系数
-        l1_coefficient, l1_time = (
-            (1.0, 0.0)
-            if self.config.l1_threshold <= 0
-            else self.get_l1_coefficient(message)
+        # 用户信誉：可信用户提高判别阈值，近期违规的用户降低阈值
+        standing = (
+            self.reputation.standing(group_id, event.get_sender_id())
+            if self.reputation is not None
+            else NEUTRAL
         )
-        if l1_coefficient < self.config.l1_threshold:
+        METRICS.inc("reputation_total", standing=standing)
+        threshold = policy.l1_threshold
+        if standing == TRUSTED:
+            threshold = max(threshold, self.config.reputation_trusted_threshold)
+        elif standing in (SUSPECT, OFFENDER):
+            threshold *= 0.5
+
+        # 计算大模型判别系数（阈值为 0 时全部送审，系数仍用于调度优先级与降级判定）
+        l1_coefficient, l1_time = await self.l1_executor.score(message, group_id)
+        METRICS.observe("l1_seconds", l1_time)
+
+        # 按L1系数路由：低水位以下放行，高水位以上跳过L2（多次违规的用户同样跳过L2）
+        route = (
+            ROUTE_L2 if threshold <= 0 else self.router.route(l1_coefficient, threshold)
+        )
+        if standing == OFFENDER and route == ROUTE_L2 and policy.l3_llm_id:
+            route = ROUTE_L3
+        METRICS.inc("routes_total", route=route)
+        trace.update(route=route, l1=l1_coefficient, l1_time=l1_time)
+        if route == ROUTE_SKIP:
+            self.record_decision(event, "l1", (), trace=trace)
             if self.config.is_dev:
                 logger.info(
                     f"未触发风控 (敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s)"
                 )
             return
 
-        # 直接使用一级风控
-        if not self.config.llm_id:
-            yield event.plain_result(self.config.alert_message)
-            await BotController.withdraw(event)
-            await BotController.ban(event, self.config.ban_time)
+        # 多次违规的用户不再调用大模型，直接处理
+        if standing == OFFENDER and self.config.reputation_act_offenders:
+            self.record_decision(event, "rep", ENFORCE_ALL, l0.fingerprint, trace)
+            async for _yield in self.apply_actions(event, ENFORCE_ALL):
+                yield _yield
+            logger.warning(
+                f"触发风控（近期多次违规） (敏感词库分析系数(L1)：{l1_coefficient:.2f}) 原文：{message}"
+            )
+            return
+
+        # 直接使用一级风控（或高于高水位且未配置L3）
+        if not policy.llm_id or (route == ROUTE_L3 and not policy.l3_llm_id):
+            self.record_decision(event, "l1", ENFORCE_ALL, l0.fingerprint, trace)
+            async for _yield in self.apply_actions(event, ENFORCE_ALL):
+                yield _yield
             logger.warning(
                 f"触发风控 (敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s)"
             )
             return
 
+        # 推测执行：L1系数较高时，上下文获取与L3分析与L2同时开始
+        early = EarlyEnforcement(self.enforcer, event, policy)
+        l3_task = None
+        if (
+            route == ROUTE_L2
+            and policy.l3_llm_id
+            and self.config.speculative_l1_threshold > 0
+            and l1_coefficient >= self.config.speculative_l1_threshold
+        ):
+            l3_task = asyncio.create_task(
+                self.get_l3_result(
+                    event, message, l1_coefficient, on_grade=early.on_grade
+                )
+            )
+
         # 二级风控判定
-        l2_discrimination, l2_time = await self.get_l2_discrimination(message)
+        if route == ROUTE_L3:
+            l2_discrimination, l2_time = True, 0.0
+        else:
+            try:
+                l2_discrimination, l2_time = await self.get_l2_discrimination(
+                    message, group_id, l1_coefficient
+                )
+            except SchedulerOverloaded:
+                self.cancel_task(l3_task)
+                async for _yield in self.handle_overload(
+                    event, message, l1_coefficient, l1_time, trace
+                ):
+                    yield _yield
+                return
+            except BaseException:
+                self.cancel_task(l3_task)
+                raise
+        if route == ROUTE_L2:
+            trace.update(l2=int(l2_discrimination), l2_time=l2_time)
+        l2_line = (
+            f"  - 初步判别(L2)：存疑, 模型耗时：{l2_time:.4f}s"
+            if route == ROUTE_L2
+            else "  - 初步判别(L2)：跳过（L1系数高于高水位）"
+        )
         if not l2_discrimination:
+            self.cancel_task(l3_task)
+            self.router.observe(l1_coefficient, False, False)
+            self.record_decision(event, "l2", (), l0.fingerprint, trace)
             if self.config.is_dev:
                 logger.info(
                     "\n".join(
@@ -106,10 +545,11 @@ class _RC:
             return
 
         # 直接使用二级风控
-        if not self.config.l3_llm_id:
-            yield event.plain_result(self.config.alert_message)
-            await BotController.withdraw(event)
-            await BotController.ban(event, self.config.ban_time)
+        if not policy.l3_llm_id:
+            self.router.observe(l1_coefficient, True, True)
+            self.record_decision(event, "l2", ENFORCE_ALL, l0.fingerprint, trace)
+            async for _yield in self.apply_actions(event, ENFORCE_ALL):
+                yield _yield
             logger.warning(
                 "\n".join(
                     [
@@ -117,31 +557,77 @@ class _RC:
                         "——————————",
                         f"原文：{message}",
                         f"  - 敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s",
-                        f"  - 初步判别(L2)：存疑, 模型耗时：{l2_time:.4f}s",
+                        l2_line,
                         "——————————",
                     ]
                 )
             )
             return
 
-        # 三级风控分析
-        l3_result = await self.get_l3_result(event, message)
+        # 临时处理：L1系数较高时不等待L3，先撤回并短时禁言
+        provisional = None
+        if (
+            self.config.provisional_l1_threshold > 0
+            and l1_coefficient >= self.config.provisional_l1_threshold
+        ):
+            provisional = ProvisionalEnforcement(
+                self.enforcer, event, policy, self.config.provisional_ban_time
+            )
+            self.record_step(event, "provisional", provisional.actions, trace)
+            logger.warning(
+                f"临时处理（等待L3确认） (敏感词库分析系数(L1)：{l1_coefficient:.2f}) 原文：{message}"
+            )
+        else:
+            # 三级风控分析（流式输出评级后即开始撤回/禁言）
+            early.confirm()
+        try:
+            l3_result = (
+                await l3_task
+                if l3_task is not None
+                else await self.get_l3_result(
+                    event, message, l1_coefficient, on_grade=early.on_grade
+                )
+            )
+        except Exception as e:
+            pending = provisional or (early if early.task is not None else None)
+            if pending is not None:
+                # L3 不可用（队列已满或调用失败）时保留已开始的处理
+                if not isinstance(e, SchedulerOverloaded):
+                    logger.error(f"风控分析（L3）失败，保留{pending.label}：{e}")
+                self.record_decision(
+                    event, pending.stage, pending.actions, l0.fingerprint, trace
+                )
+                await pending.task
+                return
+            if not isinstance(e, SchedulerOverloaded):
+                raise
+            async for _yield in self.handle_overload(
+                event, message, l1_coefficient, l1_time, trace
+            ):
+                yield _yield
+            return
+        trace.update(
+            l3_grade=l3_result.grade,
+            l3_cfd=l3_result.cfd,
+            l3_reason=l3_result.reason,
+            l3_time=l3_result.time,
+        )
         flag = False
+        is_alert = False
         is_withdraw = False
         is_ban = False
 
         # 撤回阈值
-        if l3_result.grade >= self.config.l3_threshold_withdraw:
-            await BotController.withdraw(event)
+        if l3_result.grade >= policy.l3_threshold_withdraw:
             flag = is_withdraw = True
 
         # 禁言阈值
-        if l3_result.grade >= self.config.l3_threshold_ban:
-            await BotController.ban(event, self.config.ban_time)
+        if l3_result.grade >= policy.l3_threshold_ban:
             flag = is_ban = True
 
         # 提示阈值
-        if l3_result.grade >= self.config.l3_threshold_alert:
+        res = None
+        if l3_result.grade >= policy.l3_threshold_alert:
             res = f"{self.config.alert_message}\n风控理由：{l3_result.reason}"
             # 原文打码
             try:
@@ -161,11 +647,43 @@ class _RC:
             if is_withdraw:
                 res += "、撤回"
             if is_ban:
-                res += f"、封禁({self.config.ban_time}min)"
-            yield event.plain_result(res)
-            flag = True
+                res += f"、封禁({policy.ban_time}min)"
+            flag = is_alert = True
+
+        actions = tuple(
+            action
+            for action, applied in (
+                ("alert", is_alert),
+                ("withdraw", is_withdraw),
+                ("ban", is_ban),
+            )
+            if applied
+        )
+        started = early.started(is_withdraw, is_ban)
+        # 临时处理，或与最终结果不一致的提前处理，按最终结果确认、补齐或撤销
+        pending = provisional or (
+            early if early.task is not None and started is None else None
+        )
+        if pending is not None:
+            started = asyncio.ensure_future(pending.settle(is_withdraw, is_ban))
+            # 无论处理是否成功、消息处理是否被取消，结算完成时均记录
+            started.add_done_callback(
+                lambda task: self.record_settle(event, pending, task, message, trace)
+            )
+        async for _yield in self.apply_actions(event, actions, res, started):
+            yield _yield
 
         # 风控日志
+        self.router.observe(
+            l1_coefficient,
+            True if route == ROUTE_L2 else None,
+            (
+                l3_result.grade >= policy.l3_threshold
+                if l3_result.cfd >= self.config.routing_min_cfd
+                else None
+            ),
+        )
+        self.record_decision(event, "l3", actions, l0.fingerprint, trace)
         if flag:
             logger.warning(
                 "\n".join(
@@ -174,8 +692,8 @@ class _RC:
                         "——————————",
                         f"原文：{message}",
                         f"  - 敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s",
-                        f"  - 初步判别(L2)：存疑, 模型耗时：{l2_time:.4f}s",
-                        f"  - 风控分析系数(L3)：{l3_result.grade}（{l3_result.reason}）, 模型耗时：{l3_result.time:.4f}s",
+                        l2_line,
+                        f"  - 风控分析系数(L3)：{l3_result.grade}（{l3_result.reason}）, 置信度：{l3_result.cfd:.2f}, 模型耗时：{l3_result.time:.4f}s",
                         "——————————",
                     ]
                 )
@@ -191,173 +709,718 @@ class _RC:
                         "——————————",
                         f"原文：{message}",
                         f"  - 敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s",
-                        f"  - 初步判别(L2)：存疑, 模型耗时：{l2_time:.4f}s",
-                        f"  - 风控分析系数(L3)：{l3_result.grade}（{l3_result.reason}）, 模型耗时：{l3_result.time:.4f}s",
+                        l2_line,
+                        f"  - 风控分析系数(L3)：{l3_result.grade}（{l3_result.reason}）, 置信度：{l3_result.cfd:.2f}, 模型耗时：{l3_result.time:.4f}s",
                         "——————————",
                     ]
                 )
             )
             return
 
-    def load_stop_words(self, path: str | None = None) -> list[str]:
+    def record_decision(
+        self,
+        event: AiocqhttpMessageEvent,
+        stage: str,
+        actions: tuple[str, ...],
+        fingerprint: int | None = None,
+        trace: dict | None = None,
+    ):
+        """
+        记录判定结果（指标计数、审计日志，并供近似重复消息继承）
+
+        :param event: 消息事件
+        :param stage: 作出判定的层级
+        :param actions: 采取的处理方式（alert/withdraw/ban），为空表示放行
+        :param fingerprint: L0 检测得到的消息指纹，为空时不供继承
+        :param trace: 各级分析结果与耗时，见 AuditLog 字段
+        """
+        group_id = str(event.get_group_id())
+        METRICS.inc(
+            "decisions_total",
+            group=group_id,
+            stage=stage,
+            result="enforce" if actions else "pass",
+        )
+        self.flood_guard.remember(group_id, fingerprint, actions)
+        # 由信誉直接作出的处理不再计入信誉，避免自我强化
+        if self.reputation is not None and stage != "rep":
+            self.reputation.record(group_id, event.get_sender_id(), actions)
+        # L1 直接放行的消息占绝大多数，默认不写入审计日志
+        if self.audit is not None and (
+            actions or stage != "l1" or self.config.audit_log_passes
+        ):
+            self.audit.record(
+                group_id=group_id,
+                user_id=str(event.get_sender_id()),
+                message_id=str(event.message_obj.message_id),
+                stage=stage,
+                actions=",".join(actions),
+                **(trace or {}),
+            )
+
+    def record_step(
+        self,
+        event: AiocqhttpMessageEvent,
+        step: str,
+        actions: tuple[str, ...],
+        trace: dict | None = None,
+    ):
+        """
+        记录临时处理与撤销（仅计数并写入审计日志，不计入判定结果）
+
+        :param event: 消息事件
+        :param step: provisional（临时处理）/rollback（撤销）/settle_failed（结算失败）
+        :param actions: 涉及的处理方式
+        :param trace: 各级分析结果与耗时，见 AuditLog 字段
+        """
+        METRICS.inc("provisional_total", step=step)
+        if self.audit is not None:
+            self.audit.record(
+                group_id=str(event.get_group_id()),
+                user_id=str(event.get_sender_id()),
+                message_id=str(event.message_obj.message_id),
+                stage=step,
+                actions=",".join(actions),
+                **(trace or {}),
+            )
+
+    def record_settle(
+        self,
+        event: AiocqhttpMessageEvent,
+        pending: _PendingEnforcement,
+        task: asyncio.Future,
+        message: str,
+        trace: dict | None = None,
+    ):
+        """
+        记录临时处理（或提前处理）的结算结果
+
+        :param event: 消息事件
+        :param pending: 临时处理或提前处理
+        :param task: 结算任务
+        :param message: 消息内容
+        :param trace: 各级分析结果与耗时
+        """
+        if task.cancelled() or task.exception() is not None:
+            self.record_step(event, "settle_failed", pending.actions, trace)
+            logger.error(
+                f"{pending.label}结算失败：{'已取消' if task.cancelled() else task.exception()} 原文：{message}"
+            )
+            return
+        unconfirmed = task.result()
+        if not unconfirmed:
+            METRICS.inc("provisional_total", step="confirm")
+            return
+        self.record_step(event, "rollback", unconfirmed, trace)
+        names = "、".join(ACTION_NAMES[action] for action in unconfirmed)
+        if "ban" not in unconfirmed:
+            note = ""
+        elif pending.lifted:
+            note = "，已解除禁言"
+        else:
+            note = "，同一用户仍有其他禁言生效，未解除"
+        logger.warning(f"{pending.label}未获L3确认（{names}）{note} 原文：{message}")
+
+    async def apply_actions(
+        self,
+        event: AiocqhttpMessageEvent,
+        actions: tuple[str, ...],
+        alert: str | None = None,
+        started: asyncio.Future | None = None,
+    ):
+        """
+        按处理方式执行风控，撤回、禁言与提醒同时进行
+
+        :param event: 消息事件
+        :param actions: 处理方式（alert/withdraw/ban）
+        :param alert: 提醒内容，为空时使用配置的提醒信息
+        :param started: 已提前开始的撤回/禁言任务
+        """
+        task = started
+        if task is None and ("withdraw" in actions or "ban" in actions):
+            task = asyncio.ensure_future(
+                self.enforcer.enforce(
+                    event,
+                    withdraw="withdraw" in actions,
+                    ban_time=(
+                        self.config.policy(event.get_group_id()).ban_time
+                        if "ban" in actions
+                        else 0
+                    ),
+                )
+            )
+        try:
+            if "alert" in actions:
+                yield event.plain_result(alert or self.config.alert_message)
+        finally:
+            if task is not None:
+                await task
+
+    @staticmethod
+    def cancel_task(task: asyncio.Task | None):
+        """
+        取消推测执行的任务
+
+        :param task: 任务
+        """
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        # 取回异常，避免未处理异常告警
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def handle_overload(
+        self,
+        event: AiocqhttpMessageEvent,
+        message: str,
+        l1_coefficient: float,
+        l1_time: float,
+        trace: dict | None = None,
+    ):
+        """
+        大模型队列已满时的降级处理：按L1系数直接判定
+
+        :param event: 消息事件
+        :param message: 消息内容
+        :param l1_coefficient: l1风控系数
+        :param l1_time: l1计算耗时
+        :param trace: 各级分析结果与耗时
+        """
+        if l1_coefficient < self.config.llm_shed_l1_threshold:
+            self.record_decision(event, "shed", (), trace=trace)
+            logger.info(
+                f"未触发风控（大模型队列已满，按L1放行） (敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s)"
+            )
+            return
+
+        self.record_decision(event, "shed", ENFORCE_ALL, trace=trace)
+        async for _yield in self.apply_actions(event, ENFORCE_ALL):
+            yield _yield
+        logger.warning(
+            "\n".join(
+                [
+                    "触发风控（大模型队列已满，按L1判定）",
+                    "——————————",
+                    f"原文：{message}",
+                    f"  - 敏感词库分析系数(L1)：{l1_coefficient:.2f}, 计算耗时：{l1_time:.4f}s",
+                    "——————————",
+                ]
+            )
+        )
+
+    def collect_metrics(self, metrics: Metrics):
+        """
+        刷新调度与缓存的仪表值
+
+        :param metrics: 运行指标
+        """
+        scheduler = getattr(self, "scheduler", None)
+        if scheduler is not None:
+            stats = scheduler.stats()
+            metrics.set("llm_queue_depth", stats["queue_depth"])
+            metrics.set("llm_queue_depth_max", stats["queue_depth_max"])
+            for provider_id, in_flight in stats["in_flight"].items():
+                metrics.set("llm_in_flight", in_flight, provider=provider_id)
+        verdict_cache = getattr(self, "verdict_cache", None)
+        if verdict_cache is not None:
+            metrics.set("verdict_cache_hit_ratio", verdict_cache.hit_rate)
+        hedger = getattr(self, "hedger", None)
+        if hedger is not None:
+            for provider_id, breaker in hedger.breakers.items():
+                metrics.set(
+                    "llm_circuit_open", int(breaker.is_open), provider=provider_id
+                )
+        router = getattr(self, "router", None)
+        if router is not None:
+            metrics.set("route_low_water", router.low)
+            metrics.set("route_high_water", router.high)
+        reputation = getattr(self, "reputation", None)
+        if reputation is not None:
+            metrics.set("reputation_users", len(reputation.slots))
+        audit = getattr(self, "audit", None)
+        if audit is not None:
+            metrics.set("audit_written", audit.written)
+            metrics.set("audit_dropped", audit.dropped)
+
+    def get_stats(self) -> str:
+        """
+        运行指标摘要（供管理员指令查看）
+
+        :return: 摘要文本
+        """
+        lines = [METRICS.summary()]
+        scheduler = getattr(self, "scheduler", None)
+        if scheduler is not None:
+            stats = scheduler.stats()
+            lines.append(
+                f"调度：排队 {stats['queue_depth']}（峰值 {stats['queue_depth_max']}）, "
+                f"平均等待 {stats['wait_avg'] * 1000:.1f}ms, "
+                f"最长等待 {stats['wait_max'] * 1000:.1f}ms, 丢弃 {stats['shed']}"
+            )
+        verdict_cache = getattr(self, "verdict_cache", None)
+        if verdict_cache is not None:
+            lines.append(
+                f"判定缓存：命中 {verdict_cache.hits}, 未命中 {verdict_cache.misses}, "
+                f"命中率 {verdict_cache.hit_rate:.1%}"
+            )
+        return "\n".join(lines)
+
+    def query_decisions(
+        self, group_id: str = "", user_id: str = "", count: int = 10
+    ) -> str:
+        """
+        查询最近的判定记录（供管理员指令查看）
+
+        :param group_id: 群号，为空时不限
+        :param user_id: 用户，为空时不限
+        :param count: 条数
+        :return: 记录文本
+        """
+        if self.audit is None:
+            return "审计日志未开启"
+        records = self.audit.query(group_id or None, user_id or None, min(count, 50))
+        if not records:
+            return "暂无判定记录"
+        lines = []
+        for record in records:
+            line = (
+                f"{time.strftime('%m-%d %H:%M:%S', time.localtime(record['ts']))} "
+                f"群{record['group_id']} 用户{record['user_id']} "
+                f"{record['stage'].upper()}"
+            )
+            if record["l1"] is not None:
+                line += f" L1={record['l1']:.2f}"
+            if record["l2"] is not None:
+                line += f" L2={'Y' if record['l2'] else 'N'}"
+            if record["l3_grade"] is not None:
+                line += f" L3={record['l3_grade']}({record['l3_cfd']:.2f})"
+            actions = "、".join(
+                ACTION_NAMES.get(action, action)
+                for action in (record["actions"] or "").split(",")
+                if action
+            )
+            line += f" {actions or '放行'} #{record['message_hash']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        """违禁词匹配器，首次访问时映射预编译索引（缺失时先编译）"""
+        return self.lexicon.base
+
+    @property
+    def sw_list(self) -> Sequence[str]:
+        """违禁词列表"""
+        return self.matcher.words
+
+    def load_stop_words(
+        self, path: str | None = None, lazy: bool = False
+    ) -> Sequence[str]:
         """
         加载违禁词列表
 
         :param path: 违禁词文件路径
+        :param lazy: 是否推迟到首次匹配时再加载索引
         :return: 违禁词列表
         """
-        word_set = self.sw_list or []
-        word_set = set(word_set)
-        try:
-            # 兼容相对路径：相对当前文件目录
-            if not path:
-                path = "keyword/keywords.txt"
-            p = Path(path)
-            if not p.is_absolute():
-                p = Path(__file__).resolve().parent / p
-            with open(p, "r", encoding="utf-8") as file:
-                for line in file:
-                    line = line.strip().lower()
-                    if line:
-                        word_set.add(line)
-        except FileNotFoundError:
+        # 兼容相对路径：相对当前文件目录
+        if not path:
+            path = "keyword/keywords.txt"
+        p = Path(path)
+        if not p.is_absolute():
+            p = Path(__file__).resolve().parent / p
+        if not p.exists():
             raise FileNotFoundError(f"无法找到违禁词文件：{path}")
 
-        self.sw_list = sorted(word_set, key=len, reverse=True)
+        self.lexicon.add_source(p)
+        if lazy:
+            return []
         return self.sw_list
 
-    def get_l1_coefficient(self, message: str) -> tuple[float, float]:
+    def add_stop_word(self, word: str, group_id: str | None = None) -> str:
+        """
+        添加违禁词（增量生效，无需重建索引）
+
+        :param word: 违禁词
+        :param group_id: 群号，为空时作用于全局
+        :return: 规范化后的违禁词
+        """
+        self._check_group(group_id)
+        return self.lexicon.add(word, group_id)
+
+    def remove_stop_word(self, word: str, group_id: str | None = None) -> str:
+        """
+        移除违禁词（增量生效，指定群号时为该群豁免）
+
+        :param word: 违禁词
+        :param group_id: 群号，为空时作用于全局
+        :return: 规范化后的违禁词
+        """
+        self._check_group(group_id)
+        return self.lexicon.remove(word, group_id)
+
+    def _check_group(self, group_id: str | None):
+        if group_id is None:
+            return
+        if not self.config.is_white(group_id):
+            raise ValueError(f"群 {group_id} 不在白名单中")
+
+    def get_l1_coefficient(
+        self, message: str, group_id: str | None = None
+    ) -> tuple[float, float]:
         """
         计算l1风控系数
 
         :param message: 消息内容
+        :param group_id: 群号，用于叠加群组词库
         :return: l1风控系数 (0-1.0)
         """
-        timer = Timer()
+        return self.lexicon.score_many([(message, group_id)])[0]
 
-        # 消息预处理
-        message = message.strip().lower()
-        if not message:
-            return 0.0, timer.end()
-
-        # 检查违禁词
-        rc_list = self.get_rc_list(message)
-        if not rc_list:
-            return 0.0, timer.end()
-
-        # 计算l1系数
-        matched_positions = set()
-        for word in rc_list:
-            start = 0
-            while True:
-                pos = message.find(word, start)
-                if pos == -1:
-                    break
-                for i in range(pos, pos + len(word)):
-                    matched_positions.add(i)
-                start = pos + 1
-        coefficient = min(len(matched_positions) / len(message), 1.0)
+    def get_l1_coefficients(
+        self, messages: list[str], group_id: str | None = None
+    ) -> list[tuple[float, float]]:
+        """
+        批量计算l1风控系数
 
-        return coefficient, timer.end()
+        :param messages: 消息内容列表
+        :param group_id: 群号，用于叠加群组词库
+        :return: (l1风控系数, 计算耗时) 列表
+        """
+        return self.lexicon.score_many((message, group_id) for message in messages)
 
-    def get_rc_list(self, message: str) -> List[str]:
+    def get_rc_list(self, message: str, group_id: str | None = None) -> List[str]:
         """
         解析消息中包含的违禁词
 
         :param message: 待解析的消息
+        :param group_id: 群号，用于叠加群组词库
         :return: 违禁词列表
         """
-        if not self.sw_list:
-            self.load_stop_words()
-
-        rc_list = []
-        matched_positions = set()
-        for sw in self.sw_list:
-            start = 0
-            found = False
-            while True:
-                pos = message.find(sw, start)
-                if pos == -1:
-                    break
-                overlap = False
-                for i in range(pos, pos + len(sw)):
-                    if i in matched_positions:
-                        overlap = True
-                        break
-                if not overlap:
-                    rc_list.append(sw)
-                    found = True
-                    # 标记这些位置为已匹配
-                    for i in range(pos, pos + len(sw)):
-                        matched_positions.add(i)
-                start = pos + 1
-
+        rc_list, _ = self.lexicon.scan(message, group_id)
         return rc_list
 
-    async def get_l2_discrimination(self, message: str) -> tuple[bool, float]:
+    def get_cache_key(self, tier: str, prompt: str, message: str) -> str:
+        """
+        生成判定缓存键（基于规范化后的消息，刷屏时的变体也能命中）
+
+        :param tier: 风控层级
+        :param prompt: 该层级使用的提示词
+        :param message: 消息内容
+        :return: 缓存键
+        """
+        text, _ = self.lexicon.normalizer.normalize(message.strip())
+        return VerdictCache.key(tier, prompt, text)
+
+    def record_message(self, event: AiocqhttpMessageEvent):
+        """
+        将群消息写入消息缓冲
+
+        :param event: 消息事件
+        """
+        self.history.append(
+            event.get_group_id(),
+            HistRecord(
+                message_id=str(event.message_obj.message_id),
+                sender_id=str(event.get_sender_id()),
+                text=event.message_str,
+            ),
+        )
+
+    async def get_context(self, event: AiocqhttpMessageEvent) -> list[str]:
+        """
+        获取上下文消息，优先读取消息缓冲，缓冲未预热时调用接口并回填
+
+        :param event: 消息事件
+        :return: 格式化后的上下文消息
+        """
+        timer = Timer()
+        group_id = event.get_group_id()
+        self_id = str(event.get_self_id())
+        context_num = self.config.policy(group_id).context_num
+        context = self.history.get(group_id, context_num, self_id)
+        source = "buffer"
+        if context is None:
+            records = await BotController.get_hist_records(event, context_num)
+            self.history.seed(group_id, records)
+            context = self.history.get(group_id, context_num, self_id)
+            source = "api"
+        METRICS.observe("history_seconds", timer.end(), source=source)
+        return context
+
+    async def get_l2_discrimination(
+        self, message: str, group_id: str = "", priority: float = 0.0
+    ) -> tuple[bool, float]:
         """
         计算l2风控判别
 
         :param message: 待处理的消息
+        :param group_id: 群号，用于公平排队
+        :param priority: 调度优先级（L1系数）
         :return: l2风控判别
         """
         timer = Timer()
 
-        # 初始化llm模型
-        prov = self.context.get_provider_by_id(provider_id=self.config.l2_llm_id)
-        if not prov:
-            raise ValueError(f"未找到 LLM 模型：{self.config.l2_llm_id}")
+        # 判定缓存
+        cache_key = self.get_cache_key("l2", self.get_prompts(group_id).l2, message)
+        cached = self.verdict_cache.get(cache_key)
+        METRICS.inc(
+            "verdict_cache_total",
+            tier="l2",
+            result="miss" if cached is None else "hit",
+        )
+        if cached is not None:
+            return cached, timer.end()
 
         # 二级风控判断
-        llm_resp = await prov.text_chat(prompt=f"{self.l2_llm_prompt}{message}")
-        llm_resp = llm_resp.completion_text.upper()
-        if "Y" in llm_resp:
-            return True, timer.end()
-        elif "N" in llm_resp:
-            return False, timer.end()
+        if self.l2_batcher is not None:
+            discrimination = await self.l2_batcher.submit((message, group_id, priority))
         else:
-            raise ValueError(f"意料外的风控分析结果：{llm_resp}")
+            discrimination = await self.request_l2(message, group_id, priority)
+        self.verdict_cache.set(cache_key, discrimination)
+        return discrimination, timer.end()
+
+    def get_provider(self, provider_id: str):
+        """获取模型"""
+        prov = self.context.get_provider_by_id(provider_id=provider_id)
+        if not prov:
+            raise ValueError(f"未找到 LLM 模型：{provider_id}")
+        return prov
+
+    async def request_l2(
+        self, message: str, group_id: str = "", priority: float = 0.0
+    ) -> bool:
+        """
+        单条调用L2模型
+
+        :param message: 待处理的消息
+        :param group_id: 群号
+        :param priority: 调度优先级
+        :return: 是否存疑
+        """
+        prompt = f"{self.get_prompts(group_id).l2}{message}"
+        METRICS.observe("prompt_chars", len(prompt), SIZE_BUCKETS, tier="l2")
+
+        async def request(provider_id: str) -> bool:
+            prov = self.get_provider(provider_id)
+            verdict = VerdictStream()
+            async with self.scheduler.slot(provider_id, group_id, priority):
+                with METRICS.timer("llm_seconds", tier="l2"):
+                    llm_resp = await self.chat(provider_id, prov, prompt, verdict.feed)
+            if verdict.verdict is not None:
+                return verdict.verdict
+            result = parse_verdict(llm_resp)
+            if result is None:
+                raise ValueError(f"意料外的风控分析结果：{llm_resp}")
+            return result
+
+        return await self.hedger.call(
+            self.config.policy(group_id).l2_providers, request
+        )
+
+    async def request_l2_batch(
+        self, items: list[tuple[str, str, float]]
+    ) -> list[bool | Exception]:
+        """
+        批量调用L2模型，结果解析失败时回退为逐条调用
+
+        :param items: (消息, 群号, 调度优先级) 列表
+        :return: 各条消息是否存疑（逐条调用失败的为异常对象）
+        """
+        if len(items) == 1:
+            return [await self.request_l2(*items[0])]
+
+        # 模型或主题不同的群分开批处理
+        partitions: dict[tuple[tuple[str, ...], str], list[int]] = {}
+        for index, (_, group_id, _) in enumerate(items):
+            key = (
+                self.config.policy(group_id).l2_providers,
+                self.get_prompts(group_id).l2_batch,
+            )
+            partitions.setdefault(key, []).append(index)
+        if len(partitions) > 1:
+            results: list[bool | Exception] = [None] * len(items)
+            outcomes = await asyncio.gather(
+                *(
+                    self.request_l2_batch([items[i] for i in indices])
+                    for indices in partitions.values()
+                ),
+                return_exceptions=True,
+            )
+            for indices, outcome in zip(partitions.values(), outcomes):
+                for j, index in enumerate(indices):
+                    results[index] = (
+                        outcome if isinstance(outcome, BaseException) else outcome[j]
+                    )
+            return results
+        provider_ids, batch_prompt = next(iter(partitions))
+
+        lines = [
+            f"[{i}] {' '.join(message.split())}"
+            for i, (message, _, _) in enumerate(items, 1)
+        ]
+        prompt = batch_prompt + "\n".join(lines)
+        METRICS.observe("prompt_chars", len(prompt), SIZE_BUCKETS, tier="l2_batch")
+
+        async def request(provider_id: str) -> str:
+            prov = self.get_provider(provider_id)
+            async with self.scheduler.slot(
+                provider_id, items[0][1], max(item[2] for item in items)
+            ):
+                with METRICS.timer("llm_seconds", tier="l2_batch"):
+                    return await self.chat(provider_id, prov, prompt)
+
+        llm_resp = await self.hedger.call(provider_ids, request)
+        answers = {}
+        for index, verdict in re.findall(
+            r"(\d+)\s*[:：.、\]]\s*([YN])", llm_resp.upper()
+        ):
+            answers.setdefault(int(index), verdict == "Y")
+        if all(i in answers for i in range(1, len(items) + 1)):
+            return [answers[i] for i in range(1, len(items) + 1)]
+
+        logger.warning(f"批量判别结果解析失败，回退为逐条判别：{llm_resp}")
+        return await asyncio.gather(
+            *(self.request_l2(*item) for item in items),
+            return_exceptions=True,
+        )
+
+    async def chat(
+        self,
+        provider_id: str,
+        prov,
+        prompt: str,
+        parser: Callable[[str], bool] | None = None,
+    ) -> str:
+        """
+        调用模型：模型支持流式输出且开启了流式解析时边接收边解析，解析得到结果后即结束
+
+        :param provider_id: 模型 ID
+        :param prov: 模型
+        :param prompt: 提示词
+        :param parser: 流式解析函数，参数为输出片段，返回是否可以结束
+        :return: 模型输出（提前结束时为已接收的部分）
+        """
+        stream = getattr(prov, "text_chat_stream", None)
+        if (
+            parser is None
+            or stream is None
+            or not self.config.llm_streaming
+            or provider_id in self.no_stream
+        ):
+            return (await prov.text_chat(prompt=prompt)).completion_text
+
+        text = ""
+        responses = stream(prompt=prompt)
+        try:
+            async for resp in responses:
+                if not getattr(resp, "is_chunk", True):
+                    # 流结束时的完整回复
+                    return resp.completion_text or text
+                chunk = resp.completion_text or ""
+                text += chunk
+                if parser(chunk):
+                    METRICS.inc("llm_early_exit_total", provider=provider_id)
+                    break
+        except NotImplementedError:
+            if text:
+                raise
+            self.no_stream.add(provider_id)
+            return (await prov.text_chat(prompt=prompt)).completion_text
+        finally:
+            close = getattr(responses, "aclose", None)
+            if close is not None:
+                await close()
+        return text
 
     async def get_l3_result(
-        self, event: AiocqhttpMessageEvent, message: str
+        self,
+        event: AiocqhttpMessageEvent,
+        message: str,
+        priority: float = 0.0,
+        context: list[str] | None = None,
+        on_grade: Callable[[int], None] | None = None,
     ) -> L3Result:
         """
         计算l3风控系数
 
         :param message: 待处理的消息
+        :param priority: 调度优先级（L1系数）
+        :param context: 格式化后的上下文消息，为空时按事件获取
+        :param on_grade: 流式输出中评级到达时的回调（先于其余字段）
         :return: l3风控系数
         """
         timer = Timer()
+        group_id = event.get_group_id()
+        policy = self.config.policy(group_id)
+        prompts = self.get_prompts(group_id)
 
-        # 初始化llm模型
-        prov = self.context.get_provider_by_id(provider_id=self.config.l3_llm_id)
-        if not prov:
-            raise ValueError(f"未找到 LLM 模型：{self.config.l3_llm_id}")
+        # 判定缓存
+        cache_key = self.get_cache_key("l3", prompts.l3_prefix, message)
+        cached = self.verdict_cache.get(cache_key)
+        METRICS.inc(
+            "verdict_cache_total",
+            tier="l3",
+            result="miss" if cached is None else "hit",
+        )
+        if cached is not None:
+            return L3Result(**{**cached, "time": timer.end()})
 
         # 风控判断
-        context = await BotController.get_hist_messages(event, self.config.context_num)
-        context_text = "\n".join(context)
-        prompt = PromptTool.fill(self.l3_llm_prompt, "context", context_text)
-        prompt = f"{prompt}{message}"
-        llm_resp = await prov.text_chat(prompt=prompt)
-        llm_resp = llm_resp.completion_text
-        if self.config.llm_rc_rt in llm_resp:
-            return L3Result(
-                grade=self.config.l3_threshold_withdraw,
-                reason="大模型推理至自带的风控范畴",
-                keywords=[],
-                time=timer.end(),
-            )
-        try:
-            llm_resp = json.loads(llm_resp)
-            return L3Result(
-                grade=int(llm_resp.get("grade")),
-                reason=llm_resp.get("reason"),
-                keywords=llm_resp.get("keywords", []),
-                time=timer.end(),
-            )
-        except Exception as e:
-            raise ValueError(f"意料外的风控分析结果：{llm_resp}\n错误信息：{e}")
+        if context is None:
+            context = await self.get_context(event)
+        context = PromptTool.pack(context, self.config.l3_context_budget)
+        prompt = prompts.l3.render(context="\n".join(context)) + message
+        METRICS.observe("prompt_chars", len(prompt), SIZE_BUCKETS, tier="l3")
+
+        # 对冲请求中最先到达的评级（仅用于统计决策耗时）
+        graded = False
+        # 配置了多个模型时评级可能来自随后失败或落选的请求，不提前处理
+        if len(policy.l3_providers) > 1:
+            on_grade = None
+
+        def on_field(key: str, value):
+            nonlocal graded
+            if key != "grade" or graded:
+                return
+            try:
+                grade = int(value)
+            except (TypeError, ValueError):
+                return
+            graded = True
+            METRICS.observe("llm_decision_seconds", timer.end(), tier="l3")
+            if on_grade is not None:
+                on_grade(grade)
+
+        async def request(provider_id: str) -> L3Result:
+            prov = self.get_provider(provider_id)
+            fields = JSONFieldStream(on_field)
+            async with self.scheduler.slot(provider_id, group_id, priority):
+                with METRICS.timer("llm_seconds", tier="l3"):
+                    llm_resp = await self.chat(provider_id, prov, prompt, fields.feed)
+            if self.config.llm_rc_rt in llm_resp:
+                return L3Result(
+                    grade=policy.l3_threshold_withdraw,
+                    reason="大模型推理至自带的风控范畴",
+                    keywords=[],
+                    time=timer.end(),
+                )
+            try:
+                llm_resp = fields.fields if fields.done else json.loads(llm_resp)
+                return L3Result(
+                    grade=int(llm_resp.get("grade")),
+                    reason=llm_resp.get("reason"),
+                    keywords=llm_resp.get("keywords", []),
+                    time=timer.end(),
+                    cfd=float(llm_resp.get("cfd", 1.0)),
+                )
+            except Exception as e:
+                raise ValueError(f"意料外的风控分析结果：{llm_resp}\n错误信息：{e}")
+
+        l3_result = await self.hedger.call(policy.l3_providers, request)
+        self.verdict_cache.set(cache_key, asdict(l3_result))
+        return l3_result
 
 
 RC = _RC()
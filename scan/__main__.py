@@ -0,0 +1,450 @@
+"""
+离线批量扫描：python -m scan EXPORT [选项]（在插件目录下执行）
+
+流式读取导出的聊天记录（.jsonl 或 .csv），以进程池计算 L1 系数；
+可选将达到阈值的消息交给替身模型或本地 OpenAI 兼容接口做 L2/L3 判定（并发有上限），
+逐条结果写入 JSONL，汇总输出为 JSON。用于新群接入、修改违禁词或阈值后重新评估历史消息。
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+import urllib.request
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional, TextIO
+
+from bench.stubs import (
+    PLUGIN_ROOT,
+    FakeContext,
+    FakeEvent,
+    FakeProvider,
+    FakeResponse,
+    load_plugin,
+    make_answer,
+)
+from utils import GroupHistory, HistRecord, L1Scoring, Lexicon
+from utils.offload import _analyze_worker, _init_worker
+
+# 导出文件中各字段的候选列名（按优先级）
+FIELD_ALIASES = {
+    "message": ("message", "text", "raw_message", "content", "message_str"),
+    "group_id": ("group_id", "group", "group_code"),
+    "user_id": ("user_id", "sender_id", "sender", "qq"),
+    "message_id": ("message_id", "id", "msg_id"),
+}
+
+
+class OpenAIProvider:
+    """
+    OpenAI 兼容接口（如本地部署的 vLLM、Ollama），仅依赖标准库
+
+    :param base_url: 接口地址，如 http://127.0.0.1:11434/v1
+    :param model: 模型名
+    :param api_key: 密钥
+    :param timeout: 单次请求超时（秒）
+    """
+
+    def __init__(
+        self, base_url: str, model: str, api_key: str = "", timeout: float = 60
+    ):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def _post(self, prompt: str) -> str:
+        body = json.dumps(
+            {
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0,
+            }
+        ).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=body, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read())
+        return data["choices"][0]["message"]["content"]
+
+    async def text_chat(self, prompt: str = "", **kwargs) -> FakeResponse:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        return FakeResponse(await asyncio.to_thread(self._post, prompt))
+
+
+def pick(item: dict, field: str) -> str:
+    for name in FIELD_ALIASES[field]:
+        value = item.get(name)
+        if value not in (None, ""):
+            return str(value)
+    return ""
+
+
+def read_export(path: str, default_group: str) -> Iterator[dict]:
+    """
+    流式读取导出的聊天记录（由旧到新）
+
+    :param path: .jsonl 或 .csv 文件
+    :param default_group: 记录中没有群号时使用的群号
+    :return: 统一字段的消息记录
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(file)
+        else:
+            rows = (json.loads(line) for line in file if line.strip())
+        for index, item in enumerate(rows):
+            yield {
+                "index": index,
+                "message": pick(item, "message"),
+                "group_id": pick(item, "group_id") or default_group,
+                "user_id": pick(item, "user_id"),
+                "message_id": pick(item, "message_id") or str(index),
+            }
+
+
+def chunked(records: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+class Scanner:
+    """
+    批量扫描流程
+
+    L1 按块交给进程池，在途块数有上限；达到阈值的消息在并发上限内交给大模型，
+    上下文取自导出文件中该消息之前的同群消息。
+    """
+
+    def __init__(self, args: argparse.Namespace, output: TextIO):
+        self.args = args
+        self.output = output
+        self.rc = None
+        self.config = None
+        self.threshold = args.threshold
+        self.history: Optional[GroupHistory] = None
+        self.semaphore = asyncio.Semaphore(max(args.concurrency, 1))
+        self.tasks: set[asyncio.Task] = set()
+
+        self.total = 0
+        self.flagged = 0
+        self.written = 0
+        self.l1_hist = Counter()
+        self.words = Counter()
+        self.stages = Counter()
+        self.actions = Counter()
+        self.grades = Counter()
+        self.errors = 0
+
+    def load_config(self):
+        """按命令行参数加载插件配置（各模式均使用，保证离线与线上的 L1 系数一致）"""
+        load_plugin()
+        from astrbot_plugin_risk_control.config import parse_config
+
+        raw_config = {}
+        if self.args.config:
+            raw_config.update(
+                json.loads(Path(self.args.config).read_text(encoding="utf-8-sig"))
+            )
+        for item in self.args.set:
+            key, _, value = item.partition("=")
+            try:
+                raw_config[key] = json.loads(value)
+            except json.JSONDecodeError:
+                raw_config[key] = value
+        if self.args.llm != "none":
+            raw_config.setdefault("l2_llm_id", "l2")
+            raw_config.setdefault("l3_llm_id", "l3")
+        # 扫描结果不写入线上的审计日志、持久化判定缓存与用户信誉
+        raw_config.update(
+            audit_log=False, verdict_cache_persist=False, reputation=False
+        )
+        self.config = parse_config(raw_config)
+
+    def scoring(self) -> L1Scoring:
+        """
+        按插件配置的分类权重、门限与稀释窗口计算L1
+
+        :return: L1 系数的计算参数
+        """
+        return L1Scoring(
+            weights=self.config.l1_category_weights,
+            gates=self.config.l1_category_gates,
+            window=self.config.l1_dilution_window,
+        )
+
+    def setup_llm(self):
+        """按命令行参数配置模型"""
+        rc_module = load_plugin()
+        policies = [self.config.default_policy, *self.config.groups.values()]
+
+        if self.args.llm == "stub":
+            providers = {
+                "l2": FakeProvider(self.args.stub_latency),
+                "l3": FakeProvider(self.args.stub_latency),
+            }
+        else:
+            providers = {
+                pid: OpenAIProvider(
+                    self.args.base_url, self.args.model, self.args.api_key
+                )
+                for pid in ("l2", "l3")
+            }
+        # 各群组策略中的模型均映射到同一替身或接口
+        providers = {
+            provider_id: provider
+            for tier, provider in providers.items()
+            for policy in policies
+            for provider_id in getattr(policy, f"{tier}_providers")
+        }
+        self.rc = rc_module.RC
+        self.rc.set_bot_params(FakeContext(providers), self.config)
+        if self.args.llm == "stub":
+            answer = make_answer(self.rc, self.args.stub_yes_rate, 10)
+            for provider in providers.values():
+                provider.answer = answer
+        self.history = GroupHistory(max(policy.context_num for policy in policies))
+        self.providers = providers
+
+    def get_threshold(self, group_id: str) -> float:
+        """L1 阈值：命令行指定时统一使用，否则按群组策略"""
+        if self.threshold is not None:
+            return self.threshold
+        return self.config.policy(group_id).l1_threshold
+
+    def write(self, row: dict):
+        if self.args.flagged_only and not row["flagged"]:
+            return
+        self.output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.written += 1
+
+    async def judge(self, row: dict, context: Optional[List[str]]):
+        """对达到阈值的消息做 L2/L3 判定"""
+        policy = self.config.policy(row["group_id"])
+        try:
+            stage, actions = "l1", ("alert", "withdraw", "ban")
+            if policy.l2_llm_id:
+                l2, _ = await self.rc.get_l2_discrimination(
+                    row["message"], row["group_id"], row["l1"]
+                )
+                row["l2"] = l2
+                stage, actions = "l2", actions if l2 else ()
+            if actions and policy.l3_llm_id:
+                event = FakeEvent(
+                    row["message"],
+                    group_id=row["group_id"],
+                    sender_id=row["user_id"],
+                    message_id=row["message_id"],
+                )
+                l3 = await self.rc.get_l3_result(
+                    event, row["message"], row["l1"], context=context or []
+                )
+                row.update(l3_grade=l3.grade, l3_reason=l3.reason, l3_cfd=l3.cfd)
+                self.grades[l3.grade] += 1
+                stage = "l3"
+                actions = tuple(
+                    action
+                    for action, threshold in (
+                        ("alert", policy.l3_threshold_alert),
+                        ("withdraw", policy.l3_threshold_withdraw),
+                        ("ban", policy.l3_threshold_ban),
+                    )
+                    if l3.grade >= threshold
+                )
+            row.update(stage=stage, actions=list(actions))
+            self.stages[stage] += 1
+            self.actions.update(actions)
+        except Exception as e:
+            row["error"] = str(e)
+            self.errors += 1
+        finally:
+            self.semaphore.release()
+        self.write(row)
+
+    async def consume(self, chunk: List[dict], results):
+        results = await results
+        for record, (l1, words) in zip(chunk, results):
+            self.total += 1
+            self.l1_hist[min(int(l1 * 10), 9)] += 1
+            self.words.update(words)
+            flagged = bool(words) and l1 >= self.get_threshold(record["group_id"])
+            row = {**record, "l1": round(l1, 4), "words": words, "flagged": flagged}
+            context = None
+            if self.history is not None:
+                context = self.history.get(
+                    row["group_id"], self.config.policy(row["group_id"]).context_num
+                )
+                self.history.append(
+                    row["group_id"],
+                    HistRecord(row["message_id"], row["user_id"], row["message"]),
+                )
+            if not flagged:
+                self.write(row)
+                continue
+            self.flagged += 1
+            if self.rc is None:
+                self.write(row)
+                continue
+            # 并发达到上限时暂停读取，在途任务数与内存占用有界
+            await self.semaphore.acquire()
+            task = asyncio.create_task(self.judge(row, context))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, records: Iterator[dict], lexicon: Lexicon) -> dict:
+        loop = asyncio.get_running_loop()
+        workers = self.args.workers or os.cpu_count() or 1
+        # 先在主进程编译索引，工作进程直接映射
+        lexicon.base
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(
+                lexicon.paths,
+                lexicon.index_dir,
+                lexicon.overlay_path,
+                lexicon.scoring,
+            ),
+        )
+        start = time.perf_counter()
+        pending = deque()
+        try:
+            for chunk in chunked(records, self.args.chunk):
+                items = [(record["message"], record["group_id"]) for record in chunk]
+                pending.append(
+                    (chunk, loop.run_in_executor(pool, _analyze_worker, items))
+                )
+                if len(pending) > workers * 2:
+                    await self.consume(*pending.popleft())
+            while pending:
+                await self.consume(*pending.popleft())
+            scan_elapsed = time.perf_counter() - start
+            if self.tasks:
+                await asyncio.gather(*self.tasks)
+        finally:
+            pool.shutdown(cancel_futures=True)
+        elapsed = time.perf_counter() - start
+
+        summary = {
+            "messages": self.total,
+            "flagged": self.flagged,
+            "flagged_rate": self.flagged / self.total if self.total else 0.0,
+            "threshold": self.threshold,
+            "l1_histogram": {
+                f"{k / 10:.1f}-{(k + 1) / 10:.1f}": self.l1_hist[k] for k in range(10)
+            },
+            "top_words": dict(self.words.most_common(self.args.top)),
+            "written": self.written,
+            "elapsed_sec": elapsed,
+            # 读取与 L1 阶段（开启大模型判定时受并发上限限制）
+            "scan_elapsed_sec": scan_elapsed,
+            "msgs_per_min": self.total / scan_elapsed * 60 if scan_elapsed else 0.0,
+            "workers": workers,
+        }
+        if self.rc is not None:
+            summary.update(
+                stages=dict(self.stages),
+                actions=dict(self.actions),
+                l3_grades={str(k): v for k, v in sorted(self.grades.items())},
+                llm_calls={pid: p.calls for pid, p in self.providers.items()},
+                errors=self.errors,
+            )
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m scan", description=__doc__)
+    parser.add_argument("export", help="导出的聊天记录（.jsonl 或 .csv）")
+    parser.add_argument("--output", help="逐条结果文件（JSONL，默认不输出）")
+    parser.add_argument("--summary", help="汇总输出文件（默认输出到标准输出）")
+    parser.add_argument(
+        "--flagged-only", action="store_true", help="只输出达到阈值的消息"
+    )
+    parser.add_argument("--group", default="0", help="记录中没有群号时使用的群号")
+    parser.add_argument(
+        "--keywords",
+        action="append",
+        default=[],
+        help="违禁词文件，可重复（默认 keyword/keywords.txt）",
+    )
+    parser.add_argument(
+        "--threshold", type=float, help="L1 阈值（默认按插件配置及群组策略）"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0, help="L1 进程数（默认 CPU 核数）"
+    )
+    parser.add_argument("--chunk", type=int, default=2000, help="每块消息数")
+    parser.add_argument("--top", type=int, default=20, help="汇总中列出的高频违禁词数")
+    parser.add_argument(
+        "--llm",
+        choices=("none", "stub", "openai"),
+        default="none",
+        help="达到阈值的消息交给替身模型或 OpenAI 兼容接口做 L2/L3 判定",
+    )
+    parser.add_argument(
+        "--base-url", default="http://127.0.0.1:11434/v1", help="接口地址"
+    )
+    parser.add_argument("--model", default="", help="模型名")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", ""))
+    parser.add_argument("--concurrency", type=int, default=8, help="同时判定的消息数")
+    parser.add_argument(
+        "--stub-latency", type=float, default=0.0, help="替身模型延迟（秒）"
+    )
+    parser.add_argument(
+        "--stub-yes-rate", type=float, default=0.3, help="替身模型 L2 存疑比例"
+    )
+    parser.add_argument("--config", help="插件配置文件（JSON）")
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="覆盖插件配置项（VALUE 按 JSON 解析），可重复",
+    )
+    args = parser.parse_args()
+    if args.llm == "openai" and not args.model:
+        parser.error("--llm openai 需要指定 --model")
+
+    keyword_dir = PLUGIN_ROOT / "keyword"
+    lexicon = Lexicon(keyword_dir / ".index", keyword_dir / "overlay.json")
+    for path in args.keywords or [keyword_dir / "keywords.txt"]:
+        lexicon.add_source(Path(path).resolve())
+
+    output = (
+        open(args.output, "w", encoding="utf-8")
+        if args.output
+        else open(os.devnull, "w", encoding="utf-8")
+    )
+    try:
+        scanner = Scanner(args, output)
+        scanner.load_config()
+        lexicon.scoring = scanner.scoring()
+        if args.llm != "none":
+            scanner.setup_llm()
+        records = read_export(args.export, args.group)
+        summary = asyncio.run(scanner.run(records, lexicon))
+    finally:
+        output.close()
+
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.summary:
+        Path(args.summary).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if summary.get("errors"):
+        print(f"{summary['errors']} 条消息判定失败", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
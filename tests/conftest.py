@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.stubs import load_plugin  # noqa: E402
+
+# 以包的形式加载插件（与 AstrBot 一致，不依赖插件目录名），astrbot 依赖以压测替身注入
+load_plugin()
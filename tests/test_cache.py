@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import VerdictCache
+from astrbot_plugin_risk_control.utils import cache as cache_module
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的时钟"""
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def test_key_separates_parts():
+    key = VerdictCache.key
+    assert key("l2", "提示词", "消息") == key("l2", "提示词", "消息")
+    assert key("l2", "提示词", "消息") != key("l3", "提示词", "消息")
+    assert key("l2", "ab", "c") != key("l2", "a", "bc")
+
+
+def test_lru_eviction(clock):
+    cache = VerdictCache(capacity=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_expiry(clock):
+    cache = VerdictCache(ttl=60)
+    cache.set("a", {"grade": 3})
+    clock.now += 60
+    assert cache.get("a") == {"grade": 3}
+    clock.now += 1
+    assert cache.get("a") is None
+    assert "a" not in cache.items
+
+
+def test_hit_rate(clock):
+    cache = VerdictCache()
+    assert cache.hit_rate == 0.0
+    cache.set("a", True)
+    cache.get("a")
+    cache.get("b")
+    assert cache.hit_rate == 0.5
+
+
+def test_disabled_when_capacity_is_zero(clock, tmp_path):
+    cache = VerdictCache(capacity=0, db_path=tmp_path / "verdicts.db")
+    cache.set("a", True)
+    assert cache.get("a") is None
+    assert cache.db is None
+
+
+def test_persisted_verdicts_are_shared(clock, tmp_path):
+    path = tmp_path / "verdicts.db"
+    writer = VerdictCache(ttl=60, db_path=path)
+    writer.set("a", [True, 0.5])
+    reader = VerdictCache(ttl=60, db_path=path)
+    assert reader.get("a") == [True, 0.5]
+    # 命中后写入内存层
+    assert "a" in reader.items
+
+    clock.now += 61
+    assert VerdictCache(ttl=60, db_path=path).get("a") is None
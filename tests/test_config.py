@@ -0,0 +1,87 @@
+import logging
+
+import pytest
+
+from astrbot_plugin_risk_control.config import parse_config
+
+
+def test_default_policy_follows_global_config():
+    config = parse_config({"ban_time": 20, "l1_threshold": 0.3, "white_groups": [123]})
+    policy = config.policy("999")
+    assert policy is config.default_policy
+    assert (policy.ban_time, policy.l1_threshold) == (20, 0.3)
+    assert config.is_white(123) and config.is_white("123")
+    assert not config.is_white("999")
+
+
+def test_group_profiles_override_global_values():
+    config = parse_config(
+        {
+            "ban_time": 20,
+            "l3_threshold_alert": 5,
+            "group_profiles": '{"456": {"ban_time": 30, "l3_threshold_alert": 3}}',
+        }
+    )
+    policy = config.policy(456)
+    assert config.is_white("456")
+    assert policy.ban_time == 30
+    assert policy.l3_threshold == 3
+    assert policy.l1_threshold == config.default_policy.l1_threshold
+    assert config.policy("123").ban_time == 20
+
+
+def test_group_profiles_accept_objects():
+    config = parse_config(
+        {"group_profiles": {" 456 ": {"group_description": "游戏群"}}}
+    )
+    assert config.policy("456").group_description == "游戏群"
+
+
+def test_empty_group_profiles():
+    assert parse_config({"group_profiles": "  "}).groups == {}
+
+
+@pytest.mark.parametrize("profiles", ["{not json", "[1, 2]"])
+def test_invalid_group_profiles(profiles):
+    with pytest.raises(ValueError):
+        parse_config({"group_profiles": profiles})
+
+
+def test_profile_values_are_coerced():
+    config = parse_config(
+        {
+            "group_profiles": {
+                "456": {
+                    "ban_time": "30",
+                    "context_num": 5.0,
+                    "l1_threshold": "0.2",
+                    "l2_llm_id": 7,
+                }
+            }
+        }
+    )
+    policy = config.policy("456")
+    assert policy.ban_time == 30 and isinstance(policy.ban_time, int)
+    assert policy.context_num == 5 and isinstance(policy.context_num, int)
+    assert policy.l1_threshold == 0.2
+    assert policy.l2_llm_id == "7"
+
+
+@pytest.mark.parametrize(
+    "profile",
+    [
+        [1],
+        {"unknown": 1},
+        {"ban_time": "x"},
+        {"ban_time": True},
+        {"ban_time": 2.5},
+        {"l1_threshold": -0.1},
+        {"l2_llm_id": ["a"]},
+    ],
+)
+def test_invalid_profile_falls_back_to_global_policy(profile, caplog):
+    with caplog.at_level(logging.WARNING):
+        config = parse_config({"ban_time": 20, "group_profiles": {"456": profile}})
+    assert config.is_white("456")
+    assert config.policy("456") is config.default_policy
+    assert "456" in caplog.text
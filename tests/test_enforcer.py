@@ -0,0 +1,221 @@
+import asyncio
+import types
+
+import pytest
+
+from astrbot_plugin_risk_control import bc
+from astrbot_plugin_risk_control.bc import Enforcer
+from bench.stubs import FakeClient, FakeEvent
+
+
+def _events(client, *message_ids, sender_id="20000"):
+    return [
+        FakeEvent("消息", sender_id=sender_id, message_id=message_id, client=client)
+        for message_id in message_ids
+    ]
+
+
+class FlakyClient(FakeClient):
+    """前几次调用以断连失败"""
+
+    def __init__(self, failures: int):
+        super().__init__(latency=0)
+        self.failures = failures
+
+    async def call(self, action: str):
+        await super().call(action)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("断开连接")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的单调时钟"""
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(bc, "time", clock)
+    return clock
+
+
+def test_concurrent_bans_coalesce():
+    async def main():
+        client = FakeClient(latency=0.01)
+        enforcer = Enforcer()
+        a, b, c = _events(client, "1", "2", "3")
+        await asyncio.gather(
+            enforcer.enforce(a, withdraw=True, ban_time=10),
+            enforcer.enforce(b, withdraw=True, ban_time=10),
+            enforcer.enforce(c, withdraw=True, ban_time=5),
+        )
+        return client.calls
+
+    calls = asyncio.run(main())
+    assert calls["set_group_ban"] == 1
+    assert calls["delete_msg"] == 3
+
+
+def test_expired_ban_is_issued_again(clock):
+    async def main():
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        a, b = _events(client, "1", "2")
+        await enforcer.ban(a, 10)
+        clock.now += 10 * 60
+        await enforcer.ban(b, 10)
+        return client.calls
+
+    assert asyncio.run(main())["set_group_ban"] == 2
+
+
+def test_longer_ban_is_not_coalesced():
+    async def main():
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        a, b = _events(client, "1", "2")
+        await enforcer.ban(a, 5)
+        await enforcer.ban(b, 10)
+        return client.calls
+
+    assert asyncio.run(main())["set_group_ban"] == 2
+
+
+def test_ban_coalesced_by_remaining_time(clock):
+    async def main(elapsed):
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        a, b = _events(client, "1", "2")
+        await enforcer.ban(a, 10)
+        clock.now += elapsed * 60
+        await enforcer.ban(b, 5)
+        return client.calls["set_group_ban"]
+
+    # 剩余 6 分钟足以覆盖 5 分钟禁言；剩余 4 分钟时重新禁言
+    assert asyncio.run(main(4)) == 1
+    assert asyncio.run(main(6)) == 2
+
+
+def test_withdraw_once_per_message():
+    async def main():
+        client = FakeClient(latency=0.01)
+        enforcer = Enforcer()
+        a, again = _events(client, "1", "1")
+        await asyncio.gather(enforcer.withdraw(a), enforcer.withdraw(again))
+        return client.calls
+
+    assert asyncio.run(main())["delete_msg"] == 1
+
+
+def test_transient_errors_are_retried():
+    async def main():
+        client = FlakyClient(failures=2)
+        enforcer = Enforcer(retries=2, backoff=0)
+        (a,) = _events(client, "1")
+        await enforcer.ban(a, 10)
+        return client.calls
+
+    assert asyncio.run(main())["set_group_ban"] == 3
+
+
+def test_failed_ban_is_not_coalesced():
+    async def main():
+        client = FlakyClient(failures=2)
+        enforcer = Enforcer(retries=1, backoff=0)
+        a, b = _events(client, "1", "2")
+        with pytest.raises(ConnectionError):
+            await enforcer.ban(a, 10)
+        await enforcer.ban(b, 10)
+        return client.calls
+
+    assert asyncio.run(main())["set_group_ban"] == 3
+
+
+def test_unban_waits_for_all_holders():
+    async def main():
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        a, b = _events(client, "1", "2")
+        await enforcer.ban(a, 10)
+        await enforcer.ban(b, 10)
+        first = await enforcer.unban(a)
+        assert client.calls["unban"] == 0
+        second = await enforcer.unban(b)
+        return first, second, client.calls
+
+    first, second, calls = asyncio.run(main())
+    assert (first, second) == (False, True)
+    assert calls["unban"] == 1
+
+
+def test_unban_keeps_superseding_ban():
+    async def main():
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        a, b = _events(client, "1", "2")
+        await enforcer.ban(a, 5)
+        await enforcer.ban(b, 10)
+        lifted = await enforcer.unban(a)
+        return lifted, client.calls
+
+    lifted, calls = asyncio.run(main())
+    assert not lifted
+    assert calls["unban"] == 0
+
+
+def test_unban_is_per_user():
+    async def main():
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        (a,) = _events(client, "1")
+        (b,) = _events(client, "2", sender_id="20001")
+        await enforcer.ban(a, 10)
+        await enforcer.ban(b, 10)
+        return await enforcer.unban(a), await enforcer.unban(a), client.calls
+
+    lifted, again, calls = asyncio.run(main())
+    assert lifted and not again
+    assert calls["set_group_ban"] == 2
+    assert calls["unban"] == 1
+
+
+def test_unban_waits_for_inflight_ban():
+    async def main():
+        client = FakeClient(latency=0.02)
+        enforcer = Enforcer()
+        (a,) = _events(client, "1")
+        ban = asyncio.ensure_future(enforcer.ban(a, 10))
+        await asyncio.sleep(0)
+        lifted = await enforcer.unban(a)
+        await ban
+        return lifted, client.calls
+
+    lifted, calls = asyncio.run(main())
+    assert lifted
+    assert calls["set_group_ban"] == calls["unban"] == 1
+
+
+def test_ban_after_unban_is_issued_again():
+    async def main():
+        client = FakeClient(latency=0)
+        enforcer = Enforcer()
+        a, b = _events(client, "1", "2")
+        await enforcer.ban(a, 10)
+        await enforcer.unban(a)
+        await enforcer.ban(b, 10)
+        return client.calls
+
+    assert asyncio.run(main())["set_group_ban"] == 2
+
+
+def test_failed_ban_is_not_lifted():
+    async def main():
+        client = FlakyClient(failures=5)
+        enforcer = Enforcer(retries=1, backoff=0)
+        (a,) = _events(client, "1")
+        with pytest.raises(ConnectionError):
+            await enforcer.ban(a, 10)
+        return await enforcer.unban(a), client.calls
+
+    lifted, calls = asyncio.run(main())
+    assert not lifted
+    assert calls["unban"] == 0
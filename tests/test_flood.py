@@ -0,0 +1,81 @@
+import hashlib
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import FloodGuard, simhash
+from astrbot_plugin_risk_control.utils import flood
+
+TEXT = "今晚八点在群里开黑，有没有一起打排位的朋友，来的话私聊我拉你进队伍"
+NEAR = TEXT + "！"
+OTHERS = [
+    "明天早上的会议改到十点，请大家相互转告一下",
+    "这个版本的更新日志写得真详细，点个赞支持作者",
+    "有人知道附近哪里有好吃的火锅店吗？求推荐",
+    "周末去爬山的同学记得带够水和防晒用品哦",
+    "刚看完那部电影，结局完全没想到，强烈推荐",
+]
+
+
+@pytest.fixture(autouse=True)
+def stable_hash(monkeypatch):
+    """字符串哈希随进程随机化，固定为稳定哈希使指纹距离可复现"""
+
+    def stable(value):
+        digest = hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8)
+        return int.from_bytes(digest.digest(), "little")
+
+    monkeypatch.setattr(flood, "hash", stable, raising=False)
+
+
+def test_simhash_distances():
+    assert simhash(TEXT) == simhash(TEXT)
+    assert 0 < (simhash(TEXT) ^ simhash(NEAR)).bit_count() <= 6
+    for other in OTHERS:
+        assert (simhash(TEXT) ^ simhash(other)).bit_count() > 6
+
+
+def test_user_limit_disabled_by_default():
+    guard = FloodGuard()
+    for _ in range(20):
+        assert guard.check("g", "u", TEXT).flood == ""
+
+
+def test_user_flood_distinguishes_repeats():
+    guard = FloodGuard(user_limit=3)
+    floods = [guard.check("g", "u", text).flood for text in OTHERS[:4]]
+    assert floods == ["", "", "", "user"]
+
+    guard = FloodGuard(user_limit=3)
+    floods = [guard.check("g", "u", TEXT).flood for _ in range(4)]
+    assert floods == ["", "", "", "user_repeat"]
+    # 频率按用户计数
+    assert guard.check("g", "other", TEXT).flood == ""
+
+
+def test_group_flood_requires_repeat():
+    guard = FloodGuard(group_limit=2)
+    floods = [
+        guard.check("g", f"u{i}", text).flood for i, text in enumerate(OTHERS[:3])
+    ]
+    assert floods == ["", "", ""]
+    assert guard.check("g", "u9", OTHERS[0]).flood == "group"
+
+
+def test_near_duplicates_inherit_violations_only():
+    guard = FloodGuard()
+    check = guard.check("g", "u", TEXT)
+    guard.remember("g", check.fingerprint, True)
+    assert guard.check("g", "u", NEAR).verdict is True
+    # 不同群互不影响
+    assert guard.check("h", "u", TEXT).verdict is None
+
+    guard = FloodGuard()
+    check = guard.check("g", "u", TEXT)
+    guard.remember("g", check.fingerprint, False)
+    assert guard.check("g", "u", TEXT).verdict is False
+    assert guard.check("g", "u", NEAR).verdict is None
+
+
+def test_short_messages_are_not_fingerprinted():
+    guard = FloodGuard()
+    assert guard.check("g", "u", "哈哈哈").fingerprint is None
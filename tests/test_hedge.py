@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import (
+    CircuitBreaker,
+    HedgedCaller,
+    SchedulerOverloaded,
+)
+
+
+def _warm(caller, provider_id, latency=0.01):
+    """填充足够的耗时样本，使对冲等待时间为 latency"""
+    breaker = caller.breaker(provider_id)
+    for _ in range(caller.min_samples):
+        breaker.success(latency)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown=60)
+    assert not breaker.failure()
+    assert not breaker.failure()
+    breaker.success(0.1)
+    assert not breaker.failure()
+    assert not breaker.failure()
+    assert breaker.failure()
+    assert breaker.is_open
+
+
+def test_breaker_recovers_on_success():
+    breaker = CircuitBreaker(failures=1, cooldown=60)
+    breaker.failure()
+    assert breaker.is_open
+    breaker.success(0.1)
+    assert not breaker.is_open
+    assert breaker.failures == 0
+
+
+def test_quantile_needs_samples():
+    breaker = CircuitBreaker()
+    for latency in range(1, 10):
+        breaker.success(latency)
+    assert breaker.quantile(0.95) is None
+    breaker.success(10)
+    assert breaker.quantile(0.95) == 10
+    assert breaker.quantile(0.5) == 6
+
+
+def test_candidates_skip_open_breakers():
+    caller = HedgedCaller()
+    caller.breaker("b").open_until = time.monotonic() + 60
+    assert caller.candidates(["a", "b", "c"]) == ["a", "c"]
+    # 全部熔断时试探冷却最先结束的一个
+    caller.breaker("a").open_until = time.monotonic() + 90
+    caller.breaker("c").open_until = time.monotonic() + 30
+    assert caller.candidates(["a", "b", "c"]) == ["c"]
+
+
+def test_failure_falls_through_to_next_provider():
+    caller = HedgedCaller(failures=1)
+    calls = []
+
+    async def request(provider_id):
+        calls.append(provider_id)
+        if provider_id == "a":
+            raise RuntimeError("down")
+        return provider_id
+
+    assert asyncio.run(caller.call(["a", "b"], request)) == "b"
+    assert calls == ["a", "b"]
+    assert caller.breaker("a").is_open
+    assert caller.candidates(["a", "b"]) == ["b"]
+
+
+def test_slow_provider_is_hedged():
+    caller = HedgedCaller()
+    _warm(caller, "a")
+    cancelled = []
+
+    async def request(provider_id):
+        try:
+            await asyncio.sleep(1 if provider_id == "a" else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(provider_id)
+            raise
+        return provider_id
+
+    assert asyncio.run(caller.call(["a", "b"], request)) == "b"
+    assert cancelled == ["a"]
+
+
+def test_no_hedge_without_latency_samples():
+    caller = HedgedCaller()
+    calls = []
+
+    async def request(provider_id):
+        calls.append(provider_id)
+        await asyncio.sleep(0.02)
+        return provider_id
+
+    assert asyncio.run(caller.call(["a", "b"], request)) == "a"
+    assert calls == ["a"]
+
+
+def test_all_failures_raise_first_error():
+    caller = HedgedCaller()
+
+    async def request(provider_id):
+        raise RuntimeError(provider_id)
+
+    with pytest.raises(RuntimeError, match="a"):
+        asyncio.run(caller.call(["a", "b"], request))
+    assert caller.breaker("a").failures == caller.breaker("b").failures == 1
+
+
+def test_overload_is_not_a_provider_failure():
+    caller = HedgedCaller(failures=1)
+
+    async def request(provider_id):
+        raise SchedulerOverloaded()
+
+    with pytest.raises(SchedulerOverloaded):
+        asyncio.run(caller.call(["a"], request))
+    assert not caller.breaker("a").is_open
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import Lexicon
+
+
+@pytest.fixture
+def lexicon(tmp_path):
+    source = tmp_path / "keywords.txt"
+    source.write_text("苹果手机\n加微信\n", encoding="utf-8")
+    lexicon = Lexicon(tmp_path / "index", tmp_path / "overlay.json")
+    lexicon.add_source(source)
+    return lexicon
+
+
+def test_base_index(lexicon):
+    assert lexicon.scan("加微信买苹果手机") == (["苹果手机", "加微信"], 7)
+
+
+def test_global_add_and_remove(lexicon):
+    lexicon.add("代开发票")
+    assert lexicon.scan("代开发票") == (["代开发票"], 4)
+    lexicon.remove("加微信")
+    assert lexicon.scan("加微信") == ([], 0)
+    # 移除后重新添加即恢复
+    lexicon.add("加微信")
+    assert lexicon.scan("加微信") == (["加微信"], 3)
+    lexicon.remove("代开发票")
+    assert lexicon.scan("代开发票") == ([], 0)
+
+
+def test_group_extra_and_suppressed(lexicon):
+    lexicon.add("代开发票", group_id=100)
+    lexicon.remove("加微信", group_id=100)
+    assert lexicon.scan("代开发票，加微信", 100) == (["代开发票"], 4)
+    # 其他群与全局不受影响
+    assert lexicon.scan("代开发票，加微信", 200) == (["加微信"], 3)
+    assert lexicon.scan("代开发票，加微信") == (["加微信"], 3)
+
+
+def test_group_suppresses_global_additions(lexicon):
+    lexicon.add("代开发票")
+    lexicon.remove("代开发票", group_id="100")
+    assert lexicon.scan("代开发票", "100") == ([], 0)
+    assert lexicon.scan("代开发票", "200") == (["代开发票"], 4)
+
+
+def test_overlay_is_persisted(lexicon, tmp_path):
+    lexicon.add("代开发票")
+    lexicon.remove("加微信")
+    lexicon.remove("苹果手机", group_id=100)
+    data = json.loads((tmp_path / "overlay.json").read_text(encoding="utf-8"))
+    assert data["add"] == ["代开发票"]
+    assert data["remove"] == ["加微信"]
+    assert data["groups"] == {"100": {"add": [], "suppress": ["苹果手机"]}}
+
+    reloaded = Lexicon(tmp_path / "index", tmp_path / "overlay.json")
+    reloaded.add_source(tmp_path / "keywords.txt")
+    assert reloaded.scan("代开发票加微信") == (["代开发票"], 4)
+    assert reloaded.scan("苹果手机", 100) == ([], 0)
+
+
+def test_empty_word_is_rejected(lexicon):
+    with pytest.raises(ValueError):
+        lexicon.add("  ")
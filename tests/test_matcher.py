@@ -0,0 +1,155 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import KeywordMatcher, TextNormalizer
+from astrbot_plugin_risk_control.utils.matcher import keyword_problem, parse_keywords
+
+
+def get_rc_list(sw_list, message):
+    """原 RC.get_rc_list：按词条顺序逐个查找，跳过与已选命中重叠的位置"""
+    rc_list = []
+    matched_positions = set()
+    for sw in sw_list:
+        start = 0
+        while True:
+            pos = message.find(sw, start)
+            if pos == -1:
+                break
+            if not any(i in matched_positions for i in range(pos, pos + len(sw))):
+                rc_list.append(sw)
+                matched_positions.update(range(pos, pos + len(sw)))
+            start = pos + 1
+    return rc_list
+
+
+def covered(rc_list, message):
+    """原 RC.get_l1_coefficient：被选中词条全部出现位置的覆盖字符数"""
+    positions = set()
+    for word in rc_list:
+        start = 0
+        while True:
+            pos = message.find(word, start)
+            if pos == -1:
+                break
+            positions.update(range(pos, pos + len(word)))
+            start = pos + 1
+    return len(positions)
+
+
+def reference(words, message):
+    sw_list = sorted(set(words), key=lambda w: (-len(w), w))
+    rc_list = get_rc_list(sw_list, message)
+    return rc_list, covered(rc_list, message)
+
+
+@pytest.mark.parametrize(
+    "words, message, expected",
+    [
+        (["苹果", "苹果手机"], "买苹果手机送苹果", (["苹果手机", "苹果"], 6)),
+        (["ab", "bc"], "abc", (["ab"], 2)),
+        (["aa"], "aaaa", (["aa", "aa"], 4)),
+        (["违禁"], "正常消息", ([], 0)),
+        ([], "任意消息", ([], 0)),
+    ],
+)
+def test_scan_examples(words, message, expected):
+    assert KeywordMatcher(words).scan(message) == expected
+
+
+def test_scan_matches_original_get_rc_list():
+    rng = random.Random(0)
+    for _ in range(300):
+        words = [
+            "".join(rng.choices("abc", k=rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        message = "".join(rng.choices("abcd", k=rng.randint(0, 30)))
+        assert KeywordMatcher(words).scan(message) == reference(words, message)
+
+
+def test_find_all_reports_overlapping_hits():
+    matcher = KeywordMatcher(["he", "she", "his", "hers"])
+    hits = {(matcher.words[wid], start) for wid, start in matcher.find_all("ushers")}
+    assert hits == {("she", 1), ("he", 2), ("hers", 2)}
+
+
+def test_saved_index_matches_in_memory(tmp_path):
+    words = ["苹果手机", "苹果", "加微信", "代开发票"]
+    matcher = KeywordMatcher(words)
+    matcher.save(tmp_path / "keywords.idx")
+    loaded = KeywordMatcher.load(tmp_path / "keywords.idx")
+    assert list(loaded.words) == matcher.words
+    message = "加微信买苹果手机，另有代开发票业务，苹果"
+    assert loaded.scan(message) == matcher.scan(message)
+
+
+def test_compile_reuses_index_until_keywords_change(tmp_path):
+    source = tmp_path / "keywords.txt"
+    index_dir = tmp_path / "index"
+    source.write_text("苹果手机\n加微信\n", encoding="utf-8")
+    matcher = KeywordMatcher.compile([source], index_dir)
+    assert matcher.scan("加微信") == (["加微信"], 3)
+    assert len(list(index_dir.iterdir())) == 1
+
+    KeywordMatcher.compile([source], index_dir)
+    assert len(list(index_dir.iterdir())) == 1
+
+    source.write_text("苹果手机\n加微信\n代开发票\n", encoding="utf-8")
+    matcher = KeywordMatcher.compile([source], index_dir)
+    assert matcher.scan("代开发票") == (["代开发票"], 4)
+    assert len(list(index_dir.iterdir())) == 2
+
+
+def test_concurrent_compile(tmp_path):
+    source = tmp_path / "keywords.txt"
+    source.write_text("\n".join(f"词条{i}" for i in range(2000)), encoding="utf-8")
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+    with ThreadPoolExecutor(8) as pool:
+        matchers = list(
+            pool.map(lambda _: KeywordMatcher.compile([source], index_dir), range(8))
+        )
+    assert all(m.scan("含有词条42的消息") == (["词条42"], 4) for m in matchers)
+    # 临时文件均已替换或清理
+    assert len(list(index_dir.iterdir())) == 1
+
+
+def test_compile_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        KeywordMatcher.compile([tmp_path / "missing.txt"], tmp_path)
+
+
+@pytest.fixture(scope="module")
+def normalize():
+    return TextNormalizer().normalize_word
+
+
+@pytest.mark.parametrize(
+    "entry",
+    ["苹果手机", "ＡＢＣ", "Hello", "加微信", "法"],
+)
+def test_keyword_accepted(normalize, entry):
+    assert keyword_problem(entry, normalize(entry)) is None
+
+
+@pytest.mark.parametrize(
+    "entry",
+    ["法*", "法.{0", "《苹》", "专/业", "活動", "Ｙ", "b", "７", "ＱＱ"],
+)
+def test_keyword_rejected(normalize, entry):
+    assert keyword_problem(entry, normalize(entry)) is not None
+
+
+def test_folded_keyword_repeating_literal_is_accepted(normalize):
+    assert keyword_problem("活動", normalize("活動"), {"活动"}) is None
+
+
+def test_parse_keywords_reports_rejected(normalize):
+    words, categories, rejected = parse_keywords(
+        "苹果手机\n法*\n[广告:0.5]\n加微信\n", normalize
+    )
+    assert words == {"苹果手机": "default", "加微信": "广告"}
+    assert categories["广告"] == 0.5
+    assert [entry for entry, _ in rejected] == ["法*"]
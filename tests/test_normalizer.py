@@ -0,0 +1,54 @@
+import pytest
+
+from astrbot_plugin_risk_control.utils import Lexicon, TextNormalizer
+
+
+@pytest.fixture(scope="module")
+def normalizer():
+    return TextNormalizer()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("ＡＢＣ", "abc"),
+        ("Hello", "hello"),
+        ("活動", "活动"),
+        ("加微信", "加微信"),
+    ],
+)
+def test_folding(normalizer, text, expected):
+    assert normalizer.normalize(text) == (expected, None)
+
+
+def test_separators_are_dropped_with_offsets(normalizer):
+    assert normalizer.normalize("操 逼") == ("操逼", [0, 2])
+    text, offsets = normalizer.normalize("Hello, World!")
+    assert text == "helloworld"
+    assert offsets == [0, 1, 2, 3, 4, 7, 8, 9, 10, 11]
+    # 偏移量指向原文中的对应字符
+    original = "加。微 信！"
+    text, offsets = normalizer.normalize(original)
+    assert [original[i] for i in offsets] == list(text)
+
+
+def test_normalize_word(normalizer):
+    assert normalizer.normalize_word(" 加.微 信 ") == "加微信"
+
+
+def test_fingerprint_depends_on_table(normalizer, tmp_path):
+    assert TextNormalizer().fingerprint == normalizer.fingerprint
+    t2s = tmp_path / "t2s.txt"
+    t2s.write_text("動 动\n", encoding="utf-8")
+    assert TextNormalizer(t2s).fingerprint != normalizer.fingerprint
+
+
+def test_lexicon_coverage_maps_to_original(tmp_path):
+    source = tmp_path / "keywords.txt"
+    source.write_text("加微信\n", encoding="utf-8")
+    lexicon = Lexicon(tmp_path / "index")
+    lexicon.add_source(source)
+    assert lexicon.scan("加微信") == (["加微信"], 3)
+    # 覆盖原文中从首字到末字的范围（含其间的分隔符）
+    assert lexicon.scan("加 微 信，你好") == (["加微信"], 5)
+    assert lexicon.scan("ＪＩＡ加．微信") == (["加微信"], 4)
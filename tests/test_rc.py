@@ -0,0 +1,251 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from astrbot_plugin_risk_control.config import parse_config
+from astrbot_plugin_risk_control.rc import _RC
+from astrbot_plugin_risk_control.utils import Lexicon
+from bench.stubs import FakeClient, FakeContext, FakeEvent, FakeProvider
+
+# 各消息对应的L3评级
+GRADES = {"误判": 1, "擦边": 6, "故障": None, "违规词": 9}
+
+
+def l2_answer(prompt: str) -> str:
+    return "N" if "闲聊" in prompt else "Y"
+
+
+def l3_answer(prompt: str) -> str:
+    message = prompt.rsplit("\n", 1)[-1]
+    grade = next(g for key, g in GRADES.items() if key in message)
+    if grade is None:
+        raise RuntimeError("模型故障")
+    return json.dumps(
+        {"grade": grade, "reason": "测试" * 20, "keywords": [], "cfd": 0.9},
+        ensure_ascii=False,
+    )
+
+
+class RecordingClient(FakeClient):
+    """按先后顺序记录调用"""
+
+    def __init__(self, log: list):
+        super().__init__(latency=0.01)
+        self.log = log
+
+    async def call(self, action: str):
+        self.log.append(action)
+        await super().call(action)
+
+
+class RecordingProvider(FakeProvider):
+    """输出结束（或提前结束读取）时记录"""
+
+    def __init__(self, log: list, **kwargs):
+        super().__init__(**kwargs)
+        self.log = log
+
+    async def text_chat(self, prompt: str = "", **kwargs):
+        resp = await super().text_chat(prompt, **kwargs)
+        self.log.append("l3_done")
+        return resp
+
+    async def text_chat_stream(self, prompt: str = "", **kwargs):
+        try:
+            async for resp in super().text_chat_stream(prompt, **kwargs):
+                yield resp
+        finally:
+            self.log.append("l3_done")
+
+
+CONFIG = {
+    "enable": True,
+    "white_groups": [1000],
+    "l1_threshold": 0.05,
+    "l2_llm_id": "l2",
+    "l3_llm_id": "l3",
+    "verdict_cache_size": 0,
+    "audit_log": False,
+    "reputation": False,
+    "flood_user_limit": 0,
+    "dedup_capacity": 0,
+    "provisional_l1_threshold": 0.0,
+    "provisional_ban_time": 5,
+    "ban_time": 10,
+    "l3_threshold_alert": 5,
+    "l3_threshold_withdraw": 6,
+    "l3_threshold_ban": 8,
+}
+
+
+@pytest.fixture
+def make_rc(tmp_path):
+    def make(**overrides):
+        source = tmp_path / "keywords.txt"
+        source.write_text("违规词\n", encoding="utf-8")
+        rc = _RC()
+        rc.lexicon = Lexicon(tmp_path / "index")
+        rc.lexicon.add_source(source)
+        log = []
+        l3_ids = {**CONFIG, **overrides}["l3_llm_id"].split(",")
+        providers = {
+            "l2": FakeProvider(0.01, answer=l2_answer, jitter=0),
+            **{
+                l3_id: RecordingProvider(
+                    log, latency=0.3, answer=l3_answer, jitter=0, chunk_size=4
+                )
+                for l3_id in l3_ids
+            },
+        }
+        rc.set_bot_params(FakeContext(providers), parse_config({**CONFIG, **overrides}))
+        return rc, log
+
+    return make
+
+
+def run(rc, log, *messages):
+    client = RecordingClient(log)
+
+    async def main():
+        for i, message in enumerate(messages):
+            event = FakeEvent(message, message_id=str(i), client=client)
+            async for _ in rc.handle(event):
+                pass
+
+    asyncio.run(main())
+    rc.l1_executor.shutdown()
+    return client.calls
+
+
+def test_early_enforcement_before_stream_ends(make_rc):
+    rc, log = make_rc()
+    calls = run(rc, log, "违规词")
+    assert calls["delete_msg"] == 1 and calls["set_group_ban"] == 1
+    assert log.index("delete_msg") < log.index("l3_done")
+
+
+def test_early_enforcement_disabled_with_multiple_providers(make_rc):
+    rc, log = make_rc(l3_llm_id="l3a,l3b")
+    calls = run(rc, log, "违规词")
+    assert calls["delete_msg"] == 1 and calls["set_group_ban"] == 1
+    assert log.index("l3_done") < log.index("delete_msg")
+
+
+def test_provisional_confirmed(make_rc):
+    rc, log = make_rc(provisional_l1_threshold=0.5)
+    calls = run(rc, log, "违规词")
+    assert calls["delete_msg"] == 1
+    # 临时禁言后按最终结果延长
+    assert calls["set_group_ban"] == 2 and calls["unban"] == 0
+    assert log.index("delete_msg") < log.index("l3_done")
+
+
+def test_provisional_rolled_back(make_rc):
+    rc, log = make_rc(provisional_l1_threshold=0.5)
+    calls = run(rc, log, "违规词误判")
+    assert calls["delete_msg"] == 1
+    assert calls["set_group_ban"] == 1 and calls["unban"] == 1
+
+
+def test_provisional_partially_confirmed(make_rc):
+    rc, log = make_rc(provisional_l1_threshold=0.5)
+    calls = run(rc, log, "违规词擦边")
+    # 仅达到撤回阈值：保留撤回，解除临时禁言
+    assert calls["delete_msg"] == 1
+    assert calls["set_group_ban"] == 1 and calls["unban"] == 1
+
+
+def test_below_provisional_threshold(make_rc):
+    rc, log = make_rc(provisional_l1_threshold=0.99, l1_dilution_window=0)
+    calls = run(rc, log, "违规词误判" + "正常内容" * 10)
+    assert calls["delete_msg"] == 0
+    assert calls["set_group_ban"] == 0 and calls["unban"] == 0
+
+
+def test_provisional_gated_on_l1_score(make_rc):
+    rc, log = make_rc(l1_threshold=0, provisional_l1_threshold=0.5)
+    calls = run(rc, log, "误判的消息")
+    # 全部送审时，不含违禁词的消息不做临时处理
+    assert calls["delete_msg"] == 0
+    assert calls["set_group_ban"] == 0 and calls["unban"] == 0
+
+
+def test_provisional_kept_when_l3_fails(make_rc):
+    rc, log = make_rc(provisional_l1_threshold=0.5)
+    calls = run(rc, log, "违规词故障")
+    assert calls["delete_msg"] == 1
+    assert calls["set_group_ban"] == 1 and calls["unban"] == 0
+
+
+def test_rollback_keeps_other_ban_of_same_user(make_rc):
+    rc, log = make_rc(provisional_l1_threshold=0.5)
+
+    async def main():
+        client = RecordingClient(log)
+        events = [
+            FakeEvent("违规词", message_id="1", client=client),
+            FakeEvent("违规词误判", message_id="2", client=client),
+        ]
+
+        async def drain(event):
+            async for _ in rc.handle(event):
+                pass
+
+        await asyncio.gather(*(drain(event) for event in events))
+        return client.calls
+
+    calls = asyncio.run(main())
+    rc.l1_executor.shutdown()
+    assert calls["delete_msg"] == 2
+    assert calls["unban"] == 0
+
+
+def test_speculative_l3_gated_on_l1_score(make_rc):
+    rc, log = make_rc(l1_threshold=0, speculative_l1_threshold=0.5)
+    started = []
+    get_l3_result = rc.get_l3_result
+
+    async def record(event, message, *args, **kwargs):
+        started.append(message)
+        return await get_l3_result(event, message, *args, **kwargs)
+
+    rc.get_l3_result = record
+    calls = run(rc, log, "违规词", "闲聊内容")
+    # 全部送审时，不含违禁词的消息仍等待L2判定后再开始L3
+    assert started == ["违规词"]
+    assert calls["delete_msg"] == 1
+
+
+def test_overload_sheds_by_l1_score_when_l1_gate_disabled(make_rc):
+    # 全部送审时仍按L1系数排队：队列已满时丢弃低分消息并放行，高分消息继续分析
+    rc, log = make_rc(l1_threshold=0, llm_max_concurrency=1, llm_max_queue=1)
+
+    async def main():
+        client = RecordingClient(log)
+        events = [
+            FakeEvent(message, sender_id=str(i), message_id=str(i), client=client)
+            for i, message in enumerate(["违规词", "你好", "违规词"])
+        ]
+
+        async def drain(event):
+            async for _ in rc.handle(event):
+                pass
+
+        await asyncio.gather(*(drain(event) for event in events))
+        return client.calls
+
+    calls = asyncio.run(main())
+    rc.l1_executor.shutdown()
+    assert rc.scheduler.shed == 1
+    assert calls["delete_msg"] == 2 and calls["set_group_ban"] == 2
+
+
+@pytest.mark.parametrize("passes, stages", [(False, ["l3"]), (True, ["l1", "l3"])])
+def test_audit_skips_l1_passes_unless_enabled(make_rc, passes, stages):
+    rc, log = make_rc(audit_log_passes=passes)
+    records = []
+    rc.audit = types.SimpleNamespace(record=lambda **fields: records.append(fields))
+    run(rc, log, "你好", "违规词")
+    assert [record["stage"] for record in records] == stages
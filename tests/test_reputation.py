@@ -0,0 +1,101 @@
+import types
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import (
+    NEUTRAL,
+    OFFENDER,
+    SUSPECT,
+    TRUSTED,
+    ReputationStore,
+)
+from astrbot_plugin_risk_control.utils import reputation as reputation_module
+
+HOUR = 3600
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """可手动推进的时钟"""
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    clock.time = clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(reputation_module, "time", clock)
+    return clock
+
+
+def test_violations_raise_standing():
+    store = ReputationStore(half_life=72 * HOUR)
+    assert store.standing("g", "u") == NEUTRAL
+    store.record("g", "u", ["alert"])
+    assert store.standing("g", "u") == NEUTRAL
+    store.record("g", "u", ["withdraw"])
+    assert store.standing("g", "u") == SUSPECT
+    store.record("g", "u", ["withdraw", "ban"])
+    assert store.standing("g", "u") == SUSPECT
+    store.record("g", "u", ["withdraw", "ban"])
+    assert store.standing("g", "u") == OFFENDER
+    # 按 (群, 用户) 隔离
+    assert store.standing("other", "u") == NEUTRAL
+
+
+def test_single_enforcement_is_not_an_offender():
+    store = ReputationStore()
+    store.record("g", "u", ["alert", "withdraw", "ban"])
+    assert store.standing("g", "u") == SUSPECT
+    store.record("g", "u", ["alert", "withdraw", "ban"])
+    assert store.standing("g", "u") == OFFENDER
+
+
+def test_scores_decay(clock):
+    store = ReputationStore(half_life=HOUR)
+    for _ in range(2):
+        store.record("g", "u", ["withdraw", "ban"])
+    assert store.standing("g", "u") == OFFENDER
+    clock.now += HOUR
+    assert store.standing("g", "u") == SUSPECT
+    clock.now += 2 * HOUR
+    assert store.standing("g", "u") == NEUTRAL
+
+
+def test_clean_messages_build_trust():
+    store = ReputationStore(trust_after=3)
+    for _ in range(3):
+        store.record("g", "u", [])
+    assert store.standing("g", "u") == TRUSTED
+    store.record("g", "u", ["alert"])
+    assert store.standing("g", "u") == NEUTRAL
+
+
+def test_least_recent_users_are_evicted():
+    store = ReputationStore(capacity=2)
+    store.record("g", "a", ["withdraw"])
+    store.record("g", "b", ["withdraw"])
+    store.standing("g", "a")
+    store.record("g", "a", [])
+    store.record("g", "c", ["withdraw"])
+    assert set(store.slots) == {("g", "a"), ("g", "c")}
+    assert store.standing("g", "b") == NEUTRAL
+    assert store.standing("g", "c") == SUSPECT
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "reputation.bin"
+    store = ReputationStore(path, trust_after=2)
+    store.record("g", "a", ["withdraw", "ban"])
+    store.record("g", "a", ["withdraw", "ban"])
+    store.record("g", "b", [])
+    store.record("g", "b", [])
+    store.save()
+
+    restored = ReputationStore(path, trust_after=2)
+    assert restored.standing("g", "a") == OFFENDER
+    assert restored.standing("g", "b") == TRUSTED
+    assert list(restored.slots) == list(store.slots)
+
+
+def test_corrupted_snapshot_is_discarded(tmp_path):
+    path = tmp_path / "reputation.bin"
+    path.write_bytes(b'{"version": 1, "keys": [["g", "a"]], "order": [0]}\n\x00')
+    store = ReputationStore(path)
+    assert not store.slots
+    assert store.standing("g", "a") == NEUTRAL
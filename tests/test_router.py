@@ -0,0 +1,90 @@
+from astrbot_plugin_risk_control.utils import (
+    ROUTE_L2,
+    ROUTE_L3,
+    ROUTE_SKIP,
+    AdaptiveRouter,
+)
+
+
+def _observe(router, l1, count, l2=None, violation=None):
+    for _ in range(count):
+        router.observe(l1, l2, violation)
+
+
+def test_static_watermarks():
+    router = AdaptiveRouter(floor=0.1, high_water=0.6)
+    assert router.route(0.05) == ROUTE_SKIP
+    assert router.route(0.1) == ROUTE_L2
+    assert router.route(0.59) == ROUTE_L2
+    assert router.route(0.6) == ROUTE_L3
+
+
+def test_no_high_water_never_skips_l2():
+    router = AdaptiveRouter(floor=0.1)
+    assert router.route(1.0) == ROUTE_L2
+
+
+def test_static_watermarks_ignore_statistics():
+    router = AdaptiveRouter(floor=0.1, high_water=0.6, min_samples=10)
+    _observe(router, 0.35, 50, l2=False, violation=False)
+    assert (router.low, router.high) == (0.1, 0.6)
+
+
+def test_autotune_raises_low_water_below_violations():
+    router = AdaptiveRouter(autotune=True, min_samples=10, explore=0, buckets=10)
+    _observe(router, 0.05, 20, violation=False)
+    _observe(router, 0.15, 20, violation=False)
+    _observe(router, 0.25, 20, violation=True)
+    assert router.low == 0.2
+    assert router.route(0.15) == ROUTE_SKIP
+    assert router.route(0.25) == ROUTE_L2
+
+
+def test_autotune_lowers_high_water_where_l2_agrees():
+    router = AdaptiveRouter(autotune=True, min_samples=10, explore=0, buckets=10)
+    _observe(router, 0.95, 20, l2=True, violation=True)
+    _observe(router, 0.85, 20, l2=True, violation=True)
+    _observe(router, 0.75, 20, l2=False)
+    assert router.low == 0.0
+    assert router.high == 0.8
+    assert router.route(0.85) == ROUTE_L3
+    assert router.route(0.75) == ROUTE_L2
+
+
+def test_autotune_keeps_configured_values_without_samples():
+    router = AdaptiveRouter(floor=0.1, high_water=0.6, autotune=True, min_samples=10)
+    _observe(router, 0.3, 5, l2=True, violation=False)
+    assert (router.low, router.high) == (0.1, 0.6)
+
+
+def test_explore_keeps_samples_below_low_water():
+    router = AdaptiveRouter(autotune=True, min_samples=10, explore=0.5, buckets=10)
+    _observe(router, 0.05, 20, violation=False)
+    _observe(router, 0.25, 20, violation=True)
+    assert router.low == 0.2
+    routes = [router.route(0.05) for _ in range(4)]
+    assert routes.count(ROUTE_L2) == 2
+    assert routes.count(ROUTE_SKIP) == 2
+
+
+def test_counts_decay():
+    router = AdaptiveRouter(decay_every=4)
+    _observe(router, 0.5, 4, l2=True, violation=True)
+    assert router.l2_total[10] == router.judged[10] == 2
+
+
+def test_group_floor_shifts_low_water():
+    router = AdaptiveRouter(floor=0.1, high_water=0.6)
+    assert router.route(0.05, floor=0.0) == ROUTE_L2
+    assert router.route(0.2, floor=0.3) == ROUTE_SKIP
+    assert router.route(0.2) == ROUTE_L2
+
+    router = AdaptiveRouter(
+        floor=0.1, autotune=True, min_samples=10, explore=0, buckets=10
+    )
+    _observe(router, 0.15, 20, violation=False)
+    _observe(router, 0.35, 20, violation=True)
+    assert router.low == 0.3
+    # 群组阈值比全局低 0.1，自动调整的低水位同样下移
+    assert router.route(0.25, floor=0.0) == ROUTE_L2
+    assert router.route(0.25) == ROUTE_SKIP
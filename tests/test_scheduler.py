@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import LLMScheduler, SchedulerOverloaded
+
+
+async def _request(scheduler, order, name, group_id="", priority=0.0):
+    async with scheduler.slot("m", group_id, priority):
+        order.append(name)
+        await asyncio.sleep(0)
+
+
+async def _queue(scheduler, *requests):
+    """占满名额后依次排队，返回各请求任务与出队顺序"""
+    order = []
+    await scheduler.acquire("m", "", 0.0)
+    tasks = [
+        asyncio.ensure_future(_request(scheduler, order, *request))
+        for request in requests
+    ]
+    await asyncio.sleep(0)
+    return tasks, order
+
+
+def test_groups_take_turns():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=1)
+        tasks, order = await _queue(
+            scheduler, ("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")
+        )
+        assert scheduler.stats()["queue_depth"] == 4
+        scheduler.release("m")
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["a1", "b1", "a2", "a3"]
+
+
+def test_higher_priority_first_within_group():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=1)
+        tasks, order = await _queue(
+            scheduler, ("low", "g", 0.1), ("high", "g", 0.9), ("mid", "g", 0.5)
+        )
+        scheduler.release("m")
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["high", "mid", "low"]
+
+
+def test_concurrency_limit():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=2)
+        peak = active = 0
+
+        async def request():
+            nonlocal peak, active
+            async with scheduler.slot("m"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak, scheduler.stats()
+
+    peak, stats = asyncio.run(main())
+    assert peak == 2
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == {"m": 0}
+
+
+def test_full_queue_sheds_lowest_priority():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=2)
+        tasks, order = await _queue(
+            scheduler, ("low", "a", 0.1), ("mid", "b", 0.5), ("high", "c", 0.9)
+        )
+        # 新请求优先级不高于队列中最低者时直接丢弃
+        with pytest.raises(SchedulerOverloaded):
+            await scheduler.acquire("m", "d", 0.0)
+        scheduler.release("m")
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return results, order, scheduler.stats()
+
+    results, order, stats = asyncio.run(main())
+    assert isinstance(results[0], SchedulerOverloaded)
+    assert results[1:] == [None, None]
+    assert order == ["mid", "high"]
+    assert stats["shed"] == 2
+    assert stats["queue_depth"] == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        scheduler = LLMScheduler(max_concurrency=1)
+        tasks, order = await _queue(scheduler, ("a", "g"), ("b", "g"))
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 1
+        scheduler.release("m")
+        await tasks[1]
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == ["b"]
+    assert stats["in_flight"] == {"m": 0}
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from astrbot_plugin_risk_control.utils import (
+    JSONFieldStream,
+    VerdictStream,
+    parse_verdict,
+)
+
+
+@pytest.mark.parametrize(
+    "text, verdict",
+    [
+        ("Y", True),
+        ("N", False),
+        ("yes.", True),
+        ("No", False),
+        ("判断：Y", True),
+        ("<think>看起来是 Y</think>N", False),
+        ("My answer: N", False),
+        ("Yellow", None),
+        ("Nothing to say", None),
+        ("<think>Y", None),
+        ("", None),
+    ],
+)
+def test_parse_verdict(text, verdict):
+    assert parse_verdict(text) is verdict
+
+
+def _stream(chunks):
+    stream = VerdictStream()
+    for chunk in chunks:
+        if stream.feed(chunk):
+            break
+    return stream
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Y\n",
+        "N。",
+        "My answer: N\n",
+        "Yellow card: Y ",
+        "<think>Yes or No?</think>\nN ",
+        "Nope, Y.",
+    ],
+)
+def test_verdict_stream_matches_parser_at_any_split(text):
+    for size in range(1, len(text) + 1):
+        chunks = [text[i : i + size] for i in range(0, len(text), size)]
+        assert _stream(chunks).verdict is parse_verdict(text)
+
+
+def test_verdict_stream_waits_for_token_boundary():
+    stream = VerdictStream()
+    assert not stream.feed("Y")
+    assert not stream.feed("e")
+    assert not stream.feed("llow")
+    assert stream.verdict is None
+    assert not stream.feed(" N")
+    assert stream.feed("\n")
+    assert stream.verdict is False
+
+
+def test_verdict_stream_skips_split_think_tags():
+    stream = _stream(["<thi", "nk>Y</th", "ink>N", " "])
+    assert stream.verdict is False
+
+
+def test_json_stream_reports_fields_as_they_complete():
+    seen = []
+    stream = JSONFieldStream(lambda key, value: seen.append((key, value)))
+    assert not stream.feed('前缀 {"grade": 7, "reas')
+    assert seen == [("grade", 7)]
+    assert not stream.feed('on": "含{括号}与\\"引号\\"", "keywords": ["a", ')
+    assert seen[-1] == ("reason", '含{括号}与"引号"')
+    assert stream.feed('"b"], "cfd": 0.9} 之后的内容')
+    assert stream.fields == {
+        "grade": 7,
+        "reason": '含{括号}与"引号"',
+        "keywords": ["a", "b"],
+        "cfd": 0.9,
+    }
+
+
+def test_json_stream_char_by_char():
+    payload = {"grade": 3, "reason": "无", "keywords": [], "nested": {"k": [1, 2]}}
+    text = '<think>{"grade": 10}</think>' + json.dumps(payload, ensure_ascii=False)
+    stream = JSONFieldStream()
+    done = [stream.feed(char) for char in text]
+    assert done[-1] and not any(done[:-1])
+    assert stream.fields == payload
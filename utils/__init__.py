@@ -1,2 +1,17 @@
 from .timer import Timer
-from .prompter import PromptTool
\ No newline at end of file
+from .prompter import PromptTool, CompiledPrompt
+from .matcher import KeywordMatcher
+from .lexicon import Lexicon, L1Scoring
+from .normalizer import TextNormalizer
+from .cache import VerdictCache
+from .history import GroupHistory, HistRecord, format_history
+from .batcher import MicroBatcher
+from .scheduler import LLMScheduler, SchedulerOverloaded
+from .offload import L1Executor
+from .metrics import Metrics, METRICS, LATENCY_BUCKETS, SIZE_BUCKETS
+from .flood import FloodGuard, FloodCheck, simhash
+from .router import AdaptiveRouter, ROUTE_SKIP, ROUTE_L2, ROUTE_L3
+from .audit import AuditLog
+from .stream import VerdictStream, JSONFieldStream, parse_verdict
+from .hedge import HedgedCaller, CircuitBreaker
+from .reputation import ReputationStore, TRUSTED, NEUTRAL, SUSPECT, OFFENDER
@@ -0,0 +1,206 @@
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 判定记录字段（顺序即表结构）
+FIELDS = (
+    "ts",
+    "group_id",
+    "user_id",
+    "message_id",
+    "message_hash",
+    "stage",
+    "actions",
+    "route",
+    "l1",
+    "l1_time",
+    "l2",
+    "l2_time",
+    "l3_grade",
+    "l3_cfd",
+    "l3_reason",
+    "l3_time",
+)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS decisions ("
+    "ts REAL NOT NULL, group_id TEXT NOT NULL, user_id TEXT NOT NULL, "
+    "message_id TEXT, message_hash TEXT, stage TEXT NOT NULL, actions TEXT, "
+    "route TEXT, l1 REAL, l1_time REAL, l2 INTEGER, l2_time REAL, "
+    "l3_grade INTEGER, l3_cfd REAL, l3_reason TEXT, l3_time REAL)",
+    "CREATE INDEX IF NOT EXISTS decisions_group ON decisions (group_id, ts)",
+    "CREATE INDEX IF NOT EXISTS decisions_user ON decisions (user_id, ts)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+
+class AuditLog:
+    """
+    判定审计日志
+
+    写入只是放入有界队列（满时丢弃并计数），由后台线程批量写入 SQLite（WAL），
+    按文件大小或时间轮转，保留有限个历史文件；按群、用户查询走索引，无需扫描全表。
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_seconds: float = 7 * 86400,
+        backups: int = 3,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="rc-audit", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def digest(message: str) -> str:
+        """
+        消息摘要（审计日志只保存摘要，不保存原文）
+
+        :param message: 规范化后的消息
+        :return: 16 位十六进制摘要
+        """
+        return hashlib.sha256(message.encode("utf-8")).hexdigest()[:16]
+
+    def record(self, **fields: Any):
+        """
+        记录一次判定（不阻塞）
+
+        :param fields: 判定字段，见 FIELDS
+        """
+        fields.setdefault("ts", time.time())
+        row = tuple(fields.get(name) for name in FIELDS)
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def query(
+        self,
+        group_id: str | None = None,
+        user_id: str | None = None,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        查询最近的判定记录（仅当前文件）
+
+        :param group_id: 群号，为空时不限
+        :param user_id: 用户，为空时不限
+        :param limit: 条数
+        :return: 判定记录（由新到旧）
+        """
+        if not self.path.exists():
+            return []
+        conditions, params = [], []
+        if group_id:
+            conditions.append("group_id = ?")
+            params.append(str(group_id))
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(str(user_id))
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=1)
+        try:
+            rows = db.execute(
+                f"SELECT {', '.join(FIELDS)} FROM decisions {where}"
+                "ORDER BY ts DESC LIMIT ?",
+                (*params, max(limit, 0)),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        finally:
+            db.close()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def close(self):
+        """写完队列中的记录并停止后台线程"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+
+    def _open(self) -> tuple[sqlite3.Connection, float]:
+        db = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            db.execute(statement)
+        db.execute(
+            "INSERT OR IGNORE INTO meta VALUES ('created', ?)", (str(time.time()),)
+        )
+        created = float(
+            db.execute("SELECT value FROM meta WHERE key = 'created'").fetchone()[0]
+        )
+        return db, created
+
+    def _rotate(self, db: sqlite3.Connection) -> tuple[sqlite3.Connection, float]:
+        db.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path.replace(self.path.with_name(f"{self.path.stem}-{stamp}.db"))
+        for suffix in ("-wal", "-shm"):
+            Path(f"{self.path}{suffix}").unlink(missing_ok=True)
+        rotated = sorted(self.path.parent.glob(f"{self.path.stem}-*.db"))
+        for old in rotated[: max(len(rotated) - self.backups, 0)]:
+            old.unlink(missing_ok=True)
+        return self._open()
+
+    def _run(self):
+        db, created = self._open()
+        stopping = False
+        while not stopping:
+            row = self.queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            try:
+                db.execute("BEGIN")
+                db.executemany(
+                    f"INSERT INTO decisions VALUES ({', '.join('?' * len(FIELDS))})",
+                    batch,
+                )
+                db.execute("COMMIT")
+                self.written += len(batch)
+                if (
+                    self.max_bytes > 0 and self.path.stat().st_size > self.max_bytes
+                ) or (
+                    self.rotate_seconds > 0
+                    and time.time() - created > self.rotate_seconds
+                ):
+                    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    db, created = self._rotate(db)
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                self.dropped += len(batch)
+        db.close()
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    微批处理器
+
+    在时间窗口内收集请求，窗口结束或达到批量上限时合并为一次调用，
+    并将结果逐一交还给等待中的调用方（结果为异常对象时以异常交还）。
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        window_ms: int = 50,
+        max_size: int = 8,
+    ):
+        self.handler = handler
+        self.window = window_ms / 1000
+        self.max_size = max(max_size, 1)
+        self.pending: List[tuple[Any, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: Any) -> Any:
+        """
+        提交请求并等待所在批次的结果
+
+        :param item: 请求内容
+        :return: 该请求对应的结果
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.max_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[tuple[Any, asyncio.Future]]):
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+
+class VerdictCache:
+    """
+    判定结果缓存（LRU + TTL）
+
+    键为 (层级, 提示词, 规范化消息) 的哈希；内存层按 LRU 淘汰，
+    可选的 SQLite 层用于跨重启保留结果并在同一主机的多个进程间共享，值以 JSON 存储。
+    """
+
+    def __init__(
+        self,
+        capacity: int = 4096,
+        ttl: float = 3600,
+        db_path: str | Path | None = None,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.items: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path and capacity > 0:
+            db_path = Path(db_path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(db_path, isolation_level=None, timeout=1)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM verdicts WHERE expires < ?", (time.time(),))
+
+    @staticmethod
+    def key(tier: str, prompt: str, message: str) -> str:
+        """
+        生成缓存键
+
+        :param tier: 风控层级
+        :param prompt: 提示词（包含群聊主题）
+        :param message: 规范化后的消息
+        :return: 缓存键
+        """
+        digest = hashlib.sha256(tier.encode("utf-8"))
+        for part in (prompt, message):
+            digest.update(b"\0")
+            digest.update(part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        :param key: 缓存键
+        :return: 缓存值，未命中或已过期时为 None
+        """
+        if self.capacity <= 0:
+            return None
+
+        now = time.time()
+        item = self.items.get(key)
+        if item is not None:
+            if item[0] >= now:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            del self.items[key]
+
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT value, expires FROM verdicts WHERE key = ? AND expires >= ?",
+                (key, now),
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._put(key, row[1], value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        """
+        写入缓存
+
+        :param key: 缓存键
+        :param value: 缓存值（需可 JSON 序列化）
+        """
+        if self.capacity <= 0:
+            return
+        expires = time.time() + self.ttl
+        self._put(key, expires, value)
+        if self.db is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires),
+            )
+
+    def _put(self, key: str, expires: float, value: Any):
+        self.items[key] = (expires, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def close(self):
+        """关闭持久化数据库连接"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
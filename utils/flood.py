@@ -0,0 +1,220 @@
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+_MASK = (1 << 64) - 1
+
+
+def simhash(text: str, n: int = 2) -> int:
+    """
+    计算文本的 64 位 SimHash（字符 n-gram）
+
+    各位的计数以位切片形式累加（每个 n-gram 只需数次整数位运算），最后按多数表决取位。
+
+    :param text: 规范化后的文本
+    :param n: n-gram 长度
+    :return: 指纹
+    """
+    counters = []
+    total = 0
+    for word in map(hash, zip(*(text[k:] for k in range(n)))):
+        word &= _MASK
+        total += 1
+        j = 0
+        while word:
+            if j == len(counters):
+                counters.append(word)
+                break
+            counter = counters[j]
+            counters[j] = counter ^ word
+            word &= counter
+            j += 1
+
+    # 计数 > total // 2 的位置 1
+    threshold = total // 2
+    greater, equal = 0, _MASK
+    for j in reversed(range(max(len(counters), threshold.bit_length()))):
+        counter = counters[j] if j < len(counters) else 0
+        if (threshold >> j) & 1:
+            equal &= counter
+        else:
+            greater |= equal & counter
+            equal &= ~counter & _MASK
+    return greater
+
+
+class _RateCounter:
+    """滑动窗口频率计数（按键 LRU 淘汰）"""
+
+    def __init__(self, window: float, limit: int, capacity: int = 4096):
+        self.window = window
+        self.limit = limit
+        self.capacity = max(capacity, 1)
+        self.events: OrderedDict[str, deque] = OrderedDict()
+
+    def hit(self, key: str, now: float) -> bool:
+        """
+        记录一次事件
+
+        :param key: 计数键
+        :param now: 当前时间
+        :return: 窗口内事件数是否超过上限
+        """
+        if self.limit <= 0:
+            return False
+        events = self.events.get(key)
+        if events is None:
+            events = self.events[key] = deque(maxlen=self.limit + 1)
+            if len(self.events) > self.capacity:
+                self.events.popitem(last=False)
+        else:
+            self.events.move_to_end(key)
+        events.append(now)
+        return len(events) > self.limit and now - events[0] <= self.window
+
+
+class _Entry:
+    __slots__ = ("verdict", "seen", "judged")
+
+    def __init__(self, seen: float):
+        self.verdict: Any = None
+        self.seen = seen
+        self.judged = 0.0
+
+
+class FloodCheck(NamedTuple):
+    """L0 检测结果"""
+
+    fingerprint: Optional[int]
+    flood: str
+    verdict: Any
+
+
+class FloodGuard:
+    """
+    刷屏与近似重复检测（L0）
+
+    - 按用户、按群的滑动窗口频率计数；
+    - 近期消息的 SimHash 索引（按群隔离，LRU 淘汰），汉明距离不超过阈值视为近似重复；
+      分段索引（段数 = 阈值 + 1）保证候选查找只需数次字典访问。
+
+    检测结果：用户发言频率超限时为 "user"，同时为窗口内的近似重复时为 "user_repeat"；
+    群内消息频率超限且为窗口内的近似重复时为 "group"；
+    命中已判定的近似重复时继承其判定（放行判定仅在指纹完全相同时继承）。
+    """
+
+    def __init__(
+        self,
+        window: float = 10,
+        user_limit: int = 0,
+        group_limit: int = 0,
+        capacity: int = 4096,
+        distance: int = 6,
+        ttl: float = 600,
+        min_length: int = 8,
+    ):
+        self.window = window
+        self.users = _RateCounter(window, user_limit, capacity)
+        self.groups = _RateCounter(window, group_limit, capacity)
+        self.capacity = capacity
+        self.distance = min(max(distance, 0), 15)
+        self.ttl = ttl
+        self.min_length = min_length
+
+        self.bands = self.distance + 1
+        self.band_bits = 64 // self.bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.entries: OrderedDict[Tuple[str, int], _Entry] = OrderedDict()
+        self.index: Dict[Tuple[str, int, int], Set[int]] = {}
+
+    def _band_keys(self, group_id: str, fingerprint: int):
+        for i in range(self.bands):
+            band = (fingerprint >> (i * self.band_bits)) & self.band_mask
+            yield group_id, i, band
+
+    def _nearest(self, group_id: str, fingerprint: int) -> Tuple[Optional[_Entry], int]:
+        entry = self.entries.get((group_id, fingerprint))
+        if entry is not None:
+            return entry, 0
+        best, best_distance = None, self.distance + 1
+        for key in self._band_keys(group_id, fingerprint):
+            for candidate in self.index.get(key, ()):
+                distance = (candidate ^ fingerprint).bit_count()
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        if best is None:
+            return None, best_distance
+        return self.entries[(group_id, best)], best_distance
+
+    def _insert(self, group_id: str, fingerprint: int, now: float) -> _Entry:
+        entry = self.entries[(group_id, fingerprint)] = _Entry(now)
+        for key in self._band_keys(group_id, fingerprint):
+            self.index.setdefault(key, set()).add(fingerprint)
+        while len(self.entries) > self.capacity:
+            (old_group, old_fingerprint), _ = self.entries.popitem(last=False)
+            for key in self._band_keys(old_group, old_fingerprint):
+                fingerprints = self.index.get(key)
+                if fingerprints is not None:
+                    fingerprints.discard(old_fingerprint)
+                    if not fingerprints:
+                        del self.index[key]
+        return entry
+
+    def check(self, group_id: str, user_id: str, text: str) -> FloodCheck:
+        """
+        检测一条消息
+
+        :param group_id: 群号
+        :param user_id: 发送者
+        :param text: 规范化后的消息
+        :return: 检测结果
+        """
+        now = time.monotonic()
+        group_id, user_id = str(group_id), str(user_id)
+        user_flood = self.users.hit(f"{group_id}:{user_id}", now)
+        group_flood = self.groups.hit(group_id, now)
+
+        fingerprint = None
+        entry, distance = None, 0
+        if self.capacity > 0 and len(text) >= self.min_length:
+            fingerprint = simhash(text)
+            entry, distance = self._nearest(group_id, fingerprint)
+        recent = entry is not None and now - entry.seen <= self.window
+
+        if fingerprint is not None:
+            if entry is None or distance:
+                self._insert(group_id, fingerprint, now)
+            else:
+                entry.seen = now
+                self.entries.move_to_end((group_id, fingerprint))
+
+        if user_flood:
+            return FloodCheck(fingerprint, "user_repeat" if recent else "user", None)
+        if group_flood and recent:
+            return FloodCheck(fingerprint, "group", None)
+
+        verdict = None
+        if (
+            entry is not None
+            and entry.verdict is not None
+            and now - entry.judged <= self.ttl
+            # 放行判定仅在指纹完全相同时继承
+            and (entry.verdict or distance == 0)
+        ):
+            verdict = entry.verdict
+        return FloodCheck(fingerprint, "", verdict)
+
+    def remember(self, group_id: str, fingerprint: Optional[int], verdict: Any):
+        """
+        记录消息的判定结果，供后续近似重复继承
+
+        :param group_id: 群号
+        :param fingerprint: check 返回的指纹
+        :param verdict: 判定结果
+        """
+        if fingerprint is None:
+            return
+        entry = self.entries.get((str(group_id), fingerprint))
+        if entry is not None:
+            entry.verdict = verdict
+            entry.judged = time.monotonic()
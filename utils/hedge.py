@@ -0,0 +1,183 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Sequence, TypeVar
+
+from .metrics import METRICS
+from .scheduler import SchedulerOverloaded
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """
+    单个模型的健康状态
+
+    连续失败达到上限后熔断，冷却期内不再分配请求；冷却期满后放行请求试探，
+    成功即恢复，失败则重新熔断。同时记录最近的成功耗时，用于估算对冲等待时间。
+    """
+
+    def __init__(self, failures: int = 3, cooldown: float = 30, window: int = 100):
+        self.max_failures = max(failures, 1)
+        self.cooldown = cooldown
+        self.latencies: deque[float] = deque(maxlen=max(window, 1))
+        self.failures = 0
+        self.open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于熔断冷却期"""
+        return time.monotonic() < self.open_until
+
+    def success(self, latency: float):
+        self.failures = 0
+        self.open_until = 0.0
+        self.latencies.append(latency)
+
+    def failure(self) -> bool:
+        """
+        记录一次失败
+
+        :return: 是否因此熔断
+        """
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            self.open_until = time.monotonic() + self.cooldown
+            return True
+        return False
+
+    def quantile(self, q: float, min_samples: int = 10) -> Optional[float]:
+        """
+        最近成功耗时的分位数
+
+        :param q: 分位 (0-1)
+        :param min_samples: 最少样本数
+        :return: 分位数，样本不足时为空
+        """
+        if len(self.latencies) < min_samples:
+            return None
+        values = sorted(self.latencies)
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class HedgedCaller:
+    """
+    按顺序在多个模型间对冲调用
+
+    - 首选模型在其最近 p95 耗时内未返回时，向下一个模型发出对冲请求，先返回者胜出，其余取消；
+    - 请求失败时立即转向下一个模型；
+    - 熔断中的模型不参与分配（全部熔断时仍试探冷却最先结束的一个）；
+    - 调度队列已满（SchedulerOverloaded）与取消不计为模型失败。
+    """
+
+    def __init__(
+        self,
+        hedge: bool = True,
+        quantile: float = 0.95,
+        failures: int = 3,
+        cooldown: float = 30,
+        min_samples: int = 10,
+    ):
+        self.hedge = hedge
+        self.quantile = quantile
+        self.failures = failures
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, provider_id: str) -> CircuitBreaker:
+        breaker = self.breakers.get(provider_id)
+        if breaker is None:
+            breaker = self.breakers[provider_id] = CircuitBreaker(
+                self.failures, self.cooldown
+            )
+        return breaker
+
+    def candidates(self, provider_ids: Sequence[str]) -> list[str]:
+        """
+        可分配的模型（保持配置顺序）
+
+        :param provider_ids: 模型 ID 列表
+        :return: 未熔断的模型，全部熔断时为冷却最先结束的一个
+        """
+        available = [pid for pid in provider_ids if not self.breaker(pid).is_open]
+        if available or not provider_ids:
+            return available
+        return [min(provider_ids, key=lambda pid: self.breaker(pid).open_until)]
+
+    async def call(
+        self, provider_ids: Sequence[str], request: Callable[[str], Awaitable[T]]
+    ) -> T:
+        """
+        调用模型
+
+        :param provider_ids: 模型 ID 列表（按优先顺序）
+        :param request: 以模型 ID 发起请求的函数
+        :return: 最先成功的结果
+        """
+        candidates = self.candidates(provider_ids)
+        if not candidates:
+            raise ValueError("未配置 LLM 模型")
+        if len(candidates) == 1:
+            return await self._attempt(candidates[0], request)
+
+        pending: Dict[asyncio.Task, str] = {}
+        errors: list[BaseException] = []
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            provider_id = candidates[next_index]
+            next_index += 1
+            task = asyncio.ensure_future(self._attempt(provider_id, request))
+            pending[task] = provider_id
+            return provider_id
+
+        last = launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and next_index < len(candidates):
+                    timeout = self.breaker(last).quantile(
+                        self.quantile, self.min_samples
+                    )
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # 超过 p95 仍未返回，发出对冲请求
+                    last = launch()
+                    METRICS.inc("llm_hedged_total", provider=last)
+                    continue
+                for task in done:
+                    provider_id = pending.pop(task)
+                    if task.cancelled():
+                        continue
+                    error = task.exception()
+                    if error is None:
+                        if next_index > 1:
+                            METRICS.inc("llm_hedge_wins_total", provider=provider_id)
+                        return task.result()
+                    errors.append(error)
+                if not pending and next_index < len(candidates):
+                    last = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise errors[0]
+
+    async def _attempt(
+        self, provider_id: str, request: Callable[[str], Awaitable[T]]
+    ) -> T:
+        breaker = self.breaker(provider_id)
+        start = time.perf_counter()
+        try:
+            result = await request(provider_id)
+        except (asyncio.CancelledError, SchedulerOverloaded):
+            raise
+        except Exception:
+            if breaker.failure():
+                METRICS.inc("llm_circuit_open_total", provider=provider_id)
+            raise
+        breaker.success(time.perf_counter() - start)
+        return result
@@ -0,0 +1,89 @@
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class HistRecord(NamedTuple):
+    """群聊消息记录"""
+
+    message_id: str
+    sender_id: str
+    text: str
+
+
+def format_history(records: Iterable[HistRecord], self_id: str = "") -> List[str]:
+    """
+    格式化消息记录，发送者按出现顺序匿名为“用户N”
+
+    :param records: 消息记录（由旧到新）
+    :param self_id: Bot 账号，其消息不计入上下文
+    :return: 格式化后的消息列表
+    """
+    messages = []
+    sender_dict = {}
+    for record in records:
+        if self_id and record.sender_id == self_id:
+            continue
+        if record.sender_id not in sender_dict:
+            sender_dict[record.sender_id] = len(sender_dict) + 1
+        messages.append(f"用户{sender_dict[record.sender_id]}：{record.text}")
+    return messages
+
+
+class GroupHistory:
+    """
+    群聊消息滚动缓冲
+
+    由收到的群消息事件喂入，读取上下文时无需调用 OneBot 接口；
+    缓冲未预热（如重启后消息数不足）时返回 None，由调用方回退到接口并回填。
+    """
+
+    def __init__(self, capacity: int = 10):
+        self.capacity = max(capacity, 1)
+        self.buffers: Dict[str, deque] = {}
+        self.warm: set[str] = set()
+
+    def append(self, group_id: str, record: HistRecord):
+        """
+        记录一条群消息
+
+        :param group_id: 群号
+        :param record: 消息记录
+        """
+        group_id = str(group_id)
+        buffer = self.buffers.get(group_id)
+        if buffer is None:
+            buffer = self.buffers[group_id] = deque(maxlen=self.capacity)
+        buffer.append(record)
+        if len(buffer) == self.capacity:
+            self.warm.add(group_id)
+
+    def seed(self, group_id: str, records: Iterable[HistRecord]):
+        """
+        用接口获取的历史消息回填缓冲
+
+        :param group_id: 群号
+        :param records: 消息记录（由旧到新）
+        """
+        group_id = str(group_id)
+        buffer = self.buffers.get(group_id, ())
+        known = {record.message_id for record in buffer}
+        merged = [record for record in records if record.message_id not in known]
+        merged.extend(buffer)
+        self.buffers[group_id] = deque(merged, maxlen=self.capacity)
+        self.warm.add(group_id)
+
+    def get(self, group_id: str, count: int, self_id: str = "") -> Optional[List[str]]:
+        """
+        读取最近的群消息
+
+        :param group_id: 群号
+        :param count: 获取数量
+        :param self_id: Bot 账号
+        :return: 格式化后的消息列表，缓冲未预热时为 None
+        """
+        group_id = str(group_id)
+        buffer = self.buffers.get(group_id, ())
+        if group_id not in self.warm and len(buffer) < count:
+            return None
+        records = list(buffer)[-count:] if count > 0 else []
+        return format_history(records, self_id)
@@ -0,0 +1,374 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from .matcher import DEFAULT_CATEGORY, KeywordMatcher, keyword_problem, select_hits
+from .normalizer import TextNormalizer
+from .timer import Timer
+
+
+class L1Scoring(NamedTuple):
+    """L1 风控系数的计算参数"""
+
+    # 分类权重，覆盖词库中标注的权重
+    weights: Mapping[str, float] = {}
+    # 分类门限：加权覆盖率低于门限的分类不计入
+    gates: Mapping[str, float] = {}
+    # 稀释窗口：覆盖率的分母不超过该字符数，0 表示按全文长度
+    window: int = 0
+
+
+class _DeltaTrie:
+    """增量词条字典树，支持 O(词长) 的插入与删除"""
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.root: dict = {}
+        self.words: Set[str] = set()
+        for word in words:
+            self.add(word)
+
+    def __bool__(self) -> bool:
+        return bool(self.words)
+
+    def add(self, word: str):
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[None] = word
+        self.words.add(word)
+
+    def remove(self, word: str):
+        if word not in self.words:
+            return
+        path = [self.root]
+        for ch in word:
+            path.append(path[-1][ch])
+        del path[-1][None]
+        # 剪除空分支
+        for i in range(len(word), 0, -1):
+            if path[i]:
+                break
+            del path[i - 1][word[i - 1]]
+        self.words.discard(word)
+
+    def find_all(self, text: str) -> List[Tuple[str, int]]:
+        """
+        找出所有命中
+
+        :param text: 待匹配文本
+        :return: (词条, 起始位置) 列表
+        """
+        hits = []
+        root = self.root
+        for start in range(len(text)):
+            node = root
+            for ch in text[start:]:
+                node = node.get(ch)
+                if node is None:
+                    break
+                word = node.get(None)
+                if word is not None:
+                    hits.append((word, start))
+        return hits
+
+
+class _GroupLexicon:
+    """群组词库：额外违禁词与豁免词"""
+
+    def __init__(self, extra: Iterable[str] = (), suppressed: Iterable[str] = ()):
+        self.extra = _DeltaTrie(extra)
+        self.suppressed: Set[str] = set(suppressed)
+
+    def __bool__(self) -> bool:
+        return bool(self.extra or self.suppressed)
+
+
+class Lexicon:
+    """
+    违禁词库：预编译基础索引 + 增量覆盖层
+
+    运行时增删的词条只写入覆盖层（小字典树与删除集合），无需重建基础索引；
+    群组词库在全局词库之上追加额外违禁词或豁免词（归入默认分类）。
+    消息与词条在匹配前经过同一规范化器处理，覆盖范围映射回原文位置。
+    """
+
+    def __init__(
+        self,
+        index_dir: str | Path,
+        overlay_path: str | Path | None = None,
+        scoring: Optional[L1Scoring] = None,
+    ):
+        self.index_dir = Path(index_dir)
+        self.overlay_path = Path(overlay_path) if overlay_path else None
+        self.scoring = scoring or L1Scoring()
+        self.paths: List[Path] = []
+        self._base: Optional[KeywordMatcher] = None
+        self._normalizer: Optional[TextNormalizer] = None
+
+        self.added = _DeltaTrie()
+        self.removed: Set[str] = set()
+        self.groups: Dict[str, _GroupLexicon] = {}
+        self.overlay_mtime = 0.0
+        self.load_overlay()
+
+    @property
+    def normalizer(self) -> TextNormalizer:
+        """文本规范化器，首次访问时构建"""
+        if self._normalizer is None:
+            self._normalizer = TextNormalizer()
+        return self._normalizer
+
+    @property
+    def base(self) -> KeywordMatcher:
+        """基础匹配器，首次访问时映射预编译索引（缺失时先编译）"""
+        if self._base is None:
+            self._base = KeywordMatcher.compile(
+                self.paths, self.index_dir, self.normalizer
+            )
+        return self._base
+
+    def add_source(self, path: Path):
+        """
+        添加违禁词文件，基础索引在下次使用时重新加载
+
+        :param path: 违禁词文件路径
+        """
+        if path not in self.paths:
+            self.paths.append(path)
+            self._base = None
+
+    def add(self, word: str, group_id: str | int | None = None) -> str:
+        """
+        添加违禁词
+
+        :param word: 违禁词
+        :param group_id: 群号，为空时作用于全局
+        :return: 规范化后的违禁词
+        """
+        entry, word = word, self.normalizer.normalize_word(word)
+        if not word:
+            raise ValueError("违禁词不能为空")
+        problem = keyword_problem(entry, word)
+        if problem is not None:
+            raise ValueError(f"无法添加违禁词：{problem}")
+        # 集合以替换代替原地修改，线程池中的扫描不受影响
+        if group_id is None:
+            self.removed = self.removed - {word}
+            self.added.add(word)
+        else:
+            group = self.groups.setdefault(str(group_id), _GroupLexicon())
+            group.suppressed = group.suppressed - {word}
+            group.extra.add(word)
+        self.save_overlay()
+        return word
+
+    def remove(self, word: str, group_id: str | int | None = None) -> str:
+        """
+        移除违禁词（群组内移除即为豁免）
+
+        :param word: 违禁词
+        :param group_id: 群号，为空时作用于全局
+        :return: 规范化后的违禁词
+        """
+        word = self.normalizer.normalize_word(word)
+        if not word:
+            raise ValueError("违禁词不能为空")
+        if group_id is None:
+            self.added.remove(word)
+            self.removed = self.removed | {word}
+        else:
+            group = self.groups.setdefault(str(group_id), _GroupLexicon())
+            group.extra.remove(word)
+            group.suppressed = group.suppressed | {word}
+        self.save_overlay()
+        return word
+
+    def scan(
+        self, message: str, group_id: str | int | None = None
+    ) -> Tuple[List[str], int]:
+        """
+        解析违禁词并统计覆盖字符数
+
+        :param message: 待解析的消息
+        :param group_id: 群号
+        :return: (违禁词列表, 原文中的覆盖字符数)
+        """
+        text, offsets = self.normalizer.normalize(message)
+        group = self.groups.get(str(group_id)) if group_id is not None else None
+        if not (self.added or self.removed or group):
+            return self.base.scan(text, offsets)
+
+        # 合并基础索引与覆盖层的命中
+        suppressed = group.suppressed if group else set()
+        hidden = self.removed | suppressed
+        words = self.base.words
+        hits = {(words[wid], start) for wid, start in self.base.find_all(text)}
+        hits = {hit for hit in hits if hit[0] not in hidden}
+        hits.update(
+            hit for hit in self.added.find_all(text) if hit[0] not in suppressed
+        )
+        if group:
+            hits.update(group.extra.find_all(text))
+        hits = sorted((-len(word), word, start) for word, start in hits)
+        if not hits:
+            return [], 0
+        return select_hits(
+            [(word, start, -neg_len) for neg_len, word, start in hits],
+            len(text),
+            offsets,
+        )
+
+    def scan_categories(
+        self, message: str, group_id: str | int | None = None
+    ) -> Tuple[List[str], Dict[str, int]]:
+        """
+        解析违禁词并按分类统计覆盖字符数
+
+        :param message: 待解析的消息
+        :param group_id: 群号
+        :return: (违禁词列表, 分类到原文中覆盖字符数的映射)
+        """
+        text, offsets = self.normalizer.normalize(message)
+        group = self.groups.get(str(group_id)) if group_id is not None else None
+        if not (self.added or self.removed or group):
+            return self.base.scan_categories(text, offsets)
+
+        # 合并基础索引与覆盖层的命中，覆盖层词条归入默认分类
+        suppressed = group.suppressed if group else set()
+        hidden = self.removed | suppressed
+        base = self.base
+        categories: Dict[str, str] = {}
+        hits = set()
+        for wid, start in base.find_all(text):
+            word = base.words[wid]
+            if word not in hidden:
+                hits.add((word, start))
+                categories[word] = base.category(wid)
+        hits.update(
+            hit for hit in self.added.find_all(text) if hit[0] not in suppressed
+        )
+        if group:
+            hits.update(group.extra.find_all(text))
+        hits = sorted((-len(word), word, start) for word, start in hits)
+        if not hits:
+            return [], {}
+        return select_hits(
+            [(word, start, -neg_len) for neg_len, word, start in hits],
+            len(text),
+            offsets,
+            lambda word: categories.get(word, DEFAULT_CATEGORY),
+        )
+
+    def combine(self, covers: Dict[str, int], length: int) -> float:
+        """
+        按分类合并覆盖率：各分类得分为 权重 × 覆盖率，低于门限的分类不计入，
+        多个分类的得分按 1 - ∏(1 - 得分) 合并
+
+        :param covers: 分类到覆盖字符数的映射
+        :param length: 原文长度
+        :return: l1风控系数 (0-1.0)
+        """
+        scoring = self.scoring
+        if scoring.window > 0:
+            length = min(length, scoring.window)
+        weights = self.base.category_weights
+        combined = 0.0
+        for category, covered in covers.items():
+            weight = scoring.weights.get(category, weights.get(category, 1.0))
+            score = min(weight * covered / length, 1.0)
+            if score <= 0 or score < scoring.gates.get(category, 0.0):
+                continue
+            combined += score - combined * score
+        return combined
+
+    def score(self, message: str, group_id: str | int | None = None) -> float:
+        """
+        计算l1风控系数：按分类严重程度加权的违禁词覆盖率
+
+        :param message: 消息内容
+        :param group_id: 群号
+        :return: l1风控系数 (0-1.0)
+        """
+        return self.analyze(message, group_id)[0]
+
+    def analyze(
+        self, message: str, group_id: str | int | None = None
+    ) -> Tuple[float, List[str]]:
+        """
+        计算l1风控系数并返回命中的违禁词
+
+        :param message: 消息内容
+        :param group_id: 群号
+        :return: (l1风控系数, 违禁词列表)
+        """
+        message = message.strip()
+        if not message:
+            return 0.0, []
+        rc_list, covers = self.scan_categories(message, group_id)
+        if not rc_list:
+            return 0.0, []
+        return self.combine(covers, len(message)), rc_list
+
+    def score_many(
+        self, items: Iterable[Tuple[str, str | int | None]]
+    ) -> List[Tuple[float, float]]:
+        """
+        批量计算l1风控系数
+
+        :param items: (消息内容, 群号) 列表
+        :return: (l1风控系数, 计算耗时) 列表
+        """
+        results = []
+        for message, group_id in items:
+            timer = Timer()
+            results.append((self.score(message, group_id), timer.end()))
+        return results
+
+    def refresh_overlay(self):
+        """覆盖层文件被其他进程修改时重新加载"""
+        if not self.overlay_path:
+            return
+        try:
+            mtime = self.overlay_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self.overlay_mtime:
+            self.load_overlay()
+
+    def load_overlay(self):
+        """加载覆盖层"""
+        if not self.overlay_path or not self.overlay_path.exists():
+            return
+        self.overlay_mtime = self.overlay_path.stat().st_mtime
+        with open(self.overlay_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        self.added = _DeltaTrie(data.get("add", []))
+        self.removed = set(data.get("remove", []))
+        self.groups = {
+            str(group_id): _GroupLexicon(
+                group.get("add", []), group.get("suppress", [])
+            )
+            for group_id, group in data.get("groups", {}).items()
+        }
+
+    def save_overlay(self):
+        """保存覆盖层"""
+        if not self.overlay_path:
+            return
+        data = {
+            "add": sorted(self.added.words),
+            "remove": sorted(self.removed),
+            "groups": {
+                group_id: {
+                    "add": sorted(group.extra.words),
+                    "suppress": sorted(group.suppressed),
+                }
+                for group_id, group in self.groups.items()
+                if group
+            },
+        }
+        tmp_path = self.overlay_path.with_name(self.overlay_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.overlay_path)
+        self.overlay_mtime = self.overlay_path.stat().st_mtime
@@ -0,0 +1,524 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import deque
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Sequence,
+    Tuple,
+)
+
+from .normalizer import TextNormalizer
+
+_MAGIC = b"RCKW"
+_VERSION = 4
+_SECTIONS = (
+    "base",
+    "chars",
+    "targets",
+    "fail",
+    "out",
+    "link",
+    "lengths",
+    "word_categories",
+    "offsets",
+)
+# 各数组长度 + 词条字节数 + 分类表字节数
+_HEADER = struct.Struct("=4sI" + "I" * (len(_SECTIONS) + 2))
+
+# 未标注分类的词条
+DEFAULT_CATEGORY = "default"
+
+# 正则/通配符元字符：词库按字面匹配，含这些字符的词条规范化后会退化为其他词
+_PATTERN_CHARS = re.compile(r"[*?+{}\[\]()^$|\\]")
+# 规范化改变了字面（剔除分隔符、繁转简）时，新词至少需要的长度
+_MIN_FOLDED_LENGTH = 3
+
+logger = logging.getLogger(__name__)
+
+
+def _literal(entry: str) -> str:
+    """词条的字面形式（仅折叠大小写）"""
+    return entry.strip().lower()
+
+
+def keyword_problem(
+    entry: str, word: str, literals: Optional[Set[str]] = None
+) -> Optional[str]:
+    """
+    检查词条能否按规范化后的形式使用
+
+    :param entry: 词条原文
+    :param word: 规范化后的词条
+    :param literals: 词库中全部词条的字面形式，规范化结果为其中之一时视为重复而非新词
+    :return: 不可用的原因，可用时为空
+    """
+    if _PATTERN_CHARS.search(entry):
+        return "包含正则/通配符"
+    if len(word) == 1 and word.isascii() and word.isalnum():
+        return "规范化后仅剩单个字母或数字"
+    literal = _literal(entry)
+    if word == literal or (literals is not None and word in literals):
+        return None
+    if len(word) <= 1 < len(literal):
+        return "规范化后仅剩单字"
+    if len(word) < _MIN_FOLDED_LENGTH:
+        return f"规范化后变为其他词（{word}）"
+    return None
+
+
+def parse_keywords(
+    text: str, normalize: Callable[[str], str]
+) -> Tuple[Dict[str, str], Dict[str, float], List[Tuple[str, str]]]:
+    """
+    解析违禁词文件：每行一个词条，[分类] 或 [分类:权重] 行开始一个分类，
+    此前的词条属于默认分类；权重缺省为 1。
+    包含正则/通配符的词条，规范化后只剩单个字母或数字的词条，
+    以及规范化（全角转半角、剔除分隔符、繁转简）后退化为单字或新的短词的词条不予收录
+
+    :param text: 文件内容
+    :param normalize: 词条规范化函数
+    :return: (词条到分类的映射, 分类到权重的映射, 未收录的 (词条, 原因) 列表)
+    """
+    entries: List[Tuple[str, str]] = []
+    categories: Dict[str, float] = {}
+    category = DEFAULT_CATEGORY
+    for line in text.splitlines():
+        stripped = line.strip()
+        if len(stripped) > 2 and stripped[0] == "[" and stripped[-1] == "]":
+            name, _, weight = stripped[1:-1].partition(":")
+            category = name.strip() or DEFAULT_CATEGORY
+            try:
+                categories[category] = float(weight) if weight.strip() else 1.0
+            except ValueError:
+                raise ValueError(f"违禁词分类权重格式错误：{stripped}")
+            continue
+        if stripped:
+            entries.append((stripped, category))
+
+    literals = {_literal(entry) for entry, _ in entries}
+    words: Dict[str, str] = {}
+    rejected: List[Tuple[str, str]] = []
+    for entry, category in entries:
+        word = normalize(entry)
+        if not word:
+            continue
+        problem = keyword_problem(entry, word, literals)
+        if problem is not None:
+            rejected.append((entry, problem))
+            continue
+        _assign(words, word, category, categories)
+    return words, categories, rejected
+
+
+def _assign(
+    words: Dict[str, str], word: str, category: str, categories: Mapping[str, float]
+):
+    """同一词条出现在多个分类时归入权重较高者"""
+    current = words.get(word)
+    if current is None or categories.get(category, 1.0) > categories.get(current, 1.0):
+        words[word] = category
+
+
+class _WordTable(Sequence):
+    """索引文件中的词条表，按需解码"""
+
+    def __init__(self, offsets: Sequence[int], blob: memoryview):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return str(self.blob[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+
+class KeywordMatcher:
+    """
+    违禁词多模式匹配器（Aho-Corasick 自动机）
+
+    自动机以扁平数组存储：节点 n 的出边为 chars/targets[base[n]:base[n + 1]]，
+    按字符码点升序排列，查找时二分。
+    词条按 (长度降序, 字典序) 编号，编号即最长优先的匹配顺序。
+    每个词条带有分类编号，分类表记录各分类的名称与严重程度权重。
+    数组可保存为二进制索引文件，加载时以只读 mmap 映射，多个进程共享同一份物理页。
+    """
+
+    def __init__(
+        self,
+        words: Iterable[str] | Mapping[str, str] = (),
+        categories: Optional[Mapping[str, float]] = None,
+    ):
+        self.build(words, categories)
+
+    def build(
+        self,
+        words: Iterable[str] | Mapping[str, str],
+        categories: Optional[Mapping[str, float]] = None,
+    ) -> "KeywordMatcher":
+        """
+        构建自动机
+
+        :param words: 违禁词，或违禁词到分类的映射
+        :param categories: 分类到权重的映射，未列出的分类权重为 1
+        :return: 匹配器自身
+        """
+        if not isinstance(words, Mapping):
+            words = dict.fromkeys(words, DEFAULT_CATEGORY)
+        self.words: Sequence[str] = sorted(
+            {word for word in words if word}, key=lambda w: (-len(w), w)
+        )
+        self.lengths = array("I", map(len, self.words))
+
+        # 分类表
+        categories = dict(categories or {})
+        for category in words.values():
+            categories.setdefault(category, 1.0)
+        self.category_names: List[str] = sorted(categories)
+        self.category_weights: Dict[str, float] = {
+            name: categories[name] for name in self.category_names
+        }
+        ids = {name: i for i, name in enumerate(self.category_names)}
+        self.word_categories = array("I", (ids[words[word]] for word in self.words))
+
+        # 构建字典树
+        trie = [{}]
+        out = [0]
+        for wid, word in enumerate(self.words):
+            node = 0
+            for ch in word:
+                code = ord(ch)
+                nxt = trie[node].get(code)
+                if nxt is None:
+                    nxt = len(trie)
+                    trie[node][code] = nxt
+                    trie.append({})
+                    out.append(0)
+                node = nxt
+            out[node] = wid + 1
+
+        # 失配指针与输出链
+        fail = [0] * len(trie)
+        link = [0] * len(trie)
+        queue = deque(trie[0].values())
+        while queue:
+            node = queue.popleft()
+            for code, child in trie[node].items():
+                f = fail[node]
+                while f and code not in trie[f]:
+                    f = fail[f]
+                target = trie[f].get(code, 0)
+                fail[child] = target
+                link[child] = target if out[target] else link[target]
+                queue.append(child)
+
+        # 扁平化
+        base = array("I", [0])
+        chars = array("I")
+        targets = array("I")
+        for edges in trie:
+            for code in sorted(edges):
+                chars.append(code)
+                targets.append(edges[code])
+            base.append(len(chars))
+
+        self.base = base
+        self.chars = chars
+        self.targets = targets
+        self.fail = array("I", fail)
+        self.out = array("I", out)
+        self.link = array("I", link)
+        return self
+
+    @classmethod
+    def compile(
+        cls,
+        paths: Iterable[str | Path],
+        index_dir: str | Path,
+        normalizer: Optional[TextNormalizer] = None,
+    ) -> "KeywordMatcher":
+        """
+        加载违禁词索引，索引文件以词库内容哈希命名，不存在时先编译
+
+        :param paths: 违禁词文件路径
+        :param index_dir: 索引文件目录
+        :param normalizer: 文本规范化器，词条以规范化后的形式编译
+        :return: 映射到索引文件的匹配器
+        """
+        sources = []
+        digest = hashlib.sha256(_MAGIC + _VERSION.to_bytes(4, "little"))
+        if normalizer is not None:
+            digest.update(normalizer.fingerprint)
+        for path in paths:
+            try:
+                data = Path(path).read_bytes()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"无法找到违禁词文件：{path}")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+            sources.append(data)
+
+        index_path = Path(index_dir) / f"keywords-{digest.hexdigest()[:16]}.idx"
+        if not index_path.exists():
+            normalize = (
+                normalizer.normalize_word
+                if normalizer is not None
+                else lambda line: line.strip().lower()
+            )
+            words: Dict[str, str] = {}
+            categories: Dict[str, float] = {}
+            for data in sources:
+                file_words, file_categories, rejected = parse_keywords(
+                    data.decode("utf-8"), normalize
+                )
+                if rejected:
+                    logger.warning(
+                        "违禁词文件中 %d 个词条未收录，如：%s",
+                        len(rejected),
+                        "、".join(
+                            f"{entry}（{reason}）" for entry, reason in rejected[:5]
+                        ),
+                    )
+                for category, weight in file_categories.items():
+                    categories.setdefault(category, weight)
+                for word, category in file_words.items():
+                    _assign(words, word, category, categories)
+            cls(words, categories).save(index_path)
+        return cls.load(index_path)
+
+    def save(self, path: str | Path):
+        """
+        保存为二进制索引文件（先写临时文件再原子替换）
+
+        :param path: 索引文件路径
+        """
+        offsets = array("I", [0])
+        blob = bytearray()
+        for word in self.words:
+            blob += word.encode("utf-8")
+            offsets.append(len(blob))
+        sections = [
+            offsets if name == "offsets" else getattr(self, name) for name in _SECTIONS
+        ]
+        table = json.dumps(
+            [[name, self.category_weights[name]] for name in self.category_names],
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 临时文件名唯一，同一进程内多个线程同时编译也不会互相覆盖
+        file = tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+        )
+        tmp_path = Path(file.name)
+        try:
+            with file:
+                file.write(
+                    _HEADER.pack(
+                        _MAGIC,
+                        _VERSION,
+                        *(len(a) for a in sections),
+                        len(blob),
+                        len(table),
+                    )
+                )
+                for section in sections:
+                    file.write(section.tobytes())
+                file.write(blob)
+                file.write(table)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: str | Path) -> "KeywordMatcher":
+        """
+        以只读 mmap 映射二进制索引文件
+
+        :param path: 索引文件路径
+        :return: 匹配器
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, *counts = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"无法识别的违禁词索引文件：{path}")
+
+        matcher = cls.__new__(cls)
+        view = memoryview(buffer)
+        pos = _HEADER.size
+        for name, count in zip(_SECTIONS, counts):
+            setattr(matcher, name, view[pos : pos + 4 * count].cast("I"))
+            pos += 4 * count
+        blob_size, table_size = counts[-2:]
+        matcher.words = _WordTable(matcher.offsets, view[pos : pos + blob_size])
+        pos += blob_size
+        table = json.loads(bytes(view[pos : pos + table_size]).decode("utf-8"))
+        matcher.category_names = [name for name, _ in table]
+        matcher.category_weights = {name: weight for name, weight in table}
+        return matcher
+
+    def category(self, wid: int) -> str:
+        """
+        词条所属分类
+
+        :param wid: 词条编号
+        :return: 分类名称
+        """
+        return self.category_names[self.word_categories[wid]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """
+        单次扫描找出所有（含重叠的）命中
+
+        :param text: 待匹配文本
+        :return: (词条编号, 起始位置) 列表
+        """
+        base, chars, targets = self.base, self.chars, self.targets
+        fail, out, link, lengths = self.fail, self.out, self.link, self.lengths
+
+        hits = []
+        state = 0
+        for i, ch in enumerate(text):
+            code = ord(ch)
+            while True:
+                hi = base[state + 1]
+                j = bisect_left(chars, code, base[state], hi)
+                if j < hi and chars[j] == code:
+                    state = targets[j]
+                    break
+                if not state:
+                    break
+                state = fail[state]
+
+            node = state if out[state] else link[state]
+            while node:
+                wid = out[node] - 1
+                hits.append((wid, i + 1 - lengths[wid]))
+                node = link[node]
+        return hits
+
+    def scan(
+        self, message: str, offsets: Optional[List[int]] = None
+    ) -> Tuple[List[str], int]:
+        """
+        解析违禁词并统计覆盖字符数
+
+        命中按最长优先、互不重叠的规则选取；覆盖范围为被选中词条的全部出现位置。
+
+        :param message: 待解析的消息
+        :param offsets: 消息各字符在原文中的位置，覆盖字符数按原文统计
+        :return: (违禁词列表, 覆盖字符数)
+        """
+        hits = self.find_all(message)
+        if not hits:
+            return [], 0
+        hits.sort()
+
+        lengths, words = self.lengths, self.words
+        selected, covered = select_hits(
+            [(wid, start, lengths[wid]) for wid, start in hits], len(message), offsets
+        )
+        return [words[wid] for wid in selected], covered
+
+    def scan_categories(
+        self, message: str, offsets: Optional[List[int]] = None
+    ) -> Tuple[List[str], Dict[str, int]]:
+        """
+        解析违禁词并按分类统计覆盖字符数
+
+        :param message: 待解析的消息
+        :param offsets: 消息各字符在原文中的位置，覆盖字符数按原文统计
+        :return: (违禁词列表, 分类到覆盖字符数的映射)
+        """
+        hits = self.find_all(message)
+        if not hits:
+            return [], {}
+        hits.sort()
+
+        lengths, words = self.lengths, self.words
+        selected, covered = select_hits(
+            [(wid, start, lengths[wid]) for wid, start in hits],
+            len(message),
+            offsets,
+            self.category,
+        )
+        return [words[wid] for wid in selected], covered
+
+
+def select_hits(
+    hits: List[Tuple[Hashable, int, int]],
+    size: int,
+    offsets: Optional[List[int]] = None,
+    category: Optional[Callable[[Hashable], str]] = None,
+) -> Tuple[list, int | Dict[str, int]]:
+    """
+    按最长优先、互不重叠的规则选取命中，并统计覆盖字符数
+
+    :param hits: (词条, 起始位置, 长度) 列表，须已按优先顺序排列
+    :param size: 文本长度
+    :param offsets: 文本各字符在原文中的位置，覆盖范围映射回原文（含中间的分隔符）
+    :param category: 词条到分类的映射，给出时按分类分别统计
+    :return: (选中的词条列表, 被选中词条全部出现位置的覆盖字符数；按分类统计时为分类到覆盖字符数的映射)
+    """
+    taken = bytearray(size)
+    selected = set()
+    rc_list = []
+    for word, start, length in hits:
+        end = start + length
+        if taken.find(1, start, end) == -1:
+            taken[start:end] = b"\x01" * length
+            selected.add(word)
+            rc_list.append(word)
+
+    extent = offsets[-1] + 1 if offsets else size
+    covers: Dict[Optional[str], bytearray] = {}
+    for word, start, length in hits:
+        if word in selected:
+            if offsets:
+                start, end = offsets[start], offsets[start + length - 1] + 1
+                length = end - start
+            key = category(word) if category is not None else None
+            covered = covers.get(key)
+            if covered is None:
+                covered = covers[key] = bytearray(extent)
+            covered[start : start + length] = b"\x01" * length
+    if category is not None:
+        return rc_list, {key: covered.count(1) for key, covered in covers.items()}
+    return rc_list, covers[None].count(1) if covers else 0
+
+
+if __name__ == "__main__":
+    # 预编译索引：python -m utils.matcher [违禁词文件 ...]
+    import sys
+
+    plugin_root = Path(__file__).resolve().parent.parent
+    paths = sys.argv[1:] or [plugin_root / "keyword" / "keywords.txt"]
+    matcher = KeywordMatcher.compile(
+        paths, plugin_root / "keyword" / ".index", TextNormalizer()
+    )
+    print(f"已编译 {len(matcher.words)} 个违禁词")
@@ -0,0 +1,284 @@
+import asyncio
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 延迟直方图分桶上界（秒）
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# 大小直方图分桶上界（字符数）
+SIZE_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """固定分桶直方图"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        按分桶线性插值估算分位数
+
+        :param q: 分位 (0-1)
+        :return: 估算值
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            if i < len(self.buckets):
+                lower = self.buckets[i]
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    运行指标：计数器、仪表与直方图
+
+    记录只做字典查找与整数累加，可导出为 Prometheus 文本格式（本地 HTTP 端点或文件）。
+    """
+
+    def __init__(self, prefix: str = "rc_"):
+        self.prefix = prefix
+        self.counters: Dict[_Key, float] = {}
+        self.gauges: Dict[_Key, float] = {}
+        self.histograms: Dict[_Key, Histogram] = {}
+        self.collectors: List[Callable[["Metrics"], None]] = []
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.dump_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> _Key:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器累加"""
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """设置仪表值"""
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+        **labels,
+    ):
+        """记录一次直方图观测值（分桶仅在首次记录时生效）"""
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def add_collector(self, collector: Callable[["Metrics"], None]):
+        """
+        注册采集函数，导出前调用，用于刷新仪表值（如排队深度、缓存命中率）
+
+        :param collector: 采集函数，参数为本对象
+        """
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """以单调时钟计时并记录到直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """
+        导出为 Prometheus 文本格式
+
+        :return: 指标文本
+        """
+        self.collect()
+        lines = []
+        typed = set()
+
+        def header(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {self.prefix}{name} {kind}")
+
+        def labels_text(labels, extra: str = "") -> str:
+            parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+            if extra:
+                parts.append(extra)
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name, "counter")
+            lines.append(f"{self.prefix}{name}{labels_text(labels)} {value:g}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{self.prefix}{name}{labels_text(labels)} {value:g}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = labels_text(labels, f'le="{bound:g}"')
+                lines.append(f"{self.prefix}{name}_bucket{le} {cumulative}")
+            le = labels_text(labels, 'le="+Inf"')
+            lines.append(f"{self.prefix}{name}_bucket{le} {histogram.count}")
+            lines.append(
+                f"{self.prefix}{name}_sum{labels_text(labels)} {histogram.sum:g}"
+            )
+            lines.append(
+                f"{self.prefix}{name}_count{labels_text(labels)} {histogram.count}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        生成便于在聊天中查看的指标摘要
+
+        :return: 摘要文本
+        """
+        self.collect()
+        lines = ["分布（次数 / 平均 / p50 / p95）："]
+        for (name, labels), h in sorted(self.histograms.items()):
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            scale, unit = (1000, "ms") if name.endswith("_seconds") else (1, "")
+            text = " / ".join(
+                f"{value * scale:.1f}{unit}"
+                for value in (
+                    h.sum / h.count if h.count else 0.0,
+                    h.quantile(0.5),
+                    h.quantile(0.95),
+                )
+            )
+            lines.append(f"  {name}{f'[{label}]' if label else ''}：{h.count} / {text}")
+        lines.append("计数：")
+        for (name, labels), value in sorted(self.counters.items()):
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            lines.append(f"  {name}{f'[{label}]' if label else ''}：{value:g}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            lines.append(f"  {name}{f'[{label}]' if label else ''}：{value:g}")
+        return "\n".join(lines)
+
+    def dump(self, path: str | Path):
+        """
+        将指标写入文件（Prometheus 文本格式，可供 node_exporter textfile 采集）
+
+        :param path: 文件路径
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def start_dump(self, path: str | Path, interval: float = 60):
+        """
+        定期将指标写入文件
+
+        :param path: 文件路径
+        :param interval: 写入间隔（秒）
+        """
+        if self.dump_task is not None and not self.dump_task.done():
+            return
+
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                self.dump(path)
+
+        self.dump_task = asyncio.create_task(loop())
+
+    async def serve(self, port: int, host: str = "127.0.0.1"):
+        """
+        启动本地 HTTP 端点，任意路径均返回 Prometheus 文本
+
+        :param port: 端口
+        :param host: 监听地址
+        """
+        if self.server is not None:
+            return
+        self.server = await asyncio.start_server(self._handle_http, host, port)
+
+    async def stop(self):
+        """关闭 HTTP 端点并停止定期写入（插件重载前调用，以便重新绑定端口）"""
+        if self.dump_task is not None:
+            self.dump_task.cancel()
+            self.dump_task = None
+        if self.server is not None:
+            server, self.server = self.server, None
+            server.close()
+            await server.wait_closed()
+
+    async def _handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            body = self.render().encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
@@ -0,0 +1,79 @@
+import hashlib
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# 视为分隔符的字符范围：ASCII、Latin-1、通用标点、CJK 符号、CJK 兼容形式、小写变体、全角字符
+_SEPARATOR_RANGES = (
+    (0x0000, 0x00FF),
+    (0x2000, 0x206F),
+    (0x3000, 0x303F),
+    (0xFE30, 0xFE6F),
+    (0xFF00, 0xFFEF),
+)
+_SEPARATOR_CATEGORIES = ("Z", "P", "Cc", "Cf", "Sm", "Sk")
+_SEPARATOR = "\x00"
+
+
+class TextNormalizer:
+    """
+    L1 文本规范化：单次 translate 完成全角转半角、大小写折叠、繁转简，
+    分隔符（空白、标点等）先映射为占位符再剔除，同时给出到原文位置的映射。
+    """
+
+    def __init__(self, t2s_path: str | Path | None = None):
+        if t2s_path is None:
+            t2s_path = Path(__file__).resolve().parent.parent / "keyword" / "t2s.txt"
+
+        table: Dict[int, str] = {}
+        # 大小写折叠（仅保留一对一的映射，保证位置对齐）
+        for code in range(0x10000):
+            ch = chr(code)
+            lower = ch.lower()
+            if lower != ch and len(lower) == 1:
+                table[code] = lower
+        # 全角转半角
+        for code in range(0xFF01, 0xFF5F):
+            table[code] = chr(code - 0xFEE0).lower()
+        # 繁转简
+        try:
+            with open(t2s_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    pair = line.split()
+                    if len(pair) == 2 and not line.startswith("#"):
+                        table[ord(pair[0])] = pair[1]
+        except FileNotFoundError:
+            raise FileNotFoundError(f"无法找到繁简映射文件：{t2s_path}")
+        # 分隔符
+        for start, end in _SEPARATOR_RANGES:
+            for code in range(start, end + 1):
+                ch = table.get(code, chr(code))
+                if unicodedata.category(ch).startswith(_SEPARATOR_CATEGORIES):
+                    table[code] = _SEPARATOR
+
+        self.table = table
+        self.fingerprint = hashlib.sha256(
+            "".join(f"{k}:{v};" for k, v in sorted(table.items())).encode("utf-8")
+        ).digest()
+
+    def normalize(self, text: str) -> Tuple[str, Optional[List[int]]]:
+        """
+        规范化文本
+
+        :param text: 原文
+        :return: (规范化文本, 规范化文本各字符在原文中的位置；未剔除字符时为 None)
+        """
+        text = text.translate(self.table)
+        if _SEPARATOR not in text:
+            return text, None
+        offsets = [i for i, ch in enumerate(text) if ch != _SEPARATOR]
+        return text.replace(_SEPARATOR, ""), offsets
+
+    def normalize_word(self, word: str) -> str:
+        """
+        规范化违禁词
+
+        :param word: 违禁词
+        :return: 规范化后的违禁词
+        """
+        return word.translate(self.table).replace(_SEPARATOR, "")
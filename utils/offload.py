@@ -0,0 +1,98 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .batcher import MicroBatcher
+from .lexicon import L1Scoring, Lexicon
+
+# 进程池工作进程内的词库（基础索引以 mmap 共享）
+_worker_lexicon: Optional[Lexicon] = None
+
+
+def _init_worker(
+    paths: List[Path],
+    index_dir: Path,
+    overlay_path: Optional[Path],
+    scoring: Optional[L1Scoring] = None,
+):
+    global _worker_lexicon
+    _worker_lexicon = Lexicon(index_dir, overlay_path, scoring)
+    for path in paths:
+        _worker_lexicon.add_source(path)
+
+
+def _score_worker(items: List[Tuple[str, str]]) -> List[Tuple[float, float]]:
+    _worker_lexicon.refresh_overlay()
+    return _worker_lexicon.score_many(items)
+
+
+def _analyze_worker(items: List[Tuple[str, str]]) -> List[Tuple[float, List[str]]]:
+    _worker_lexicon.refresh_overlay()
+    return [_worker_lexicon.analyze(message, group_id) for message, group_id in items]
+
+
+class L1Executor:
+    """
+    L1 计算卸载
+
+    同一轮事件循环内到达的 L1 请求合并为一批，交给线程池或进程池计算，
+    避免长消息或消息突发阻塞事件循环；mode 为空时在事件循环内直接计算。
+    """
+
+    def __init__(self, lexicon: Lexicon, mode: str = "", workers: int = 0):
+        self.lexicon = lexicon
+        self.mode = mode
+        self.workers = workers if workers > 0 else min(4, os.cpu_count() or 1)
+        self.pool: Optional[Executor] = None
+        self.batcher = MicroBatcher(self._run, window_ms=0, max_size=256)
+
+    async def score(
+        self, message: str, group_id: str | None = None
+    ) -> Tuple[float, float]:
+        """
+        计算l1风控系数
+
+        :param message: 消息内容
+        :param group_id: 群号
+        :return: (l1风控系数, 计算耗时)
+        """
+        if not self.mode:
+            return self.lexicon.score_many([(message, group_id)])[0]
+        return await self.batcher.submit((message, group_id))
+
+    async def _run(self, items: List[Tuple[str, str]]) -> List[Tuple[float, float]]:
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            return await loop.run_in_executor(self._get_pool(), _score_worker, items)
+        return await loop.run_in_executor(
+            self._get_pool(), self.lexicon.score_many, items
+        )
+
+    def _get_pool(self) -> Executor:
+        if self.pool is None:
+            if self.mode == "process":
+                # 先在主进程编译索引，工作进程直接映射
+                self.lexicon.base
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(
+                        self.lexicon.paths,
+                        self.lexicon.index_dir,
+                        self.lexicon.overlay_path,
+                        self.lexicon.scoring,
+                    ),
+                )
+            else:
+                self.pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="rc-l1"
+                )
+        return self.pool
+
+    def shutdown(self):
+        """关闭线程池或进程池"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
@@ -1,6 +1,8 @@
 import os
+import re
 import sys
 from pathlib import Path
+from typing import List
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -27,3 +29,76 @@ class PromptTool:
     @staticmethod
     def fill(prompt: str, key: str, value: str):
         return prompt.replace(f"[[{key}]]", value)
+
+    @staticmethod
+    def compile(prompt: str, **values: str) -> "CompiledPrompt":
+        """
+        预编译提示词
+
+        :param prompt: 提示词模板
+        :param values: 编译时已知的占位符取值
+        :return: 预编译提示词
+        """
+        return CompiledPrompt(prompt, **values)
+
+    @staticmethod
+    def pack(lines: List[str], budget: int) -> List[str]:
+        """
+        按字符预算裁剪上下文：先截断超长消息，仍超出时由旧到新丢弃
+
+        :param lines: 上下文消息（由旧到新）
+        :param budget: 字符预算，0 表示不限制
+        :return: 裁剪后的上下文消息
+        """
+        if budget <= 0 or sum(len(line) + 1 for line in lines) <= budget:
+            return lines
+        cap = max(budget // 4, 16)
+        lines = [line if len(line) <= cap else line[: cap - 1] + "…" for line in lines]
+        total = sum(len(line) + 1 for line in lines)
+        start = 0
+        while total > budget and start < len(lines) - 1:
+            total -= len(lines[start]) + 1
+            start += 1
+        return lines[start:]
+
+
+class CompiledPrompt:
+    """
+    预编译提示词
+
+    模板按 [[key]] 占位符切分为文本片段与动态槽位，编译时已知的占位符直接并入文本；
+    首个动态槽位之前的部分（prefix）各次调用逐字节一致，便于模型服务端复用前缀缓存。
+    """
+
+    def __init__(self, prompt: str, **values: str):
+        parts = re.split(r"\[\[(\w+)\]\]", prompt)
+        self.segments: List[str] = []
+        self.slots: List[str] = []
+        text = parts[0]
+        for i in range(1, len(parts), 2):
+            key = parts[i]
+            if key in values:
+                text += values[key] + parts[i + 1]
+            else:
+                self.segments.append(text)
+                self.slots.append(key)
+                text = parts[i + 1]
+        self.segments.append(text)
+
+    @property
+    def prefix(self) -> str:
+        """静态前缀"""
+        return self.segments[0]
+
+    def render(self, **values: str) -> str:
+        """
+        填充动态槽位
+
+        :param values: 槽位取值，缺省时为空
+        :return: 完整提示词
+        """
+        out = [self.segments[0]]
+        for key, text in zip(self.slots, self.segments[1:]):
+            out.append(values.get(key, ""))
+            out.append(text)
+        return "".join(out)
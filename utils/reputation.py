@@ -0,0 +1,207 @@
+import asyncio
+import json
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+# 用户信誉等级
+TRUSTED = "trusted"  # 长期无违规
+NEUTRAL = "neutral"
+SUSPECT = "suspect"  # 近期有违规
+OFFENDER = "offender"  # 近期多次违规
+
+# 处理方式的编码与违规分值
+_ACTION_CODES = {"alert": 1, "withdraw": 2, "ban": 3}
+_ACTION_WEIGHTS = {"alert": 0.5, "withdraw": 1.0, "ban": 2.0}
+
+# 快照中各数组的顺序与类型
+_ARRAYS = (
+    ("score", "d"),
+    ("updated", "d"),
+    ("clean", "I"),
+    ("action", "B"),
+    ("action_ts", "d"),
+)
+
+
+class ReputationStore:
+    """
+    按 (群, 用户) 记录的信誉状态
+
+    各项状态存放在定长类型数组中（每个用户约 29 字节），键到槽位的映射按 LRU 淘汰：
+    - 违规分：每次处理按方式累加（提醒 0.5、撤回 1、禁言 2），按半衰期指数衰减，
+      单次完整处理只会进入近期违规，再次违规才会进入多次违规；
+    - 无违规消息数：违规时清零；
+    - 最近一次处理方式与时间。
+    定期将全部状态写入快照文件（拷贝数组后在线程中写入），启动时从快照恢复。
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        capacity: int = 65536,
+        half_life: float = 72 * 3600,
+        trust_after: int = 500,
+        suspect_score: float = 1.0,
+        offender_score: float = 5.0,
+        snapshot_interval: float = 300,
+    ):
+        self.path = Path(path) if path else None
+        self.capacity = max(capacity, 1)
+        self.half_life = half_life
+        self.trust_after = trust_after
+        self.suspect_score = suspect_score
+        self.offender_score = offender_score
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = time.monotonic()
+        self.snapshot_task: Optional[asyncio.Future] = None
+
+        self.clear()
+        if self.path is not None and self.path.exists():
+            try:
+                self.load()
+            except (OSError, ValueError, KeyError):
+                self.clear()
+
+    def clear(self):
+        """清空全部状态"""
+        self.slots: OrderedDict[Tuple[str, str], int] = OrderedDict()
+        self.free: list[int] = []
+        for name, typecode in _ARRAYS:
+            setattr(self, name, array(typecode))
+
+    def _decayed(self, slot: int, now: float) -> float:
+        score = self.score[slot]
+        if score and self.half_life > 0:
+            score *= 0.5 ** ((now - self.updated[slot]) / self.half_life)
+        return score
+
+    def _slot(self, key: Tuple[str, str]) -> int:
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.slots.move_to_end(key)
+            return slot
+        if self.free or len(self.slots) >= self.capacity:
+            slot = self.free.pop() if self.free else self.slots.popitem(last=False)[1]
+            self.score[slot] = 0.0
+            self.clean[slot] = 0
+            self.action[slot] = 0
+            self.action_ts[slot] = 0.0
+        else:
+            slot = len(self.score)
+            for name, _ in _ARRAYS:
+                getattr(self, name).append(0)
+        self.updated[slot] = time.time()
+        self.slots[key] = slot
+        return slot
+
+    def standing(self, group_id: str, user_id: str) -> str:
+        """
+        用户信誉等级
+
+        :param group_id: 群号
+        :param user_id: 用户
+        :return: 信誉等级
+        """
+        slot = self.slots.get((str(group_id), str(user_id)))
+        if slot is None:
+            return NEUTRAL
+        score = self._decayed(slot, time.time())
+        if score >= self.offender_score:
+            return OFFENDER
+        if score >= self.suspect_score:
+            return SUSPECT
+        if self.trust_after > 0 and self.clean[slot] >= self.trust_after:
+            return TRUSTED
+        return NEUTRAL
+
+    def record(self, group_id: str, user_id: str, actions: Iterable[str]):
+        """
+        记录一次判定
+
+        :param group_id: 群号
+        :param user_id: 用户
+        :param actions: 采取的处理方式，为空表示放行
+        """
+        slot = self._slot((str(group_id), str(user_id)))
+        actions = tuple(actions)
+        if not actions:
+            self.clean[slot] = min(self.clean[slot] + 1, 0xFFFFFFFF)
+        else:
+            now = time.time()
+            self.score[slot] = self._decayed(slot, now) + sum(
+                _ACTION_WEIGHTS.get(action, 0.0) for action in actions
+            )
+            self.updated[slot] = now
+            self.clean[slot] = 0
+            self.action[slot] = max(_ACTION_CODES.get(action, 0) for action in actions)
+            self.action_ts[slot] = now
+        self.maybe_snapshot()
+
+    def maybe_snapshot(self):
+        """距上次快照超过间隔时在后台写入快照"""
+        if self.path is None or self.snapshot_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self.last_snapshot < self.snapshot_interval:
+            return
+        if self.snapshot_task is not None and not self.snapshot_task.done():
+            return
+        self.last_snapshot = now
+        data = self.dumps()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(data)
+            return
+        self.snapshot_task = loop.run_in_executor(None, self._write, data)
+
+    def dumps(self) -> bytes:
+        """
+        序列化全部状态：首行为 JSON 头（各槽位的键与 LRU 顺序），其后依次为各数组的原始字节
+
+        :return: 快照内容
+        """
+        keys = [None] * len(self.score)
+        for key, slot in self.slots.items():
+            keys[slot] = key
+        header = {"version": 1, "keys": keys, "order": list(self.slots.values())}
+        return (
+            json.dumps(header, ensure_ascii=False).encode("utf-8")
+            + b"\n"
+            + b"".join(getattr(self, name).tobytes() for name, _ in _ARRAYS)
+        )
+
+    def _write(self, data: bytes):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(self.path)
+
+    def save(self):
+        """立即写入快照"""
+        if self.path is not None:
+            self._write(self.dumps())
+
+    def load(self):
+        """从快照恢复"""
+        data = self.path.read_bytes()
+        header, _, body = data.partition(b"\n")
+        header = json.loads(header)
+        keys = header["keys"]
+        offset = 0
+        for name, typecode in _ARRAYS:
+            values = array(typecode)
+            size = values.itemsize * len(keys)
+            values.frombytes(body[offset : offset + size])
+            if len(values) != len(keys):
+                raise ValueError("信誉快照已损坏")
+            offset += size
+            setattr(self, name, values)
+        self.slots = OrderedDict((tuple(keys[slot]), slot) for slot in header["order"])
+        # 超出容量时丢弃最早的部分，槽位随后复用
+        self.free = [slot for slot, key in enumerate(keys) if key is None]
+        while len(self.slots) > self.capacity:
+            self.free.append(self.slots.popitem(last=False)[1])
@@ -0,0 +1,134 @@
+import itertools
+from typing import List, Optional
+
+# 路由结果
+ROUTE_SKIP = "skip"  # 不调用大模型，直接放行
+ROUTE_L2 = "l2"  # 按层级经过 L2
+ROUTE_L3 = "l3"  # 跳过 L2，直接进入 L3（未配置 L3 时直接处理）
+
+
+class AdaptiveRouter:
+    """
+    按L1系数在各级风控间路由
+
+    - 低水位（不低于配置的 L1 阈值）以下不调用大模型；
+    - 高水位以上跳过 L2，直接进入 L3；
+    - 开启自动调整时，按L1系数分桶统计 L2 判别与高置信度的最终判定，
+      低水位取“其下判定为违规的比例不超过 max_miss”的最高分桶边界，
+      高水位取“其上 L2 判为存疑的比例不低于 min_agree”的最低分桶边界；
+      水位之外按 explore 比例保留经过完整流程的样本，使统计不因跳过而失真。
+    """
+
+    def __init__(
+        self,
+        floor: float = 0.0,
+        high_water: float = 0.0,
+        autotune: bool = False,
+        min_samples: int = 50,
+        explore: float = 0.05,
+        max_miss: float = 0.02,
+        min_agree: float = 0.95,
+        buckets: int = 20,
+        decay_every: int = 2000,
+    ):
+        self.floor = floor
+        self.low = floor
+        self.high_water = high_water
+        self.high = high_water
+        self.autotune = autotune
+        self.min_samples = max(min_samples, 1)
+        self.explore_every = round(1 / explore) if explore > 0 else 0
+        self.max_miss = max_miss
+        self.min_agree = min_agree
+        self.buckets = max(buckets, 1)
+        self.decay_every = decay_every
+        self.counter = itertools.count(1)
+        self.observed = 0
+
+        # 各分桶：L2 判别数、L2 存疑数、最终判定数、最终违规数
+        self.l2_total: List[float] = [0.0] * self.buckets
+        self.l2_yes: List[float] = [0.0] * self.buckets
+        self.judged: List[float] = [0.0] * self.buckets
+        self.violations: List[float] = [0.0] * self.buckets
+
+    def _bucket(self, l1: float) -> int:
+        return min(max(int(l1 * self.buckets), 0), self.buckets - 1)
+
+    def route(self, l1: float, floor: Optional[float] = None) -> str:
+        """
+        选择路由
+
+        :param l1: L1系数
+        :param floor: 群组的 L1 阈值，为空时使用全局阈值（自动调整的低水位随之平移）
+        :return: 路由结果
+        """
+        if floor is None:
+            floor = self.floor
+        if l1 < floor:
+            return ROUTE_SKIP
+        explore = (
+            self.autotune
+            and self.explore_every > 0
+            and next(self.counter) % self.explore_every == 0
+        )
+        if l1 < self.low + floor - self.floor and not explore:
+            return ROUTE_SKIP
+        if 0 < self.high <= l1 and not explore:
+            return ROUTE_L3
+        return ROUTE_L2
+
+    def observe(self, l1: float, l2: Optional[bool], violation: Optional[bool]):
+        """
+        记录一条经过大模型的消息
+
+        :param l1: L1系数
+        :param l2: L2 是否判为存疑，未经过 L2 时为空
+        :param violation: 最终是否违规，判定置信度不足时为空
+        """
+        bucket = self._bucket(l1)
+        if l2 is not None:
+            self.l2_total[bucket] += 1
+            self.l2_yes[bucket] += l2
+        if violation is not None:
+            self.judged[bucket] += 1
+            self.violations[bucket] += violation
+
+        self.observed += 1
+        if self.decay_every > 0 and self.observed % self.decay_every == 0:
+            for counts in (self.l2_total, self.l2_yes, self.judged, self.violations):
+                counts[:] = [count / 2 for count in counts]
+        if self.autotune:
+            self.tune()
+
+    def tune(self):
+        """按统计结果调整水位"""
+        # 低水位：自下而上累计，违规比例满足要求的最高边界
+        low = self.floor
+        judged = violations = 0.0
+        for bucket in range(self._bucket(self.floor), self.buckets):
+            judged += self.judged[bucket]
+            violations += self.violations[bucket]
+            if judged < self.min_samples:
+                continue
+            if violations / judged > self.max_miss:
+                break
+            low = max(low, (bucket + 1) / self.buckets)
+        self.low = low
+
+        # 高水位：自上而下累计，L2 存疑比例满足要求的最低边界（样本不足时沿用配置值）
+        high = None
+        total = yes = 0.0
+        for bucket in reversed(range(self._bucket(self.low), self.buckets)):
+            total += self.l2_total[bucket]
+            yes += self.l2_yes[bucket]
+            if total < self.min_samples:
+                continue
+            if yes / total < self.min_agree:
+                break
+            high = bucket / self.buckets
+        else:
+            if high is None:
+                high = self.high_water
+        if high is None:
+            high = 0.0
+        self.high = high if high > self.low else 0.0
@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from .metrics import METRICS
+
+
+class SchedulerOverloaded(Exception):
+    """调度队列已满，请求被丢弃"""
+
+
+class _ProviderState:
+    """单个模型的并发与排队状态"""
+
+    def __init__(self):
+        self.active = 0
+        self.queues: Dict[str, List[list]] = {}
+        self.rotation: deque[str] = deque()
+
+
+class LLMScheduler:
+    """
+    大模型请求调度器
+
+    - 每个模型限制同时进行的请求数；
+    - 排队请求按群轮转出队，同一群内按优先级（L1系数）出队；
+    - 排队总数达到上限时丢弃优先级最低的请求（同优先级丢弃较新的），被丢弃方收到 SchedulerOverloaded。
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 64):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self.providers: Dict[str, _ProviderState] = {}
+        self.counter = itertools.count()
+
+        # 指标
+        self.depth = 0
+        self.max_depth = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.shed = 0
+
+    @asynccontextmanager
+    async def slot(self, provider_id: str, group_id: str = "", priority: float = 0.0):
+        """
+        获取模型调用名额
+
+        :param provider_id: 模型 ID
+        :param group_id: 群号，用于公平排队
+        :param priority: 优先级，越大越先出队
+        """
+        await self.acquire(provider_id, str(group_id), priority)
+        try:
+            yield
+        finally:
+            self.release(provider_id)
+
+    async def acquire(self, provider_id: str, group_id: str, priority: float):
+        """
+        获取模型调用名额，需与 release 成对调用
+
+        :param provider_id: 模型 ID
+        :param group_id: 群号
+        :param priority: 优先级
+        """
+        state = self.providers.setdefault(provider_id, _ProviderState())
+        if state.active < self.max_concurrency and not state.queues:
+            state.active += 1
+            self._record_wait(0.0)
+            return
+
+        if self.depth >= self.max_queue:
+            self._shed(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [-priority, next(self.counter), future, time.monotonic()]
+        queue = state.queues.get(group_id)
+        if queue is None:
+            queue = state.queues[group_id] = []
+            state.rotation.append(group_id)
+        heapq.heappush(queue, entry)
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        self._dispatch(state)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # 仍在排队：出队时跳过
+                self.depth -= 1
+            elif future.exception() is None:
+                # 已获得名额：归还
+                self.release(provider_id)
+            raise
+
+    def release(self, provider_id: str):
+        state = self.providers[provider_id]
+        state.active -= 1
+        self._dispatch(state)
+
+    def _dispatch(self, state: _ProviderState):
+        """有空闲名额时放行排队请求"""
+        while state.active < self.max_concurrency:
+            entry = self._pop(state)
+            if entry is None:
+                break
+            state.active += 1
+            self.depth -= 1
+            self._record_wait(time.monotonic() - entry[3])
+            entry[2].set_result(None)
+
+    def _pop(self, state: _ProviderState) -> list | None:
+        """按群轮转取出下一个排队请求"""
+        while state.rotation:
+            group_id = state.rotation.popleft()
+            queue = state.queues[group_id]
+            while queue and queue[0][2].done():
+                heapq.heappop(queue)
+            entry = heapq.heappop(queue) if queue else None
+            while queue and queue[0][2].done():
+                heapq.heappop(queue)
+            if queue:
+                state.rotation.append(group_id)
+            else:
+                del state.queues[group_id]
+            if entry is not None:
+                return entry
+        return None
+
+    def _shed(self, priority: float):
+        """丢弃优先级最低的排队请求；新请求优先级不高于它时丢弃新请求"""
+        victim = None
+        for state in self.providers.values():
+            for queue in state.queues.values():
+                for entry in queue:
+                    if entry[2].done():
+                        continue
+                    # 优先级最低者中取最新入队的
+                    if victim is None or entry[:2] > victim[:2]:
+                        victim = entry
+        self.shed += 1
+        METRICS.inc("llm_shed_total")
+        if victim is None or -victim[0] >= priority:
+            raise SchedulerOverloaded("大模型请求队列已满")
+        victim[2].set_exception(SchedulerOverloaded("大模型请求队列已满"))
+        self.depth -= 1
+
+    def _record_wait(self, wait: float):
+        self.waits += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        METRICS.observe("llm_queue_wait_seconds", wait)
+
+    def stats(self) -> dict:
+        """
+        调度指标
+
+        :return: 排队深度、等待时长、丢弃数与各模型在途请求数
+        """
+        return {
+            "queue_depth": self.depth,
+            "queue_depth_max": self.max_depth,
+            "wait_avg": self.wait_total / self.waits if self.waits else 0.0,
+            "wait_max": self.wait_max,
+            "shed": self.shed,
+            "in_flight": {pid: s.active for pid, s in self.providers.items()},
+        }
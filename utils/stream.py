@@ -0,0 +1,177 @@
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+_THINK_BLOCK = re.compile(r"<think>.*?(?:</think>|$)", re.S)
+# 独立的 Y/N（或 YES/NO）：前后均不是英文字母
+_VERDICT = re.compile(r"(?<![A-Za-z])(YES|NO|Y|N)(?![A-Za-z])", re.I)
+
+
+def parse_verdict(text: str) -> Optional[bool]:
+    """
+    解析 L2 判别结果：思考过程之外的首个独立 Y/N
+
+    :param text: 模型输出
+    :return: 是否存疑，未找到时为空
+    """
+    match = _VERDICT.search(_THINK_BLOCK.sub("", text))
+    if match is None:
+        return None
+    return match.group(1).upper().startswith("Y")
+
+
+class _StreamText:
+    """逐段接收模型输出，跳过 <think>…</think> 思考过程"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.thinking = False
+
+    def _scan(self, chunk: str) -> Iterator[Tuple[int, str]]:
+        """
+        追加一段输出，依次产出新的可见字符
+
+        :param chunk: 输出片段
+        :return: (字符在累计文本中的位置, 字符)
+        """
+        self.buffer += chunk
+        text, i = self.buffer, self.pos
+        while i < len(text):
+            if self.thinking:
+                end = text.find(_THINK_CLOSE, i)
+                if end < 0:
+                    # 结束标签可能被截断，保留末尾几个字符待下一段
+                    i = max(i, len(text) - len(_THINK_CLOSE) + 1)
+                    break
+                self.thinking = False
+                i = end + len(_THINK_CLOSE)
+                continue
+            if text[i] == "<":
+                head = text[i : i + len(_THINK_OPEN)]
+                if head == _THINK_OPEN:
+                    self.thinking = True
+                    i += len(_THINK_OPEN)
+                    continue
+                if len(head) < len(_THINK_OPEN) and _THINK_OPEN.startswith(head):
+                    # 可能是被截断的开始标签，等待下一段
+                    break
+            self.pos = i + 1
+            yield i, text[i]
+            i += 1
+        self.pos = i
+
+
+class VerdictStream(_StreamText):
+    """
+    L2 判别的流式解析，结果与 parse_verdict 一致：思考过程之外的首个独立 Y/N；
+    token 之后须已收到非字母字符才能确定（输出结束时由 parse_verdict 处理末尾的 token）
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.verdict: Optional[bool] = None
+        self.visible = ""
+
+    def feed(self, chunk: str) -> bool:
+        """
+        接收一段输出
+
+        :param chunk: 输出片段
+        :return: 是否已得到判别结果
+        """
+        if self.verdict is not None:
+            return True
+        self.visible += "".join(char for _, char in self._scan(chunk))
+        match = _VERDICT.search(self.visible)
+        if match is None or match.end() >= len(self.visible):
+            return False
+        self.verdict = match.group(1).upper().startswith("Y")
+        return True
+
+
+class JSONFieldStream(_StreamText):
+    """
+    增量 JSON 解析：扫描输出中的第一个顶层对象，每个字段的值完整时立即回调，
+    无需等待整个对象（如先于 reason 输出的 grade）
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        super().__init__()
+        self.on_field = on_field
+        self.fields: Dict[str, Any] = {}
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key: Optional[str] = None
+        self.token_start: Optional[int] = None
+        self.scalar = False
+
+    def feed(self, chunk: str) -> bool:
+        """
+        接收一段输出
+
+        :param chunk: 输出片段
+        :return: 顶层对象是否已完整
+        """
+        if self.done:
+            return True
+        for i, char in self._scan(chunk):
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self._token(i + 1)
+                continue
+            if self.scalar and (char in ",}" or char.isspace()):
+                self._token(i)
+            if char == '"':
+                self.in_string = True
+                if self.depth == 1:
+                    self.token_start = i
+            elif char in "{[":
+                if self.depth == 1:
+                    self.token_start = i
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 1:
+                    self._token(i + 1)
+                elif self.depth == 0:
+                    self.done = True
+                    return True
+            elif self.depth == 1 and char not in ",:" and not char.isspace():
+                if self.token_start is None:
+                    self.token_start = i
+                    self.scalar = True
+        return False
+
+    def _token(self, end: int):
+        """顶层对象中的一个键或值已完整"""
+        raw = self.buffer[self.token_start : end]
+        self.token_start = None
+        self.scalar = False
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        if self.key is None:
+            self.key = str(value)
+            return
+        key, self.key = self.key, None
+        self.fields[key] = value
+        if self.on_field is not None:
+            self.on_field(key, value)
@@ -3,10 +3,10 @@ import time
 
 class Timer:
     def __init__(self):
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
 
     def end(self):
         """
         :return: 运行时间
         """
-        return time.time() - self.start_time
+        return time.perf_counter() - self.start_time